@@ -0,0 +1,89 @@
+import datetime
+import os
+import threading
+import time
+from ai import llm_provider, llm_scheduler
+from utils import db, tracing
+
+FALLBACK_TIP = "Keep going — every line of code you write makes you better!"
+
+# Set to give every user their own tip instead of one shared tip per day.
+TIP_PER_USER = os.getenv("CODEMATE_TIP_PER_USER", "") == "1"
+
+# A claimed fetch that has not produced a tip after this long is retried.
+CLAIM_TIMEOUT_SECONDS = 60
+
+_in_flight = set()
+_in_flight_lock = threading.Lock()
+
+
+@tracing.traced("llm.daily_tip")
+def fetch_tip():
+    try:
+        return llm_provider.complete(
+            [
+                {"role": "system", "content": "You are a motivational assistant."},
+                {"role": "user", "content": "Give a short motivational tip for a college student learning to code."}
+            ],
+            max_tokens=60,
+            temperature=0.7,
+            timeout=10,
+            priority=llm_scheduler.LOW,
+        ).strip()
+    except Exception:
+        return None
+
+
+def _cache_key(username):
+    # Keys carry the calendar day, so an entry stops matching at midnight.
+    return datetime.date.today().isoformat(), (username or "") if TIP_PER_USER else ""
+
+
+def _claim(tip_date, username):
+    now = time.time()
+    with db.transaction() as conn:
+        # Yesterday's entries can never match again.
+        conn.execute("DELETE FROM tip_cache WHERE tip_date < ?", (tip_date,))
+        row = conn.execute("SELECT tip, claimed_at FROM tip_cache WHERE tip_date = ? AND username = ?",
+                           (tip_date, username)).fetchone()
+        if row and (row[0] is not None or now - row[1] < CLAIM_TIMEOUT_SECONDS):
+            return False
+        conn.execute("INSERT OR REPLACE INTO tip_cache (tip_date, username, tip, claimed_at) VALUES (?, ?, NULL, ?)",
+                     (tip_date, username, now))
+        return True
+
+
+def _refresh(tip_date, username):
+    try:
+        tip = fetch_tip()
+        if tip:
+            db.execute("UPDATE tip_cache SET tip = ? WHERE tip_date = ? AND username = ?", (tip, tip_date, username))
+        else:
+            # Release the claim so the next render retries.
+            db.execute("DELETE FROM tip_cache WHERE tip_date = ? AND username = ? AND tip IS NULL",
+                       (tip_date, username))
+    finally:
+        with _in_flight_lock:
+            _in_flight.discard((tip_date, username))
+
+
+def get_daily_tip(username=None):
+    tip_date, key_user = _cache_key(username)
+    row = db.fetch_one("SELECT tip FROM tip_cache WHERE tip_date = ? AND username = ?", (tip_date, key_user))
+    if row and row[0]:
+        return row[0]
+
+    with _in_flight_lock:
+        if (tip_date, key_user) in _in_flight:
+            return FALLBACK_TIP
+        _in_flight.add((tip_date, key_user))
+    try:
+        claimed = _claim(tip_date, key_user)
+    except Exception:
+        claimed = False
+    if claimed:
+        threading.Thread(target=_refresh, args=(tip_date, key_user), daemon=True).start()
+    else:
+        with _in_flight_lock:
+            _in_flight.discard((tip_date, key_user))
+    return FALLBACK_TIP
@@ -1,14 +1,13 @@
+import itertools
+from ai import llm_provider, model_registry, response_cache
+from ai.summarizer import CHUNK_TOKENS, iter_chunks
+from utils import file_parser, tracing
 
+FLASHCARD_PARAMS = {"max_tokens": 1000, "temperature": 0.5}
+# Chunks of an uploaded document sent for generation, to bound cost on huge files.
+MAX_DOCUMENT_CHUNKS = 8
 
-import os
-from dotenv import load_dotenv
-import openai
-from transformers import pipeline
-
-load_dotenv()
-openai.api_key = os.getenv("OPENAI_API_KEY")
-
-def generate_flashcards(text, model="OpenAI GPT-3.5"):
+def _generate(text, model, use_cache=True):
     if model == "OpenAI GPT-3.5":
         prompt = (
             "From the following programming notes, generate a list of flashcards.\n"
@@ -17,32 +16,53 @@ def generate_flashcards(text, model="OpenAI GPT-3.5"):
             "Q: [Question text]\nA: [Answer text]\n---\n\n"
             f"{text}"
         )
-        try:
-            response = openai.ChatCompletion.create(
-                model="gpt-3.5-turbo",
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=1000,
-                temperature=0.5,
-            )
-            output = response['choices'][0]['message']['content']
+        @tracing.traced("llm.flashcards")
+        def compute():
+            output = llm_provider.complete([{"role": "user", "content": prompt}], **FLASHCARD_PARAMS)
             return parse_flashcards(output)
-        except Exception as e:
-            return [{"question": "Error", "answer": str(e)}]
+
+        return response_cache.cached_call(compute, text, llm_provider.model_name(), "flashcards-v1",
+                                          FLASHCARD_PARAMS, use_cache=use_cache, cache_if=bool)
 
     elif model == "HuggingFace T5-Small":
-        try:
-            summarizer = pipeline("summarization", model="t5-small", tokenizer="t5-small")
-            result = summarizer(text, max_length=200, min_length=40, do_sample=False)
-            summary = result[0]['summary_text']
-            return [{
-                "question": "Summarize the notes in a sentence?",
-                "answer": summary
-            }]
-        except Exception as e:
-            return [{"question": "Error", "answer": str(e)}]
+        # Loaded once per process and shared across sessions.
+        summary = response_cache.cached_call(
+            lambda: model_registry.run("summarization", "t5-small", text,
+                                       max_length=200, min_length=40, do_sample=False)[0]['summary_text'],
+            text, "t5-small", "flashcards-summary-v1", {"max_length": 200, "min_length": 40},
+            use_cache=use_cache, cache_if=bool)
+        return [{
+            "question": "Summarize the notes in a sentence?",
+            "answer": summary
+        }]
 
     else:
+        raise ValueError("Invalid model selected.")
+
+def generate_flashcards(text, model="OpenAI GPT-3.5", use_cache=True):
+    if model not in CHUNK_TOKENS:
         return [{"question": "Invalid model selected.", "answer": ""}]
+    try:
+        return _generate(text, model, use_cache)
+    except Exception as e:
+        return [{"question": "Error", "answer": str(e)}]
+
+def run_job(payload, progress):
+    # Background job: {"model", "text"} or {"model", "files": extract_all output}.
+    # Unlike generate_flashcards, failures raise so the job queue retries them.
+    model = payload["model"]
+    if payload.get("files"):
+        lines = file_parser.iter_lines(file_parser.iter_cached_files(payload["files"]))
+        chunks = list(itertools.islice(iter_chunks(lines, CHUNK_TOKENS[model]), MAX_DOCUMENT_CHUNKS))
+    else:
+        chunks = [payload["text"]]
+    cards = []
+    for i, chunk in enumerate(chunks):
+        cards.extend(_generate(chunk, model))
+        progress({"chunks": i + 1, "total": len(chunks), "cards": len(cards)})
+    if not cards:
+        raise ValueError("No flashcards were generated. Please try a different input.")
+    return cards
 
 def parse_flashcards(text):
     cards = []
@@ -0,0 +1,345 @@
+import argparse
+import hashlib
+import importlib
+import json
+import logging
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+from ai import llm_scheduler
+from utils import db, tracing
+
+# Generation runs as jobs in SQLite instead of inside a page render, so a
+# Streamlit rerun or a page switch never throws the work away. Pages submit a
+# job, keep its id in session state and poll it; workers in this process (and
+# in any `python -m ai.job_queue` worker processes) claim and run jobs.
+
+# Job kind -> (module, handler). Handlers take (payload, progress) and return
+# a JSON-serializable result; progress(value) publishes partial output. Modules
+# are imported the first time a job of that kind runs.
+HANDLERS = {
+    "flashcards": ("ai.flashcard_gen", "run_job"),
+    "summarize": ("ai.summarizer", "run_job"),
+    "questions": ("ai.question_gen", "run_job"),
+    "chat_compact": ("ai.llm_chat", "run_job"),
+}
+
+# Worker threads started with the app; LLM jobs mostly wait on the network,
+# so this scales with cores but never drops below two. It is capped at half
+# the connection pool so long-running jobs cannot starve page renders of
+# connections. 0 leaves all work to dedicated worker processes.
+WORKERS = int(os.getenv("CODEMATE_JOB_WORKERS", str(min(max(2, os.cpu_count() or 1), max(1, db.POOL_SIZE // 2)))))
+MAX_ATTEMPTS = 3
+# Seconds before the first retry; doubles with every further attempt.
+RETRY_DELAY = 5
+# A running job whose worker stops renewing its lease is handed to another.
+LEASE_SECONDS = 600
+IDLE_POLL_SECONDS = 1.0
+# A job's final write is retried this many times, backing off from
+# SETTLE_BACKOFF seconds, while the database is busy.
+SETTLE_ATTEMPTS = 4
+SETTLE_BACKOFF = 0.5
+# Finished jobs are kept this long, so identical submissions reuse the result.
+JOB_TTL = int(os.getenv("CODEMATE_JOB_TTL", str(24 * 3600)))
+PRUNE_EVERY = 300
+
+ACTIVE = ("queued", "running")
+
+log = logging.getLogger(__name__)
+
+# One permit per job made runnable in this process, so each submit wakes a
+# separate idle worker instead of the first one to notice.
+_wake = threading.Semaphore(0)
+# (job_id, worker) of jobs this process could neither finish nor hand back;
+# any worker here may take them over without waiting for the lease.
+_stranded = set()
+_stranded_lock = threading.Lock()
+_started = False
+_start_lock = threading.Lock()
+_last_prune = 0.0
+
+
+def input_hash(kind, payload, username=None):
+    # Per user: a job's LLM calls are charged to its submitter, and pages act
+    # on a finished job's result, so users never share a job row.
+    return hashlib.sha256(json.dumps([kind, payload, username], sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def submit(kind, payload, username=None, priority=llm_scheduler.NORMAL, max_attempts=MAX_ATTEMPTS):
+    # Returns the job id. The same user's identical job that is queued, running
+    # or finished within JOB_TTL is reused; a failed or expired one is queued again.
+    if kind not in HANDLERS:
+        raise ValueError(f"Unknown job kind {kind!r}")
+    key = input_hash(kind, payload, username)
+    now = time.time()
+    with db.transaction() as conn:
+        row = conn.execute("SELECT job_id, status, finished_at FROM jobs WHERE kind = ? AND input_hash = ?",
+                           (kind, key)).fetchone()
+        queued = False
+        if row and (row[1] in ACTIVE or row[1] == "done" and row[2] >= now - JOB_TTL):
+            job_id = row[0]
+        elif row:
+            job_id = row[0]
+            queued = True
+            conn.execute(
+                "UPDATE jobs SET status = 'queued', attempts = 0, max_attempts = ?, priority = ?, run_after = ?, "
+                "error = NULL, progress = NULL, result = NULL, created_at = ?, finished_at = NULL WHERE job_id = ?",
+                (max_attempts, priority, now, now, job_id),
+            )
+        else:
+            job_id = conn.execute(
+                "INSERT INTO jobs (kind, input_hash, username, payload, status, priority, attempts, max_attempts, "
+                "run_after, created_at) VALUES (?, ?, ?, ?, 'queued', ?, 0, ?, ?, ?)",
+                (kind, key, username, json.dumps(payload), priority, max_attempts, now, now),
+            ).lastrowid
+            queued = True
+    if queued:
+        _wake.release()
+    return job_id
+
+
+def get(job_id):
+    row = db.fetch_one(
+        "SELECT job_id, kind, status, attempts, max_attempts, progress, result, error, created_at, finished_at "
+        "FROM jobs WHERE job_id = ?", (job_id,))
+    if row is None:
+        return None
+    job_id, kind, status, attempts, max_attempts, progress, result, error, created_at, finished_at = row
+    return {
+        "job_id": job_id,
+        "kind": kind,
+        "status": status,
+        "attempts": attempts,
+        "max_attempts": max_attempts,
+        "progress": json.loads(progress) if progress is not None else None,
+        "result": json.loads(result) if result is not None else None,
+        "error": error,
+        "created_at": created_at,
+        "finished_at": finished_at,
+    }
+
+
+def retry(job_id):
+    # Queues a failed job again with a fresh set of attempts.
+    now = time.time()
+    changed = db.execute(
+        "UPDATE jobs SET status = 'queued', attempts = 0, run_after = ?, error = NULL, progress = NULL, "
+        "finished_at = NULL WHERE job_id = ? AND status = 'failed'", (now, job_id))
+    if changed:
+        _wake.release()
+    return bool(changed)
+
+
+def queue_depth():
+    return db.fetch_one("SELECT COUNT(*) FROM jobs WHERE status = 'queued'")[0]
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
+
+
+def _is_stranded(job_id, worker=None):
+    with _stranded_lock:
+        return any(j == job_id and (worker is None or w == worker) for j, w in _stranded)
+
+
+def _candidate(now):
+    # Read-only look for the next runnable job, so idle workers never take
+    # the write lock: queued jobs by priority, then running ones whose worker
+    # died or stopped renewing its lease.
+    row = db.fetch_one("SELECT job_id FROM jobs WHERE status = 'queued' AND run_after <= ? "
+                       "ORDER BY priority, job_id LIMIT 1", (now,))
+    if row:
+        return row[0]
+    for job_id, owner, lease_until in db.fetch_all(
+            "SELECT job_id, owner, lease_until FROM jobs WHERE status = 'running' ORDER BY priority, job_id"):
+        if lease_until < now or not _alive(owner) or _is_stranded(job_id):
+            return job_id
+    return None
+
+
+def claim(worker):
+    # Takes the next runnable job. Returns
+    # (job_id, kind, payload, username, attempts, max_attempts) or None.
+    now = time.time()
+    job_id = _candidate(now)
+    if job_id is None:
+        return None
+    with db.transaction() as conn:
+        row = conn.execute(
+            "SELECT kind, payload, username, attempts, max_attempts, status, run_after, owner, lease_until, worker "
+            "FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        kind, payload, username, attempts, max_attempts, status, run_after, owner, lease_until, held_by = row
+        # Re-checked under the write lock: another worker may have taken it since the read.
+        if status == "queued":
+            runnable = run_after <= now
+        else:
+            runnable = status == "running" and (lease_until < now or not _alive(owner)
+                                                 or _is_stranded(job_id, held_by))
+        if not runnable:
+            return None
+        if attempts >= max_attempts:
+            # Its last attempt died with the worker.
+            conn.execute("UPDATE jobs SET status = 'failed', error = 'Worker stopped while running the job', "
+                         "finished_at = ? WHERE job_id = ?", (now, job_id))
+            return None
+        conn.execute(
+            "UPDATE jobs SET status = 'running', attempts = attempts + 1, owner = ?, worker = ?, lease_until = ?, "
+            "started_at = ? WHERE job_id = ?",
+            (os.getpid(), worker, now + LEASE_SECONDS, now, job_id),
+        )
+    with _stranded_lock:
+        _stranded.discard((job_id, held_by))
+    return job_id, kind, json.loads(payload), username, attempts + 1, max_attempts
+
+
+def _finish(job_id, worker, sql, params):
+    # Only the worker holding the job may finish it; a job taken over after
+    # a lost lease belongs to its new worker.
+    with db.transaction() as conn:
+        return conn.execute(sql + " WHERE job_id = ? AND worker = ? AND status = 'running'",
+                            params + (job_id, worker)).rowcount
+
+
+def _settle(job_id, worker, sql, params):
+    # A job's final write. A busy database must not leave the job running
+    # until its lease runs out, so it is retried with backoff.
+    for attempt in range(SETTLE_ATTEMPTS):
+        try:
+            return _finish(job_id, worker, sql, params)
+        except sqlite3.OperationalError:
+            if attempt == SETTLE_ATTEMPTS - 1:
+                raise
+            time.sleep(SETTLE_BACKOFF * 2 ** attempt)
+
+
+def _abandon(job_id, worker):
+    # Hands a job whose final write failed back to the queue; its result is
+    # lost, so it runs again. If even that fails, workers in this process
+    # take it over on their next claim.
+    try:
+        _settle(job_id, worker, "UPDATE jobs SET status = 'queued', run_after = ?", (time.time(),))
+        _wake.release()
+    except sqlite3.Error:
+        log.exception("Could not requeue job %s; marking it stranded", job_id)
+        with _stranded_lock:
+            _stranded.add((job_id, worker))
+
+
+def execute(job, worker):
+    job_id, kind, payload, username, attempts, max_attempts = job
+
+    def progress(value):
+        _finish(job_id, worker, "UPDATE jobs SET progress = ?, lease_until = ?",
+                (json.dumps(value), time.time() + LEASE_SECONDS))
+
+    module, name = HANDLERS[kind]
+    try:
+        handler = getattr(importlib.import_module(module), name)
+        # The job's LLM calls are charged to the user who submitted it.
+        with llm_scheduler.user(username), tracing.span(f"job.{kind}"):
+            result = handler(payload, progress)
+    except Exception as e:
+        error = f"{e.__class__.__name__}: {e}"
+        if attempts < max_attempts:
+            _settle(job_id, worker, "UPDATE jobs SET status = 'queued', error = ?, run_after = ?",
+                    (error, time.time() + RETRY_DELAY * 2 ** (attempts - 1)))
+        else:
+            _settle(job_id, worker, "UPDATE jobs SET status = 'failed', error = ?, finished_at = ?",
+                    (error, time.time()))
+        return False
+    _settle(job_id, worker, "UPDATE jobs SET status = 'done', result = ?, error = NULL, finished_at = ?",
+            (json.dumps(result), time.time()))
+    return True
+
+
+def prune(ttl=JOB_TTL):
+    return db.execute("DELETE FROM jobs WHERE status IN ('done', 'failed') AND finished_at < ?", (time.time() - ttl,))
+
+
+def _maybe_prune():
+    global _last_prune
+    now = time.time()
+    if now - _last_prune < PRUNE_EVERY:
+        return
+    _last_prune = now
+    try:
+        prune()
+    except Exception:
+        pass
+
+
+def work(stop=None, worker=None):
+    # Worker loop: runs jobs until stop is set, sleeping while the queue is empty.
+    worker = worker or f"{os.getpid()}:{threading.get_ident()}"
+    while stop is None or not stop.is_set():
+        try:
+            job = claim(worker)
+        except Exception:
+            job = None
+        if job is None:
+            _maybe_prune()
+            _wake.acquire(timeout=IDLE_POLL_SECONDS)
+            continue
+        try:
+            execute(job, worker)
+        except Exception:
+            # Only the final write can get here; the worker must keep running.
+            log.exception("Could not record the outcome of job %s", job[0])
+            _abandon(job[0], worker)
+
+
+def start_workers(count=None):
+    # Starts the in-app worker threads once per process.
+    global _started
+    count = WORKERS if count is None else count
+    with _start_lock:
+        if _started:
+            return
+        _started = True
+    for _ in range(count):
+        threading.Thread(target=work, daemon=True).start()
+
+
+def _run_process(threads):
+    stop = threading.Event()
+    workers = [threading.Thread(target=work, args=(stop,), daemon=True) for _ in range(threads)]
+    for thread in workers:
+        thread.start()
+    try:
+        for thread in workers:
+            thread.join()
+    except KeyboardInterrupt:
+        stop.set()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run CodeMate generation workers.")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--threads", type=int, default=2, help="worker threads per process")
+    args = parser.parse_args()
+    from utils.migrations import migrate
+    migrate()
+    if args.processes <= 1:
+        _run_process(args.threads)
+    else:
+        context = multiprocessing.get_context("spawn")
+        processes = [context.Process(target=_run_process, args=(args.threads,)) for _ in range(args.processes)]
+        for process in processes:
+            process.start()
+        try:
+            for process in processes:
+                process.join()
+        except KeyboardInterrupt:
+            for process in processes:
+                process.terminate()
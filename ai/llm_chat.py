@@ -0,0 +1,200 @@
+import os
+import time
+from datetime import datetime
+from ai import job_queue, llm_provider, llm_scheduler, response_cache
+from ai.summarizer import count_tokens
+from utils import db, tracing
+
+# Sent unchanged as the first message of every request, so the prompt prefix
+# is identical from turn to turn and the provider can reuse its prompt cache.
+SYSTEM_PROMPT = (
+    "You are CodeMate, a patient programming tutor for college students. "
+    "Explain concepts step by step with short code examples, ask a guiding "
+    "question when the student seems stuck, and never just hand over full "
+    "solutions to graded exercises. Use Markdown and fenced code blocks."
+)
+
+# Prompt budget for history (summary plus verbatim turns), in approximate tokens.
+CONTEXT_TOKENS = int(os.getenv("CODEMATE_CHAT_CONTEXT_TOKENS", "2500"))
+REPLY_TOKENS = 600
+# Most recent messages that are never folded into the summary.
+KEEP_RECENT = 6
+REQUEST_TIMEOUT = 60
+SUMMARY_PARAMS = {"max_tokens": 300, "temperature": 0.2}
+
+
+def create_conversation(username, title="New chat"):
+    with db.transaction() as conn:
+        return conn.execute(
+            "INSERT INTO chat_conversations (username, title, created_at) VALUES (?, ?, ?)",
+            (username, title, datetime.now().strftime("%Y-%m-%d %H:%M:%S")),
+        ).lastrowid
+
+
+def list_conversations(username):
+    return db.fetch_all(
+        "SELECT conversation_id, title FROM chat_conversations WHERE username = ? ORDER BY conversation_id DESC",
+        (username,),
+    )
+
+
+def delete_conversation(conversation_id):
+    with db.transaction() as conn:
+        conn.execute("DELETE FROM chat_messages WHERE conversation_id = ?", (conversation_id,))
+        conn.execute("DELETE FROM chat_conversations WHERE conversation_id = ?", (conversation_id,))
+
+
+def get_messages(conversation_id):
+    # (role, content, ttft_ms) in order, for rendering the transcript.
+    return db.fetch_all(
+        "SELECT role, content, ttft_ms FROM chat_messages WHERE conversation_id = ? ORDER BY message_id",
+        (conversation_id,),
+    )
+
+
+def add_message(conversation_id, role, content, ttft_ms=None, total_ms=None):
+    with db.transaction() as conn:
+        return conn.execute(
+            "INSERT INTO chat_messages (conversation_id, role, content, tokens, created_at, ttft_ms, total_ms) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (conversation_id, role, content, count_tokens(content), time.time(), ttft_ms, total_ms),
+        ).lastrowid
+
+
+def _state(conversation_id):
+    summary, summary_upto = db.fetch_one(
+        "SELECT summary, summary_upto FROM chat_conversations WHERE conversation_id = ?", (conversation_id,))
+    # Only messages after the summary are read; older ones are never loaded again.
+    rows = db.fetch_all(
+        "SELECT message_id, role, content, tokens FROM chat_messages "
+        "WHERE conversation_id = ? AND message_id > ? ORDER BY message_id",
+        (conversation_id, summary_upto),
+    )
+    return summary, rows
+
+
+def build_prompt(conversation_id):
+    # System prompt, then the rolling summary, then as many of the newest
+    # messages as fit in CONTEXT_TOKENS. Anything older is trimmed.
+    summary, rows = _state(conversation_id)
+    budget = CONTEXT_TOKENS - count_tokens(summary)
+    recent = []
+    for message_id, role, content, tokens in reversed(rows):
+        if recent and budget - tokens < 0:
+            break
+        recent.append({"role": role, "content": content})
+        budget -= tokens
+    messages = [{"role": "system", "content": SYSTEM_PROMPT}]
+    if summary:
+        messages.append({"role": "system", "content": f"Summary of the earlier conversation:\n{summary}"})
+    return messages + recent[::-1]
+
+
+def _summarize(summary, rows):
+    transcript = "\n".join(f"{role}: {content}" for _, role, content, _ in rows)
+    prompt = (
+        "Update the running summary of a tutoring conversation. Keep the student's goals, "
+        "what has been explained, code they are working on and open questions. "
+        "Stay under 200 words.\n\n"
+        f"Current summary:\n{summary or '(none)'}\n\nNew messages:\n{transcript}"
+    )
+
+    @tracing.traced("llm.chat.summary")
+    def compute():
+        return llm_provider.complete([{"role": "user", "content": prompt}], timeout=REQUEST_TIMEOUT,
+                                     priority=llm_scheduler.LOW, **SUMMARY_PARAMS).strip()
+
+    return response_cache.cached_call(compute, prompt, llm_provider.model_name(), "chat-summary-v1", SUMMARY_PARAMS,
+                                      cache_if=bool)
+
+
+def _needs_compaction(summary, rows):
+    return len(rows) > KEEP_RECENT and sum(row[3] for row in rows) + count_tokens(summary) > CONTEXT_TOKENS
+
+
+def compact(conversation_id):
+    # Folds the oldest unsummarized messages into the summary once the
+    # verbatim history outgrows the budget. Returns True if the summary moved.
+    summary, rows = _state(conversation_id)
+    if not _needs_compaction(summary, rows):
+        return False
+    old = rows[:-KEEP_RECENT]
+    try:
+        summary = _summarize(summary, old)
+    except Exception:
+        # build_prompt still trims to the budget; try again after the next turn.
+        return False
+    db.execute("UPDATE chat_conversations SET summary = ?, summary_upto = ? WHERE conversation_id = ?",
+               (summary, old[-1][0], conversation_id))
+    return True
+
+
+def schedule_compaction(conversation_id):
+    # Queues compact() as a background job when the history is over budget,
+    # so the summary call never holds up the reply. Returns the job id or None.
+    summary, rows = _state(conversation_id)
+    if not _needs_compaction(summary, rows):
+        return None
+    username = db.fetch_one("SELECT username FROM chat_conversations WHERE conversation_id = ?",
+                            (conversation_id,))[0]
+    # Keyed by the newest message, so each turn gets its own job.
+    return job_queue.submit("chat_compact", {"conversation_id": conversation_id, "upto": rows[-1][0]}, username,
+                            priority=llm_scheduler.LOW)
+
+
+def run_job(payload, progress):
+    # Background job: {"conversation_id", "upto"}.
+    return compact(payload["conversation_id"])
+
+
+def stream_reply(conversation_id, text, metrics=None):
+    # Stores the student's message, then yields the tutor's reply as it
+    # streams. Time to first token and total time are stored with the reply,
+    # recorded as tracing spans and copied into metrics (a dict) if given.
+    add_message(conversation_id, "user", text)
+    db.execute("UPDATE chat_conversations SET title = ? WHERE conversation_id = ? AND title = 'New chat'",
+               (text[:40], conversation_id))
+    messages = build_prompt(conversation_id)
+    metrics = metrics if metrics is not None else {}
+    metrics["prompt_tokens"] = sum(count_tokens(m["content"]) for m in messages)
+
+    start = time.perf_counter()
+    parts = []
+    try:
+        # Someone is watching the reply appear, so it jumps the queue.
+        for delta in llm_provider.stream(messages, max_tokens=REPLY_TOKENS, temperature=0.4,
+                                          timeout=REQUEST_TIMEOUT, priority=llm_scheduler.HIGH):
+            if "ttft_ms" not in metrics:
+                metrics["ttft_ms"] = (time.perf_counter() - start) * 1000
+                tracing.record("llm.chat.first_token", metrics["ttft_ms"] / 1000)
+            parts.append(delta)
+            yield delta
+    except Exception as e:
+        message = f"\n\n⚠️ The tutor is unavailable right now: {e}"
+        parts.append(message)
+        yield message
+    finally:
+        metrics["total_ms"] = (time.perf_counter() - start) * 1000
+        tracing.record("llm.chat.reply", metrics["total_ms"] / 1000)
+        reply = "".join(parts)
+        if reply:
+            add_message(conversation_id, "assistant", reply, metrics.get("ttft_ms"), metrics["total_ms"])
+    schedule_compaction(conversation_id)
+
+
+def latency_stats(username, limit=50):
+    # Time-to-first-token over the user's most recent replies.
+    rows = db.fetch_all(
+        "SELECT m.ttft_ms FROM chat_messages AS m JOIN chat_conversations AS c USING (conversation_id) "
+        "WHERE c.username = ? AND m.role = 'assistant' AND m.ttft_ms IS NOT NULL "
+        "ORDER BY m.message_id DESC LIMIT ?",
+        (username, limit),
+    )
+    values = sorted(row[0] for row in rows)
+    if not values:
+        return None
+    return {
+        "replies": len(values),
+        "p50_ms": values[len(values) // 2],
+        "p95_ms": values[min(len(values) - 1, int(len(values) * 0.95))],
+    }
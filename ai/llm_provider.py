@@ -0,0 +1,207 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from dotenv import load_dotenv
+import requests
+from requests.adapters import HTTPAdapter
+from ai import llm_scheduler, model_registry
+
+load_dotenv()
+
+# openai (default), local (HuggingFace text2text model) or fake (deterministic, offline).
+BACKEND = os.getenv("CODEMATE_LLM_BACKEND", "openai").lower()
+MODEL = os.getenv("CODEMATE_LLM_MODEL", "gpt-3.5-turbo")
+# Point at any server speaking the OpenAI chat-completions wire format,
+# e.g. python -m ai.stub_server.
+BASE_URL = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1").rstrip("/")
+LOCAL_MODEL = os.getenv("CODEMATE_LOCAL_MODEL", "google/flan-t5-small")
+# Keep-alive connections shared by every session in the process.
+POOL_SIZE = int(os.getenv("CODEMATE_LLM_POOL_SIZE", "16"))
+CONNECT_TIMEOUT = 5
+DEFAULT_TIMEOUT = 30
+# Seconds between words streamed by the fake backend, to mimic generation.
+FAKE_DELAY = float(os.getenv("CODEMATE_FAKE_LLM_DELAY", "0"))
+
+
+class LLMError(Exception):
+    pass
+
+
+class TransientError(LLMError):
+    # Network failures and 5xx responses; the same call may well succeed later.
+    pass
+
+
+class RateLimitError(LLMError, llm_scheduler.Throttled):
+    pass
+
+
+class OpenAIBackend:
+    def __init__(self, base_url=BASE_URL, api_key=None, model=MODEL, pool_size=POOL_SIZE):
+        self.base_url = base_url
+        self.model = model
+        self.name = f"openai:{model}"
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers["Authorization"] = f"Bearer {api_key or os.getenv('OPENAI_API_KEY', '')}"
+
+    def _post(self, messages, max_tokens, temperature, timeout, stream):
+        try:
+            response = self.session.post(
+                f"{self.base_url}/chat/completions",
+                json={"model": self.model, "messages": messages, "max_tokens": max_tokens,
+                      "temperature": temperature, "stream": stream},
+                timeout=(CONNECT_TIMEOUT, timeout),
+                stream=stream,
+            )
+        except requests.RequestException as e:
+            raise TransientError(f"{e.__class__.__name__}: {e}") from e
+        if response.status_code == 429:
+            retry_after = response.headers.get("Retry-After", "")
+            response.close()
+            raise RateLimitError("HTTP 429: rate limited",
+                                 float(retry_after) if retry_after.replace(".", "", 1).isdigit() else 1.0)
+        if response.status_code != 200:
+            try:
+                detail = response.json().get("error", {}).get("message", response.text)
+            except ValueError:
+                detail = response.text
+            response.close()
+            error = TransientError if response.status_code >= 500 else LLMError
+            raise error(f"HTTP {response.status_code}: {detail[:200]}")
+        return response
+
+    def complete(self, messages, max_tokens, temperature, timeout):
+        response = self._post(messages, max_tokens, temperature, timeout, stream=False)
+        try:
+            return response.json()["choices"][0]["message"]["content"]
+        except (ValueError, KeyError, IndexError) as e:
+            raise LLMError(f"Malformed response: {e}") from e
+
+    def stream(self, messages, max_tokens, temperature, timeout):
+        # Server-sent events: one "data: {json}" line per delta, then "data: [DONE]".
+        response = self._post(messages, max_tokens, temperature, timeout, stream=True)
+        try:
+            for line in response.iter_lines(decode_unicode=True):
+                if not line or not line.startswith("data:"):
+                    continue
+                data = line[5:].strip()
+                if data == "[DONE]":
+                    return
+                delta = json.loads(data)["choices"][0].get("delta", {}).get("content")
+                if delta:
+                    yield delta
+        except (requests.RequestException, ValueError) as e:
+            raise TransientError(f"Stream interrupted: {e}") from e
+        finally:
+            # Returns the connection to the pool even if the caller stops early.
+            response.close()
+
+
+def flatten(messages):
+    return "\n\n".join(f"{m['role']}: {m['content']}" if m["role"] != "user" else m["content"] for m in messages)
+
+
+class LocalBackend:
+    # A HuggingFace text2text model from the shared registry; it cannot
+    # stream, so the whole output arrives as one delta.
+    def __init__(self, model=LOCAL_MODEL):
+        self.model = model
+        self.name = f"local:{model}"
+
+    def complete(self, messages, max_tokens, temperature, timeout):
+        try:
+            output = model_registry.run("text2text-generation", self.model, flatten(messages),
+                                        max_new_tokens=max_tokens, do_sample=temperature > 0,
+                                        temperature=max(temperature, 0.01))
+        except Exception as e:
+            raise LLMError(f"Local model failed: {e}") from e
+        return output[0]["generated_text"]
+
+    def stream(self, messages, max_tokens, temperature, timeout):
+        yield self.complete(messages, max_tokens, temperature, timeout)
+
+
+class FakeBackend:
+    # Deterministic replies shaped like what each caller parses, for offline
+    # runs, demos and load tests. The same messages always give the same text.
+    name = "fake"
+
+    def reply(self, messages):
+        prompt = messages[-1]["content"]
+        seed = hashlib.sha256(json.dumps(messages, sort_keys=True).encode()).hexdigest()[:6]
+        about = re.search(r"\babout (.+?)(?: in | at |[.\n])", prompt)
+        words = re.findall(r"[A-Za-z][A-Za-z+#]{3,}", prompt)
+        topic = about.group(1) if about else " ".join(words[-3:]) if words else "programming"
+        if '"question"' in prompt and "JSON" in prompt:
+            qtype = re.search(r'"type": "([^"]+)"', prompt)
+            return json.dumps({"type": qtype.group(1) if qtype else "Short Answer",
+                               "question": f"[{seed}] Explain how {topic} works and give an example."})
+        if "Q: [Question text]" in prompt:
+            return "\n---\n".join(f"Q: What is key idea {i + 1} about {topic}? [{seed}]\nA: It is explained in the notes."
+                                  for i in range(3))
+        if "summar" in prompt.lower():
+            sentences = re.split(r"(?<=[.!?])\s+", prompt.split("\n")[-1].strip())
+            return f"Summary [{seed}]: " + " ".join(sentences[:2])[:400]
+        return f"[{seed}] Here is a short explanation of {topic}: break the problem into small steps and test each one."
+
+    def complete(self, messages, max_tokens, temperature, timeout):
+        return self.reply(messages)
+
+    def stream(self, messages, max_tokens, temperature, timeout):
+        for i, word in enumerate(self.reply(messages).split(" ")):
+            if FAKE_DELAY:
+                time.sleep(FAKE_DELAY)
+            yield word if i == 0 else " " + word
+
+
+BACKENDS = {"openai": OpenAIBackend, "local": LocalBackend, "fake": FakeBackend}
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                if BACKEND not in BACKENDS:
+                    raise LLMError(f"Unknown CODEMATE_LLM_BACKEND {BACKEND!r}; use one of {', '.join(BACKENDS)}")
+                _backend = BACKENDS[BACKEND]()
+    return _backend
+
+
+def set_backend(backend):
+    # Swap the process-wide backend, e.g. FakeBackend() in a benchmark.
+    global _backend
+    with _backend_lock:
+        _backend = backend
+
+
+def model_name():
+    # Part of every response-cache key, so backends never share cached answers.
+    return get_backend().name
+
+
+def request_key(backend, messages, max_tokens, temperature):
+    payload = json.dumps([backend.name, messages, max_tokens, temperature], sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def complete(messages, max_tokens=500, temperature=0.7, timeout=DEFAULT_TIMEOUT, priority=llm_scheduler.NORMAL):
+    # Goes through the scheduler: identical concurrent requests share a call
+    # and every call waits its turn under the rate limits.
+    backend = get_backend()
+    return llm_scheduler.run(request_key(backend, messages, max_tokens, temperature),
+                             lambda: backend.complete(messages, max_tokens, temperature, timeout), priority)
+
+
+def stream(messages, max_tokens=500, temperature=0.7, timeout=DEFAULT_TIMEOUT, priority=llm_scheduler.NORMAL):
+    backend = get_backend()
+    return llm_scheduler.stream(lambda: backend.stream(messages, max_tokens, temperature, timeout), priority)
@@ -0,0 +1,379 @@
+import contextvars
+import heapq
+import itertools
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from utils import db, tracing
+
+# Sits between the AI modules and the LLM backend:
+#   - identical requests already in flight are coalesced into one call, within
+#     a process (threads wait on the leader) and across processes (llm_inflight
+#     holds the running call and its result for RESULT_TTL seconds);
+#   - every call draws from a global and a per-user token bucket kept in
+#     llm_buckets, so all worker processes share one budget;
+#   - a call the buckets cannot pay for waits in a priority queue instead of
+#     failing, and an upstream 429 sends it back to the queue.
+
+# Requests per minute and bucket size (burst). 0 turns a limit off.
+GLOBAL_RPM = float(os.getenv("CODEMATE_LLM_RPM", "60"))
+GLOBAL_BURST = float(os.getenv("CODEMATE_LLM_BURST", "20"))
+USER_RPM = float(os.getenv("CODEMATE_LLM_USER_RPM", "12"))
+USER_BURST = float(os.getenv("CODEMATE_LLM_USER_BURST", "6"))
+# A queued call gives up after this many seconds.
+MAX_WAIT = float(os.getenv("CODEMATE_LLM_MAX_WAIT", "120"))
+# How often a process waiting on another process's call re-reads it.
+POLL_SECONDS = 0.25
+# A finished result stays readable by other processes for this long.
+RESULT_TTL = 30
+# A call claimed by a live process is taken over only after this long.
+LEASE_SECONDS = 300
+# Upstream 429s retried through the queue before the error is raised.
+MAX_THROTTLE_RETRIES = 3
+
+HIGH, NORMAL, LOW = 0, 5, 10
+
+GLOBAL_BUCKET = "global"
+
+# Latest queue waits kept for percentiles.
+WAIT_SAMPLES = 1000
+
+_current_user = contextvars.ContextVar("codemate_llm_user", default=None)
+
+
+class Throttled(Exception):
+    # Raised by a backend when the upstream API rate-limits a call.
+    def __init__(self, message, retry_after=1.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class QueueTimeout(Exception):
+    pass
+
+
+class _Flight:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class _Ticket:
+    __slots__ = ("user", "cost", "granted")
+
+    def __init__(self, user, cost):
+        self.user = user
+        self.cost = cost
+        self.granted = threading.Event()
+
+
+_flights = {}
+_queue = []
+_seq = itertools.count()
+_lock = threading.Lock()
+# One dispatcher at a time; waiters take turns running it.
+_dispatch_lock = threading.Lock()
+
+_stats = {"calls": 0, "coalesced": 0, "shared": 0, "queued": 0, "throttled": 0, "timeouts": 0, "max_depth": 0}
+_waits = deque(maxlen=WAIT_SAMPLES)
+_last_prune = 0.0
+
+
+@contextmanager
+def user(username):
+    # Charges LLM calls made on this thread (and contexts copied from it) to username.
+    token = _current_user.set(username or None)
+    try:
+        yield
+    finally:
+        _current_user.reset(token)
+
+
+def _limits(name):
+    if name == GLOBAL_BUCKET:
+        return GLOBAL_RPM / 60, GLOBAL_BURST
+    return USER_RPM / 60, USER_BURST
+
+
+def _buckets_for(ticket):
+    names = [GLOBAL_BUCKET] if GLOBAL_RPM > 0 else []
+    if ticket.user and USER_RPM > 0:
+        names.append(f"user:{ticket.user}")
+    return names
+
+
+def _dispatch():
+    # Grants queued tickets in priority order while the buckets can pay for
+    # them. Returns how long until the first refused ticket could go.
+    with _dispatch_lock:
+        with _lock:
+            waiting = sorted(_queue)
+        if not waiting:
+            return 0
+        now = time.time()
+        names = sorted({name for *_, ticket in waiting for name in _buckets_for(ticket)})
+        granted, delay = _grant(waiting, names, now) if names else (waiting, 0)
+        with _lock:
+            for entry in granted:
+                _queue.remove(entry)
+                entry[-1].granted.set()
+            heapq.heapify(_queue)
+        return delay
+
+
+def _plan(rows, waiting, names, now):
+    # Refills the buckets from their stored levels and pays for every ticket
+    # that fits, in priority order. Returns (granted, delay, levels).
+    tokens = {name: _limits(name)[1] for name in names}
+    for name, level, updated_at in rows:
+        rate, burst = _limits(name)
+        tokens[name] = min(burst, level + max(0.0, now - updated_at) * rate)
+    granted = []
+    delay = MAX_WAIT
+    for entry in waiting:
+        ticket = entry[-1]
+        needed = _buckets_for(ticket)
+        short = {name: (min(ticket.cost, _limits(name)[1]) - tokens[name]) / _limits(name)[0]
+                 for name in needed}
+        if all(seconds <= 0 for seconds in short.values()):
+            for name in needed:
+                tokens[name] -= min(ticket.cost, _limits(name)[1])
+            granted.append(entry)
+            continue
+        delay = min(delay, max(short.values()))
+        # A user over their own budget is skipped, but nobody may
+        # overtake a higher-priority call on the shared budget.
+        if short.get(GLOBAL_BUCKET, 0) > 0:
+            break
+    return granted, delay, tokens
+
+
+def _grant(waiting, names, now):
+    # A plain read decides whether anything can go; only then does one
+    # transaction re-read the levels, pay and write them back, so processes
+    # never spend the same tokens twice and a full queue never writes.
+    sql = f"SELECT name, tokens, updated_at FROM llm_buckets WHERE name IN ({', '.join('?' * len(names))})"
+    granted, delay, _ = _plan(db.fetch_all(sql, names), waiting, names, now)
+    if not granted:
+        return [], delay
+    with db.transaction() as conn:
+        granted, delay, tokens = _plan(conn.execute(sql, names).fetchall(), waiting, names, now)
+        if granted:
+            conn.executemany(
+                "INSERT INTO llm_buckets (name, tokens, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET tokens = excluded.tokens, updated_at = excluded.updated_at",
+                [(name, level, now) for name, level in tokens.items()],
+            )
+    return granted, delay
+
+
+def admit(priority=NORMAL, username=None, cost=1):
+    # Blocks until the global and per-user buckets can pay cost requests,
+    # higher priorities (lower numbers) first. Returns the seconds waited.
+    ticket = _Ticket(username if username is not None else _current_user.get(), cost)
+    entry = (priority, next(_seq), ticket)
+    start = time.monotonic()
+    with _lock:
+        heapq.heappush(_queue, entry)
+        _stats["max_depth"] = max(_stats["max_depth"], len(_queue))
+    while True:
+        delay = _dispatch()
+        if ticket.granted.is_set():
+            break
+        remaining = MAX_WAIT - (time.monotonic() - start)
+        if remaining <= 0:
+            with _lock:
+                if not ticket.granted.is_set():
+                    _queue.remove(entry)
+                    heapq.heapify(_queue)
+                    _stats["timeouts"] += 1
+                    raise QueueTimeout(f"LLM request queue: no capacity within {MAX_WAIT:.0f}s")
+            break
+        # Refills are deterministic, so nothing can go before delay; a grant
+        # by another waiter's dispatch wakes this one earlier.
+        ticket.granted.wait(min(max(delay, 0.01), remaining))
+    waited = time.monotonic() - start
+    with _lock:
+        _stats["calls"] += 1
+        if waited > 0.01:
+            _stats["queued"] += 1
+        _waits.append(waited)
+    tracing.record("llm.queue.wait", waited)
+    return waited
+
+
+def _throttle(retry_after):
+    # The upstream said slow down: empty the global bucket for retry_after
+    # seconds so every process backs off, not just this call.
+    with _lock:
+        _stats["throttled"] += 1
+    if GLOBAL_RPM <= 0:
+        time.sleep(retry_after)
+        return
+    rate = GLOBAL_RPM / 60
+    db.execute(
+        "INSERT INTO llm_buckets (name, tokens, updated_at) VALUES (?, ?, ?) "
+        "ON CONFLICT(name) DO UPDATE SET tokens = MIN(tokens, excluded.tokens), updated_at = excluded.updated_at",
+        (GLOBAL_BUCKET, -rate * retry_after, time.time()),
+    )
+
+
+def _call(fn, priority, username):
+    for attempt in range(MAX_THROTTLE_RETRIES + 1):
+        admit(priority, username)
+        try:
+            return fn()
+        except Throttled as e:
+            if attempt == MAX_THROTTLE_RETRIES:
+                raise
+            _throttle(e.retry_after)
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
+
+
+def _state(row, now):
+    # ("done", result), ("running", None) or None when the key is free to claim.
+    if row is None:
+        return None
+    owner, lease_until, result, finished_at = row
+    if finished_at is not None:
+        return ("done", json.loads(result)) if finished_at >= now - RESULT_TTL else None
+    if owner != os.getpid() and lease_until > now and _alive(owner):
+        return "running", None
+    return None
+
+
+def _claim(key):
+    # ("claimed", None), ("running", None) or ("done", result). Waiters only
+    # read; the write lock is taken to claim a free key or an expired lease.
+    sql = "SELECT owner, lease_until, result, finished_at FROM llm_inflight WHERE key = ?"
+    state = _state(db.fetch_one(sql, (key,)), time.time())
+    if state is not None:
+        return state
+    now = time.time()
+    with db.transaction() as conn:
+        state = _state(conn.execute(sql, (key,)).fetchone(), now)
+        if state is not None:
+            return state
+        conn.execute("INSERT OR REPLACE INTO llm_inflight (key, owner, lease_until, result, finished_at) "
+                     "VALUES (?, ?, ?, NULL, NULL)", (key, os.getpid(), now + LEASE_SECONDS))
+    return "claimed", None
+
+
+def _prune():
+    # Drops results nobody can read any more, at most once per RESULT_TTL.
+    global _last_prune
+    now = time.time()
+    with _lock:
+        if now - _last_prune < RESULT_TTL:
+            return
+        _last_prune = now
+    db.execute("DELETE FROM llm_inflight WHERE finished_at < ?", (now - RESULT_TTL,))
+
+
+def _release(key, result=None, failed=False):
+    # A failed call is forgotten, so waiters elsewhere make their own attempt.
+    if failed:
+        db.execute("DELETE FROM llm_inflight WHERE key = ? AND owner = ?", (key, os.getpid()))
+    else:
+        db.execute("UPDATE llm_inflight SET result = ?, finished_at = ? WHERE key = ? AND owner = ?",
+                   (json.dumps(result), time.time(), key, os.getpid()))
+    _prune()
+
+
+def _run_shared(key, fn, priority, username):
+    while True:
+        state, result = _claim(key)
+        if state == "claimed":
+            break
+        if state == "done":
+            with _lock:
+                _stats["shared"] += 1
+            return result
+        time.sleep(POLL_SECONDS)
+    try:
+        result = _call(fn, priority, username)
+    except BaseException:
+        _release(key, failed=True)
+        raise
+    _release(key, result)
+    return result
+
+
+def run(key, fn, priority=NORMAL, username=None):
+    # Returns fn() under the rate limits. Calls with the same key that overlap
+    # share one fn() call; key=None never coalesces. Results must be JSON.
+    username = username if username is not None else _current_user.get()
+    if key is None:
+        return _call(fn, priority, username)
+    with _lock:
+        flight = _flights.get(key)
+        leader = flight is None
+        if leader:
+            flight = _flights[key] = _Flight()
+        else:
+            _stats["coalesced"] += 1
+    if not leader:
+        flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+    try:
+        flight.result = _run_shared(key, fn, priority, username)
+    except BaseException as e:
+        flight.error = e
+        raise
+    finally:
+        with _lock:
+            _flights.pop(key, None)
+        flight.done.set()
+    return flight.result
+
+
+def stream(start, priority=NORMAL, username=None):
+    # Streams are never coalesced. start() must return a generator that only
+    # contacts the backend when first advanced; a 429 before the first chunk
+    # sends the call back to the queue.
+    username = username if username is not None else _current_user.get()
+    for attempt in range(MAX_THROTTLE_RETRIES + 1):
+        admit(priority, username)
+        chunks = start()
+        try:
+            first = next(chunks)
+        except StopIteration:
+            return
+        except Throttled as e:
+            if attempt == MAX_THROTTLE_RETRIES:
+                raise
+            _throttle(e.retry_after)
+            continue
+        yield first
+        yield from chunks
+        return
+
+
+def stats():
+    with _lock:
+        result = dict(_stats)
+        result["depth"] = len(_queue)
+        result["coalescing"] = len(_flights)
+        waits = sorted(_waits)
+    result["wait_p50_ms"] = waits[len(waits) // 2] * 1000 if waits else 0.0
+    result["wait_p95_ms"] = waits[min(len(waits) - 1, int(len(waits) * 0.95))] * 1000 if waits else 0.0
+    # Calls running right now in every process sharing the database.
+    result["in_flight"] = db.fetch_one("SELECT COUNT(*) FROM llm_inflight WHERE finished_at IS NULL")[0]
+    return result
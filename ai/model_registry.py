@@ -0,0 +1,118 @@
+import os
+import threading
+from collections import OrderedDict
+from utils import tracing
+
+# Total memory the loaded HuggingFace pipelines may use before the least
+# recently used one is dropped. 0 disables eviction.
+MEMORY_BUDGET_MB = int(os.getenv("CODEMATE_MODEL_BUDGET_MB", "1024"))
+
+# Comma-separated "task:model" pairs loaded in the background at startup,
+# e.g. "summarization:t5-small".
+WARM_MODELS = os.getenv("CODEMATE_WARM_MODELS", "")
+
+# Used when a pipeline does not expose torch parameters to measure.
+DEFAULT_MODEL_SIZE_MB = 256
+
+
+class _Entry:
+    def __init__(self, pipe, size_mb):
+        self.pipe = pipe
+        self.size_mb = size_mb
+        # HF pipelines are not safe to call from several threads at once.
+        self.lock = threading.Lock()
+
+
+_models = OrderedDict()
+_models_lock = threading.Lock()
+_load_locks = {}
+_warmed = False
+
+
+def _load(task, model):
+    with tracing.span(f"model.load.{model}"):
+        from transformers import pipeline
+        return pipeline(task, model=model, tokenizer=model)
+
+
+def _size_mb(pipe):
+    try:
+        params = pipe.model.parameters()
+        return sum(p.numel() * p.element_size() for p in params) / (1024 * 1024)
+    except Exception:
+        return DEFAULT_MODEL_SIZE_MB
+
+
+def _evict_for(size_mb):
+    # Caller holds _models_lock. Always keep room for the model being added.
+    if not MEMORY_BUDGET_MB:
+        return
+    used = sum(entry.size_mb for entry in _models.values())
+    while _models and used + size_mb > MEMORY_BUDGET_MB:
+        _, evicted = _models.popitem(last=False)
+        used -= evicted.size_mb
+
+
+def _get_entry(task, model):
+    key = (task, model)
+    with _models_lock:
+        entry = _models.get(key)
+        if entry is not None:
+            _models.move_to_end(key)
+            return entry
+        load_lock = _load_locks.setdefault(key, threading.Lock())
+
+    # Only one session loads a given model; the others wait and reuse it.
+    with load_lock:
+        with _models_lock:
+            entry = _models.get(key)
+            if entry is not None:
+                _models.move_to_end(key)
+                return entry
+        pipe = _load(task, model)
+        entry = _Entry(pipe, _size_mb(pipe))
+        with _models_lock:
+            _evict_for(entry.size_mb)
+            _models[key] = entry
+        return entry
+
+
+def get_pipeline(task, model):
+    return _get_entry(task, model).pipe
+
+
+def run(task, model, *args, **kwargs):
+    entry = _get_entry(task, model)
+    with entry.lock, tracing.span(f"model.run.{model}"):
+        return entry.pipe(*args, **kwargs)
+
+
+def loaded_models():
+    with _models_lock:
+        return [(task, model, round(entry.size_mb, 1)) for (task, model), entry in _models.items()]
+
+
+def unload(task, model):
+    with _models_lock:
+        _models.pop((task, model), None)
+
+
+def warm_up(specs=None):
+    global _warmed
+    specs = WARM_MODELS if specs is None else specs
+    with _models_lock:
+        if _warmed:
+            return
+        _warmed = True
+    pairs = [spec.split(":", 1) for spec in specs.split(",") if ":" in spec]
+    if not pairs:
+        return
+
+    def load_all():
+        for task, model in pairs:
+            try:
+                _get_entry(task.strip(), model.strip())
+            except Exception:
+                pass
+
+    threading.Thread(target=load_all, daemon=True).start()
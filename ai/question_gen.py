@@ -0,0 +1,174 @@
+import asyncio
+import contextvars
+import json
+import queue
+import random
+import re
+import threading
+from ai import llm_provider, llm_scheduler, response_cache
+from utils import tracing
+
+QUESTION_TYPES = ["MCQ", "Short Answer", "Coding", "Error"]
+
+# At most this many requests are in flight at once.
+MAX_CONCURRENCY = 5
+MAX_RETRIES = 3
+BACKOFF_SECONDS = 1.0
+REQUEST_TIMEOUT = 30
+# Extra calls allowed to replace invalid or duplicate questions.
+MAX_REPLACEMENTS = 4
+
+PARAMS = {"max_tokens": 400, "temperature": 0.8}
+
+TYPE_HINTS = {
+    "MCQ": "a multiple-choice question with four options labelled A-D, followed by the correct letter",
+    "Short Answer": "a short-answer conceptual question",
+    "Coding": "a small coding exercise with a clear expected behaviour",
+    "Error": "a short code snippet containing a bug, asking the student to find and fix it",
+}
+
+
+def _prompt(language, topic, difficulty, qtype, slot):
+    return (
+        f"Write {TYPE_HINTS[qtype]} about {topic} in {language} at {difficulty} difficulty.\n"
+        f"This is question #{slot + 1} of a practice set, so make it distinct from typical first examples.\n"
+        'Respond only with JSON: {"type": "' + qtype + '", "question": "<question text>"}'
+    )
+
+
+def _parse(content, qtype):
+    match = re.search(r"\{.*\}", content, re.DOTALL)
+    try:
+        data = json.loads(match.group(0)) if match else {"question": content}
+    except ValueError:
+        data = {"question": content}
+    question = str(data.get("question", "")).strip()
+    if not question:
+        return None
+    return {"type": qtype, "question": question}
+
+
+def _fingerprint(question):
+    return re.sub(r"\W+", " ", question["question"].lower()).strip()
+
+
+async def _call(prompt):
+    for attempt in range(MAX_RETRIES + 1):
+        try:
+            # The provider's pooled client is blocking; each call gets a worker
+            # thread and MAX_CONCURRENCY bounds how many run at once.
+            with tracing.span("llm.question"):
+                return await asyncio.to_thread(
+                    llm_provider.complete,
+                    [{"role": "user", "content": prompt}],
+                    timeout=REQUEST_TIMEOUT,
+                    **PARAMS,
+                )
+        except llm_provider.TransientError:
+            # Anything else (bad request, queue timeout, repeated 429s) fails now.
+            if attempt == MAX_RETRIES:
+                raise
+            # Exponential backoff with jitter so retries from many sessions spread out.
+            await asyncio.sleep(BACKOFF_SECONDS * (2 ** attempt) * (0.5 + random.random()))
+
+
+async def _generate_one(semaphore, language, topic, difficulty, qtype, slot, use_cache):
+    subject = f"{language}|{topic}|{difficulty}"
+    params = dict(PARAMS, type=qtype, slot=slot)
+    key = response_cache.make_key(subject, llm_provider.model_name(), "question-v1", params)
+    if response_cache.ENABLED and use_cache:
+        hit = await asyncio.to_thread(response_cache.get, key)
+        if hit is not None:
+            return hit
+    async with semaphore:
+        content = await _call(_prompt(language, topic, difficulty, qtype, slot))
+    question = _parse(content, qtype)
+    if question and response_cache.ENABLED and use_cache:
+        await asyncio.to_thread(response_cache.put, key, question)
+    return question
+
+
+async def agenerate_questions(language, topic, difficulty, num_questions, use_cache=True):
+    # Async generator: yields validated, de-duplicated questions as soon as each call finishes.
+    semaphore = asyncio.Semaphore(MAX_CONCURRENCY)
+
+    def start(slot):
+        qtype = QUESTION_TYPES[slot % len(QUESTION_TYPES)]
+        return asyncio.create_task(_generate_one(semaphore, language, topic, difficulty, qtype, slot, use_cache))
+
+    pending = {start(slot) for slot in range(num_questions)}
+    next_slot = num_questions
+    seen = set()
+    delivered = 0
+    error = None
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                try:
+                    question = task.result()
+                except llm_scheduler.QueueTimeout:
+                    # No capacity now; replacements would only queue behind it.
+                    raise
+                except Exception as e:
+                    error = e
+                    question = None
+                if question and _fingerprint(question) not in seen and delivered < num_questions:
+                    seen.add(_fingerprint(question))
+                    delivered += 1
+                    yield question
+                elif delivered + len(pending) < num_questions and next_slot < num_questions + MAX_REPLACEMENTS:
+                    pending.add(start(next_slot))
+                    next_slot += 1
+        if not delivered and error is not None:
+            raise error
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+def iter_questions(language, topic, difficulty, num_questions, use_cache=True):
+    # Sync generator for Streamlit: runs the event loop on a helper thread and
+    # hands each question back as it arrives. If generation fails, the error
+    # is raised after the questions already delivered.
+    results = queue.Queue()
+    done = object()
+    failure = []
+
+    async def produce():
+        async for question in agenerate_questions(language, topic, difficulty, num_questions, use_cache):
+            results.put(question)
+
+    def run():
+        try:
+            asyncio.run(produce())
+        except Exception as e:
+            failure.append(e)
+        finally:
+            results.put(done)
+
+    # Copy the context so spans on the helper thread are attributed to the calling page.
+    threading.Thread(target=contextvars.copy_context().run, args=(run,), daemon=True).start()
+    while True:
+        item = results.get()
+        if item is done:
+            if failure:
+                raise failure[0]
+            return
+        yield item
+
+
+def generate_questions(language, topic, difficulty, num_questions, use_cache=True):
+    return list(iter_questions(language, topic, difficulty, num_questions, use_cache))
+
+
+def run_job(payload, progress):
+    # Background job: {"language", "topic", "difficulty", "count"}. Each
+    # question is published as it arrives.
+    questions = []
+    for question in iter_questions(payload["language"], payload["topic"], payload["difficulty"], payload["count"]):
+        questions.append(question)
+        progress({"questions": questions})
+    if not questions:
+        raise RuntimeError("Failed to generate questions.")
+    return questions
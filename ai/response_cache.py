@@ -0,0 +1,112 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from utils import db
+
+# Set CODEMATE_LLM_CACHE=off to bypass the cache everywhere.
+ENABLED = os.getenv("CODEMATE_LLM_CACHE", "on").lower() not in ("0", "off", "false")
+TTL_SECONDS = int(os.getenv("CODEMATE_LLM_CACHE_TTL", str(7 * 24 * 3600)))
+MAX_BYTES = int(os.getenv("CODEMATE_LLM_CACHE_MAX_MB", "64")) * 1024 * 1024
+
+# Expiry and size eviction run on every Nth write rather than on each one.
+EVICT_EVERY = 32
+
+_WHITESPACE = re.compile(r"\s+")
+
+# Hits record their access time through this buffer, so a read never waits
+# on the write lock; eviction flushes it first.
+_touches = db.WriteBuffer("UPDATE llm_cache SET accessed_at = MAX(accessed_at, ?) WHERE key = ?")
+
+_stats = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0, "bypassed": 0}
+_stats_lock = threading.Lock()
+
+
+def _count(name, n=1):
+    with _stats_lock:
+        _stats[name] += n
+
+
+def stats():
+    with _stats_lock:
+        result = dict(_stats)
+    lookups = result["hits"] + result["misses"]
+    result["hit_rate"] = result["hits"] / lookups if lookups else 0.0
+    return result
+
+
+def normalize(text):
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def make_key(text, model, template, params=None):
+    payload = json.dumps([normalize(text), model, template, params or {}], sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def get(key):
+    now = time.time()
+    row = db.fetch_one("SELECT value, created_at FROM llm_cache WHERE key = ?", (key,))
+    if row is None or now - row[1] > TTL_SECONDS:
+        _count("misses")
+        return None
+    _touches.add((now, key))
+    _count("hits")
+    return json.loads(row[0])
+
+
+def put(key, value):
+    now = time.time()
+    data = json.dumps(value)
+    db.execute("INSERT OR REPLACE INTO llm_cache (key, value, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+               (key, data, len(data), now, now))
+    with _stats_lock:
+        _stats["writes"] += 1
+        due = _stats["writes"] % EVICT_EVERY == 1
+    if due:
+        evict()
+
+
+def evict():
+    _touches.flush()
+    with db.transaction() as conn:
+        removed = conn.execute("DELETE FROM llm_cache WHERE created_at < ?", (time.time() - TTL_SECONDS,)).rowcount
+        # Keep the most recently used entries whose running size fits the budget.
+        removed += conn.execute('''
+            DELETE FROM llm_cache WHERE key IN (
+                SELECT key FROM (
+                    SELECT key, SUM(size) OVER (ORDER BY accessed_at DESC) AS running FROM llm_cache
+                ) WHERE running > ?
+            )
+        ''', (MAX_BYTES,)).rowcount
+    _count("evictions", removed)
+    return removed
+
+
+def clear():
+    db.execute("DELETE FROM llm_cache")
+
+
+def cached_call(compute, text, model, template, params=None, use_cache=True, cache_if=None):
+    # Returns compute() for (text, model, template, params), serving repeats from the cache.
+    # cache_if(result) can veto storing a result, e.g. error placeholders.
+    if not (ENABLED and use_cache):
+        _count("bypassed")
+        return compute()
+    key = make_key(text, model, template, params)
+    try:
+        hit = get(key)
+    except sqlite3.Error:
+        hit = None
+    if hit is not None:
+        return hit
+    result = compute()
+    if cache_if is None or cache_if(result):
+        try:
+            put(key, result)
+        except sqlite3.Error:
+            pass
+    return result
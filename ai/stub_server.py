@@ -0,0 +1,117 @@
+import argparse
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from ai.llm_provider import FakeBackend
+
+# A local stand-in for the OpenAI chat-completions API, answering with the
+# deterministic fake backend. Run the app fully offline with:
+#
+#   python -m ai.stub_server --port 8001
+#   OPENAI_BASE_URL=http://127.0.0.1:8001/v1 OPENAI_API_KEY=stub streamlit run app.py
+#
+# Only POST /v1/chat/completions is implemented, streaming and not.
+
+_fake = FakeBackend()
+
+
+def make_handler(latency=0.0, token_delay=0.0, stats=None):
+    stats = stats if stats is not None else {}
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        # HTTP/1.1 so clients can keep connections alive between calls.
+        protocol_version = "HTTP/1.1"
+        # Headers and body go out as separate writes; with Nagle on, a kept-alive
+        # connection stalls on delayed ACKs and looks slower than a fresh one.
+        disable_nagle_algorithm = True
+
+        def _count(self, name):
+            with lock:
+                stats[name] = stats.get(name, 0) + 1
+
+        def setup(self):
+            # One handler per TCP connection, so this counts connections.
+            super().setup()
+            self._count("connections")
+
+        def _send_json(self, status, payload):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _chunk(self, data):
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+
+        def do_POST(self):
+            self._count("requests")
+            if self.path.rstrip("/") not in ("/v1/chat/completions", "/chat/completions"):
+                self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+                return
+            try:
+                request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                messages = request["messages"]
+            except (ValueError, KeyError):
+                self._send_json(400, {"error": {"message": "Expected a JSON body with messages"}})
+                return
+            time.sleep(latency)
+            reply = _fake.reply(messages)
+            completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+            model = request.get("model", "stub")
+
+            if not request.get("stream"):
+                self._send_json(200, {
+                    "id": completion_id, "object": "chat.completion", "created": int(time.time()), "model": model,
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": reply},
+                                 "finish_reason": "stop"}],
+                    "usage": {"prompt_tokens": sum(len(m.get("content", "").split()) for m in messages),
+                              "completion_tokens": len(reply.split())},
+                })
+                return
+
+            self._count("streams")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for i, word in enumerate(reply.split(" ")):
+                if token_delay:
+                    time.sleep(token_delay)
+                chunk = {"id": completion_id, "object": "chat.completion.chunk", "model": model,
+                         "choices": [{"index": 0, "delta": {"content": word if i == 0 else " " + word}}]}
+                self._chunk(f"data: {json.dumps(chunk)}\n\n".encode())
+            self._chunk(b"data: [DONE]\n\n")
+            self._chunk(b"")
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def start(port=0, latency=0.0, token_delay=0.0, stats=None):
+    # Serves on a daemon thread; returns (server, base_url).
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(latency, token_delay, stats))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local OpenAI-compatible stand-in server.")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds before the first token")
+    parser.add_argument("--token-delay", type=float, default=0.02, help="seconds between streamed words")
+    args = parser.parse_args()
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), make_handler(args.latency, args.token_delay))
+    server.daemon_threads = True
+    print(f"Serving OpenAI-compatible API on http://127.0.0.1:{args.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,190 @@
+import contextvars
+import re
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from ai import llm_provider, model_registry, response_cache
+from utils import file_parser, tracing
+
+# Input budget per chunk, in approximate tokens, for each backend.
+CHUNK_TOKENS = {
+    "OpenAI GPT-3.5": 2500,
+    "HuggingFace T5-Small": 400,
+}
+API_WORKERS = 4
+T5_BATCH_SIZE = 8
+# Reduce passes before giving up and returning the merged partial summaries.
+MAX_REDUCE_DEPTH = 4
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+def count_tokens(text):
+    # ~4/3 tokens per English word is close enough for both BPE and SentencePiece.
+    return (len(text.split()) * 4 + 2) // 3
+
+
+def _pieces(lines):
+    # Yields paragraphs, split into sentences when a paragraph is large on its own.
+    paragraph = []
+    for line in lines:
+        if line.strip():
+            paragraph.append(line.strip())
+            continue
+        if paragraph:
+            yield " ".join(paragraph)
+            paragraph = []
+    if paragraph:
+        yield " ".join(paragraph)
+
+
+def iter_chunks(source, max_tokens):
+    lines = source.splitlines() if isinstance(source, str) else source
+    chunk, size = [], 0
+    for paragraph in _pieces(lines):
+        parts = [paragraph] if count_tokens(paragraph) <= max_tokens else _SENTENCE_END.split(paragraph)
+        for part in parts:
+            tokens = count_tokens(part)
+            if tokens > max_tokens:
+                # A single run-on sentence: hard split on words.
+                words = part.split()
+                step = max(1, max_tokens * 3 // 4)
+                for i in range(0, len(words), step):
+                    if chunk:
+                        yield "\n\n".join(chunk)
+                        chunk, size = [], 0
+                    yield " ".join(words[i:i + step])
+                continue
+            if size + tokens > max_tokens and chunk:
+                yield "\n\n".join(chunk)
+                chunk, size = [], 0
+            chunk.append(part)
+            size += tokens
+    if chunk:
+        yield "\n\n".join(chunk)
+
+
+OPENAI_PARAMS = {"max_tokens": 300, "temperature": 0.3}
+T5_PARAMS = {"max_length": 150, "min_length": 20}
+
+
+def _summarize_openai(text, use_cache=True):
+    @tracing.traced("llm.summarize_chunk")
+    def compute():
+        return llm_provider.complete(
+            [
+                {"role": "system", "content": "You summarize programming notes for students."},
+                {"role": "user", "content": f"Summarize these notes concisely, keeping key concepts and code terms:\n\n{text}"},
+            ],
+            timeout=60,
+            **OPENAI_PARAMS,
+        ).strip()
+
+    return response_cache.cached_call(compute, text, llm_provider.model_name(), "summarize-chunk-v1", OPENAI_PARAMS,
+                                      use_cache=use_cache, cache_if=bool)
+
+
+def _summarize_t5(texts, use_cache=True):
+    # Chunks already in the cache are skipped; the rest go through the model as one batch.
+    texts = list(texts)
+    summaries = [None] * len(texts)
+    missing = []
+    for i, text in enumerate(texts):
+        hit = None
+        if response_cache.ENABLED and use_cache:
+            hit = response_cache.get(response_cache.make_key(text, "t5-small", "summarize-chunk-v1", T5_PARAMS))
+        if hit is None:
+            missing.append(i)
+        summaries[i] = hit
+    if missing:
+        results = model_registry.run("summarization", "t5-small", [texts[i] for i in missing],
+                                     do_sample=False, batch_size=T5_BATCH_SIZE, **T5_PARAMS)
+        for i, result in zip(missing, results):
+            summaries[i] = result['summary_text']
+            if response_cache.ENABLED and use_cache:
+                response_cache.put(response_cache.make_key(texts[i], "t5-small", "summarize-chunk-v1", T5_PARAMS),
+                                   summaries[i])
+    return summaries
+
+
+def _map(chunks, model, on_partial=None, use_cache=True):
+    # Summarizes chunks concurrently while reading them lazily, so only a
+    # bounded window of chunk text is in memory. on_partial(index, summary)
+    # runs on the calling thread as each chunk finishes.
+    summaries = {}
+    if model == "OpenAI GPT-3.5":
+        with ThreadPoolExecutor(max_workers=API_WORKERS) as pool:
+            pending = {}
+            for i, chunk in enumerate(chunks):
+                # Copied context keeps the page and the user the calls are charged to.
+                pending[pool.submit(contextvars.copy_context().run, _summarize_openai, chunk, use_cache)] = i
+                if len(pending) >= API_WORKERS * 2:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        _collect(summaries, pending.pop(future), future.result(), on_partial)
+            for future in as_completed(pending):
+                _collect(summaries, pending[future], future.result(), on_partial)
+    else:
+        batch = []
+        for chunk in chunks:
+            batch.append(chunk)
+            if len(batch) == T5_BATCH_SIZE:
+                _collect_batch(summaries, batch, on_partial, use_cache)
+                batch = []
+        if batch:
+            _collect_batch(summaries, batch, on_partial, use_cache)
+    return [summaries[i] for i in sorted(summaries)]
+
+
+def _collect(summaries, index, summary, on_partial):
+    summaries[index] = summary
+    if on_partial:
+        on_partial(index, summary)
+
+
+def _collect_batch(summaries, batch, on_partial, use_cache):
+    start = len(summaries)
+    for offset, summary in enumerate(_summarize_t5(batch, use_cache)):
+        _collect(summaries, start + offset, summary, on_partial)
+
+
+# source may be a string or any iterable of lines, such as an uploaded file.
+def summarize(source, model="OpenAI GPT-3.5", on_partial=None, use_cache=True):
+    if model not in CHUNK_TOKENS:
+        raise ValueError("Invalid model selected.")
+    max_tokens = CHUNK_TOKENS[model]
+    summaries = _map(iter_chunks(source, max_tokens), model, on_partial, use_cache)
+    if not summaries:
+        return ""
+    # Reduce: keep merging partial summaries until one call can cover them all.
+    for _ in range(MAX_REDUCE_DEPTH):
+        if len(summaries) == 1:
+            return summaries[0]
+        combined = "\n\n".join(summaries)
+        if count_tokens(combined) <= max_tokens:
+            return _map([combined], model, use_cache=use_cache)[0]
+        summaries = _map(iter_chunks(combined, max_tokens), model, use_cache=use_cache)
+    return "\n\n".join(summaries)
+
+
+def summarize_text(source, model="OpenAI GPT-3.5", on_partial=None, use_cache=True):
+    if model not in CHUNK_TOKENS:
+        return "Invalid model selected."
+    try:
+        return summarize(source, model, on_partial, use_cache)
+    except Exception as e:
+        return f"Error: {e}"
+
+
+def run_job(payload, progress):
+    # Background job: {"model", "text"} or {"model", "files": extract_all output}.
+    # Partial summaries are published as they finish, in section order.
+    if payload.get("files"):
+        source = file_parser.iter_lines(file_parser.iter_cached_files(payload["files"]))
+    else:
+        source = payload["text"]
+    partials = {}
+
+    def on_partial(index, summary):
+        partials[index] = summary
+        progress({"partials": [partials[i] for i in sorted(partials)]})
+
+    return summarize(source, payload["model"], on_partial)
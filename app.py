@@ -1,30 +1,22 @@
 import streamlit as st
-from auth.login import login_ui
-from components.dashboard import show_dashboard
-from components.planner import show_planner
-from components.summarizer import show_summarizer
-from components.flashcards import show_flashcards
-from components.questions import show_question_gen
+from ai import job_queue, llm_scheduler
+from ai.model_registry import warm_up
+from components.pages import load_page, visible_pages
+from utils import tracing
+from utils.migrations import migrate
 
 st.set_page_config(page_title="CodeMate", layout="wide")
 
-# Sidebar navigation
-menu = st.sidebar.selectbox("Select", ["Login", "Dashboard", "Planner", "Notes Summarizer", "Practice Questions", "Flashcards"])
-
-if menu == "Login":
-    login_ui()
-
-elif menu == "Dashboard":
-    show_dashboard()
+# Schema upgrades run once per process; later reruns are a no-op.
+migrate()
+# Starts loading CODEMATE_WARM_MODELS in the background, once per process.
+warm_up()
+# Background generation workers, once per process.
+job_queue.start_workers()
 
-elif menu == "Planner":
-    show_planner()
-
-elif menu == "Notes Summarizer":
-    show_summarizer()
-
-elif menu == "Practice Questions":
-    show_question_gen()
+# Sidebar navigation
+menu = st.sidebar.selectbox("Select", visible_pages(st.session_state.get("username")))
 
-elif menu == "Flashcards":
-    show_flashcards()
\ No newline at end of file
+# LLM calls made while rendering are charged to the signed-in user's rate limit.
+with tracing.page(menu), llm_scheduler.user(st.session_state.get("username")):
+    load_page(menu)()
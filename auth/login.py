@@ -1,46 +1,17 @@
 import streamlit as st
-import sqlite3
 import hashlib
 from datetime import datetime
-
-DB_PATH = "data/user_data.db"
-
-def create_usertable():
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS users(
-            username TEXT PRIMARY KEY,
-            password TEXT,
-            created_at TEXT
-        )
-    ''')
-    conn.commit()
-    conn.close()
+from utils import db
 
 def add_userdata(username, password):
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute('INSERT INTO users(username, password, created_at) VALUES (?, ?, ?)', 
-              (username, password, datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
-    conn.commit()
-    conn.close()
+    db.execute('INSERT INTO users(username, password, created_at) VALUES (?, ?, ?)',
+               (username, password, datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
 
 def login_user(username, password):
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute('SELECT * FROM users WHERE username = ? AND password = ?', (username, password))
-    data = c.fetchone()
-    conn.close()
-    return data
+    return db.fetch_one('SELECT * FROM users WHERE username = ? AND password = ?', (username, password))
 
 def user_exists(username):
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute('SELECT * FROM users WHERE username = ?', (username,))
-    exists = c.fetchone() is not None
-    conn.close()
-    return exists
+    return db.fetch_one('SELECT 1 FROM users WHERE username = ?', (username,)) is not None
 
 def make_hashes(password):
     return hashlib.sha256(password.encode()).hexdigest()
@@ -50,7 +21,6 @@ def check_hashes(password, hashed_text):
 
 def login_ui():
     st.subheader("🔐 Login / Signup")
-    create_usertable()
 
     menu = ["Login", "Sign Up"]
     choice = st.radio("Select Action", menu, horizontal=True)
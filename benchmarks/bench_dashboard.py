@@ -0,0 +1,117 @@
+# Dashboard data-path throughput under concurrent sessions.
+#
+#   python -m benchmarks.bench_dashboard --sessions 16 --seconds 5
+#
+# Each "render" runs the queries show_dashboard issues; every tenth render
+# also logs a study session so readers contend with a writer. The legacy mode
+# reproduces the old one-sqlite3.connect-per-helper pattern for comparison.
+import argparse
+import datetime
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from components import dashboard
+from utils import db, plan_store
+from utils.migrations import migrate
+
+
+def seed(path, users, sessions_per_user):
+    migrate(path)
+    conn = sqlite3.connect(path)
+    today = datetime.date.today()
+    plan = {str(today + datetime.timedelta(days=i)): f"Topic {i}" for i in range(28)}
+    for u in range(users):
+        name = f"user{u}"
+        conn.execute("INSERT INTO users VALUES (?, ?, ?)", (name, "x", str(today)))
+        plan_id = conn.execute(
+            "INSERT INTO planner (username, language, goal, start_date, end_date, total_days) VALUES (?, ?, ?, ?, ?, ?)",
+            (name, "Python", "Bench", str(today), str(today + datetime.timedelta(days=28)), 28)).lastrowid
+        conn.executemany("INSERT INTO plan_days (username, plan_id, day, topic) VALUES (?, ?, ?, ?)",
+                         [(name, plan_id, day, topic) for day, topic in plan.items()])
+        # One row per day and source; the study_log trigger fills study_daily.
+        conn.executemany("INSERT OR IGNORE INTO study_log (username, study_date, source) VALUES (?, ?, ?)",
+                         [(name, str(today - datetime.timedelta(days=i % 60)), f"bench{i // 60}")
+                          for i in range(sessions_per_user)])
+    conn.commit()
+    conn.close()
+
+
+def legacy_render(path, username, write):
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE IF NOT EXISTS study_log (username TEXT, study_date TEXT)")
+    conn.commit()
+    conn.close()
+    if write:
+        conn = sqlite3.connect(path)
+        conn.execute("INSERT OR IGNORE INTO study_log (username, study_date) VALUES (?, ?)", (username, str(datetime.date.today())))
+        conn.commit()
+        conn.close()
+    for sql in ("SELECT * FROM planner WHERE username = ?",
+                "SELECT study_date FROM study_log WHERE username = ?",
+                "SELECT study_date FROM study_log WHERE username = ?"):
+        conn = sqlite3.connect(path)
+        conn.execute(sql, (username,)).fetchall()
+        conn.close()
+
+
+def pooled_render(path, username, write):
+    if write:
+        dashboard.log_study_session(username, str(datetime.date.today()), source="dashboard", flush=True)
+    today = datetime.date.today()
+    plan_id = plan_store.get_plan(username)[0]
+    plan_store.progress(plan_id, today)
+    plan_store.get_days(plan_id, today, today + datetime.timedelta(days=6))
+    dashboard.get_weekly_study_data(username)
+    dashboard.get_streak(username)
+    dashboard.get_daily_counts(username, datetime.date.today() - datetime.timedelta(days=364), datetime.date.today())
+
+
+def run(render, path, sessions, users, seconds):
+    renders = [0] * sessions
+    errors = [0] * sessions
+    deadline = time.perf_counter() + seconds
+
+    def worker(idx):
+        n = 0
+        while time.perf_counter() < deadline:
+            try:
+                render(path, f"user{(idx + n) % users}", n % 10 == 0)
+                renders[idx] += 1
+            except sqlite3.OperationalError:
+                errors[idx] += 1
+            n += 1
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(sessions)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    return sum(renders) / elapsed, sum(errors)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--logs-per-user", type=int, default=200)
+    parser.add_argument("--seconds", type=float, default=3.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode, render in (("legacy", legacy_render), ("pooled", pooled_render)):
+            path = os.path.join(tmp, f"{mode}.db")
+            seed(path, args.users, args.logs_per_user)
+            db.DB_PATH = path
+            for sessions in args.sessions:
+                rate, errors = run(render, path, sessions, args.users, args.seconds)
+                print(f"{mode:7s} sessions={sessions:3d}  {rate:9.1f} renders/s  locked_errors={errors}")
+            db.close_all()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+# Bulk flashcard import throughput and memory.
+#
+#   python -m benchmarks.bench_flashcard_import --rows 100000
+#
+# Writes a synthetic CSV, then imports it in a fresh interpreter per mode so
+# peak RSS is not polluted by the other run: "streaming" is the chunked
+# importer, "legacy" is the old read_csv + to_dict + insert-per-row path.
+import argparse
+import csv
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+
+def write_csv(path, rows):
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["question", "answer"])
+        for i in range(rows):
+            writer.writerow([f"What does construct {i} do in Python?", f"It demonstrates behaviour number {i}. " * 3])
+
+
+def run_mode(mode, csv_path, db_path):
+    from utils import db, flashcard_import, flashcard_store
+    from utils.migrations import migrate
+    db.DB_PATH = db_path
+    migrate()
+    start = time.perf_counter()
+    if mode == "streaming":
+        with open(csv_path, "rb") as f:
+            _, rows = flashcard_import.import_file(f, os.path.basename(csv_path), "bench")
+    else:
+        import pandas as pd
+        cards = pd.read_csv(csv_path).to_dict(orient="records")
+        deck_id = flashcard_store.create_deck("bench", "legacy")
+        for card in cards:
+            flashcard_store.add_cards(deck_id, [card])
+        rows = len(cards)
+    elapsed = time.perf_counter() - start
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{mode:9s}  rows={rows:,}  {rows / elapsed:10,.0f} rows/s  peak_rss={peak_mb:7.1f}MB")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--modes", nargs="+", default=["streaming", "legacy"])
+    parser.add_argument("--child", nargs=3, metavar=("MODE", "CSV", "DB"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_mode(*args.child)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "cards.csv")
+        write_csv(csv_path, args.rows)
+        print(f"input: {args.rows:,} rows, {os.path.getsize(csv_path) / 1e6:.1f}MB")
+        for mode in args.modes:
+            subprocess.run([sys.executable, "-m", "benchmarks.bench_flashcard_import",
+                            "--child", mode, csv_path, os.path.join(tmp, f"{mode}.db")], check=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+# List View render time versus deck size.
+#
+#   python -m benchmarks.bench_flashcard_list --cards 100 1000 10000
+#
+# Drives show_flashcards through Streamlit's AppTest harness against a
+# temporary database holding one synthetic deck and times full script reruns,
+# so the numbers include widget construction. With pagination the List View
+# cost should not grow with the deck.
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+from streamlit.testing.v1 import AppTest
+
+from utils import db, flashcard_store
+from utils.migrations import migrate
+
+
+def app():
+    from components.flashcards import show_flashcards
+    show_flashcards()
+
+
+def time_renders(n_cards, reruns):
+    deck_id = flashcard_store.create_deck("bench", f"bench-{n_cards}", [
+        {"question": f"Question {i}: what does feature {i} do?", "answer": f"Answer {i}"} for i in range(n_cards)
+    ])
+    at = AppTest.from_function(app, default_timeout=120)
+    at.session_state["username"] = "bench"
+    at.session_state["flashcard_deck_id"] = deck_id
+    at.run()
+    timings = []
+    for _ in range(reruns):
+        start = time.perf_counter()
+        at.run()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), len(at.expander)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cards", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--reruns", type=int, default=5)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_PATH = os.path.join(tmp, "bench.db")
+        migrate()
+        for n_cards in args.cards:
+            median_ms, expanders = time_renders(n_cards, args.reruns)
+            print(f"cards={n_cards:>7,d}  rerun p50={median_ms:8.1f}ms  card widgets rendered={expanders}")
+        db.close_all()
+
+
+if __name__ == "__main__":
+    main()
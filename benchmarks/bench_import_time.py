@@ -0,0 +1,69 @@
+# Startup cost per sidebar page.
+#
+#   python -m benchmarks.bench_import_time
+#
+# Runs a fresh interpreter under `python -X importtime` for app startup and
+# for each page module, then reports the cumulative import time attributed to
+# the page (streamlit itself is imported first and reported separately), the
+# child's peak RSS, and the slowest top-level dependencies pulled in.
+import argparse
+import re
+import subprocess
+import sys
+
+from components.pages import PAGES
+
+LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+PROBE = (
+    "import resource, streamlit\n"
+    "{imports}\n"
+    "print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)\n"
+)
+
+
+def measure(imports):
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PROBE.format(imports=imports)],
+        capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        return None
+    entries = []
+    for line in proc.stderr.splitlines():
+        match = LINE.match(line)
+        if match:
+            entries.append((match.group(4), int(match.group(2)), len(match.group(3))))
+    # Entries are printed children-first; everything after streamlit's own
+    # top-level entry is attributable to the probed imports.
+    split = next((i + 1 for i, (name, _, depth) in enumerate(entries)
+                  if name == "streamlit" and depth == 1), 0)
+    streamlit_us = sum(c for _, c, depth in entries[:split] if depth == 1)
+    probed = entries[split:]
+    total_us = sum(c for _, c, depth in probed if depth == 1)
+    deps = sorted(((name, c) for name, c, depth in probed if depth == 3), key=lambda item: -item[1])
+    rss_kb = int(proc.stdout.strip().splitlines()[-1])
+    return streamlit_us, total_us, deps, rss_kb
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--top", type=int, default=3)
+    args = parser.parse_args()
+
+    targets = [("app startup", "import components.pages, utils.migrations")]
+    targets += [(name, f"import {module}") for name, (module, _) in PAGES.items()]
+    for label, imports in targets:
+        result = measure(imports)
+        if result is None:
+            print(f"{label:20s}  import failed (missing dependency?)")
+            continue
+        streamlit_us, total_us, deps, rss_kb = result
+        total_ms = total_us / 1000
+        heaviest = ", ".join(f"{name} {c / 1000:.0f}ms" for name, c in deps[:args.top])
+        print(f"{label:20s}  {total_ms:8.1f}ms  rss={rss_kb / 1024:6.1f}MB  "
+              f"(streamlit {streamlit_us / 1000:.0f}ms)  {heaviest}")
+
+
+if __name__ == "__main__":
+    main()
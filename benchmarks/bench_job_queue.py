@@ -0,0 +1,56 @@
+# Background job throughput against the local stand-in LLM server.
+#
+#   python -m benchmarks.bench_job_queue --jobs 60 --latency 0.2
+#
+# Submits --jobs flashcard jobs (a third of them duplicates of another) into a
+# temporary database and drains them with 1, 2, 4 and 8 worker threads. The
+# rate limits are lifted so the queue, not the token bucket, is measured.
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--jobs", type=int, default=60)
+    parser.add_argument("--latency", type=float, default=0.2)
+    args = parser.parse_args()
+
+    from ai import job_queue, llm_provider, llm_scheduler, response_cache, stub_server
+    from utils import db, migrations
+    llm_scheduler.GLOBAL_RPM = llm_scheduler.USER_RPM = 0
+    response_cache.ENABLED = False
+    stats = {}
+    server, base_url = stub_server.start(latency=args.latency, stats=stats)
+    llm_provider.set_backend(llm_provider.OpenAIBackend(base_url=base_url, api_key="stub", model="stub"))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for workers in (1, 2, 4, 8):
+            db.DB_PATH = os.path.join(tmp, f"jobs-{workers}.db")
+            migrations.migrate()
+            stats.clear()
+            unique = args.jobs - args.jobs // 3
+            ids = {job_queue.submit("flashcards", {"model": "OpenAI GPT-3.5", "text": f"Notes on topic {i % unique}"})
+                   for i in range(args.jobs)}
+            stop = threading.Event()
+            start = time.perf_counter()
+            threads = [threading.Thread(target=job_queue.work, args=(stop,), daemon=True) for _ in range(workers)]
+            for thread in threads:
+                thread.start()
+            while job_queue.queue_depth() or any(job_queue.get(i)["status"] == "running" for i in ids):
+                time.sleep(0.02)
+            elapsed = time.perf_counter() - start
+            stop.set()
+            for thread in threads:
+                thread.join()
+            print(f"workers={workers}  {args.jobs} submitted  {len(ids)} jobs  {elapsed * 1000:8.1f}ms  "
+                  f"{len(ids) / elapsed:6.1f} jobs/s  upstream={stats.get('requests', 0)}")
+
+    server.shutdown()
+    server.server_close()
+
+
+if __name__ == "__main__":
+    main()
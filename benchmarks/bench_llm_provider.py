@@ -0,0 +1,82 @@
+# LLM provider against the local stand-in server.
+#
+#   python -m benchmarks.bench_llm_provider --calls 200 --latency 0.01
+#
+# Starts ai.stub_server on localhost and makes --calls chat completions:
+#   fresh   - a new requests.Session (and TCP connection) per call, as the
+#             old module-level openai calls did
+#   pooled  - one OpenAIBackend, keep-alive connections reused
+#   threads - the pooled backend from --workers threads at once
+#   stream  - streamed replies; time to first token vs. full reply
+# The server's counters show how many TCP connections each phase opened.
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from ai import llm_provider, stub_server
+
+MESSAGES = [{"role": "user", "content": "Explain Python list comprehensions with an example."}]
+
+
+def fresh_call(base_url):
+    with requests.Session() as session:
+        response = session.post(f"{base_url}/chat/completions",
+                                json={"model": "stub", "messages": MESSAGES}, timeout=10)
+        return response.json()["choices"][0]["message"]["content"]
+
+
+def report(label, elapsed, calls, stats, connections_before):
+    print(f"{label:7s} {elapsed * 1000:8.1f}ms  {calls / elapsed:8.1f} calls/s  "
+          f"connections={stats.get('connections', 0) - connections_before}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.01)
+    parser.add_argument("--token-delay", type=float, default=0.002)
+    args = parser.parse_args()
+
+    stats = {}
+    server, base_url = stub_server.start(latency=args.latency, token_delay=args.token_delay, stats=stats)
+    backend = llm_provider.OpenAIBackend(base_url=base_url, api_key="stub", model="stub")
+
+    before = stats.get("connections", 0)
+    start = time.perf_counter()
+    for _ in range(args.calls):
+        fresh_call(base_url)
+    report("fresh", time.perf_counter() - start, args.calls, stats, before)
+
+    before = stats.get("connections", 0)
+    start = time.perf_counter()
+    for _ in range(args.calls):
+        backend.complete(MESSAGES, 100, 0.7, 10)
+    report("pooled", time.perf_counter() - start, args.calls, stats, before)
+
+    before = stats.get("connections", 0)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        list(pool.map(lambda _: backend.complete(MESSAGES, 100, 0.7, 10), range(args.calls)))
+    report("threads", time.perf_counter() - start, args.calls, stats, before)
+
+    ttft, total = [], []
+    for _ in range(min(args.calls, 50)):
+        start = time.perf_counter()
+        for i, _ in enumerate(backend.stream(MESSAGES, 100, 0.7, 10)):
+            if i == 0:
+                ttft.append(time.perf_counter() - start)
+        total.append(time.perf_counter() - start)
+    ttft.sort()
+    total.sort()
+    print(f"stream  ttft p50={ttft[len(ttft) // 2] * 1000:.1f}ms  "
+          f"reply p50={total[len(total) // 2] * 1000:.1f}ms  over {len(ttft)} replies")
+
+    server.shutdown()
+    server.server_close()
+
+
+if __name__ == "__main__":
+    main()
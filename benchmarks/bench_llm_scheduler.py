@@ -0,0 +1,112 @@
+# LLM scheduler under a classroom burst, against the local stand-in server.
+#
+#   python -m benchmarks.bench_llm_scheduler --students 200 --latency 0.3
+#
+# Phases, each against a fresh temporary database:
+#   burst    - --students threads ask for the same daily tip at once
+#   procs    - --procs processes do the same, coalescing through SQLite
+#   limited  - --requests distinct calls from 4 users under a tight global
+#              budget, half HIGH and half LOW priority
+# The server's request counter shows how many calls actually went upstream.
+import argparse
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+TIP = [{"role": "system", "content": "You are a motivational assistant."},
+       {"role": "user", "content": "Give a short motivational tip for a college student learning to code."}]
+
+
+def setup(db_path, base_url):
+    os.environ["CODEMATE_DB_PATH"] = db_path
+    from ai import llm_provider
+    from utils import db, migrations
+    db.DB_PATH = db_path
+    migrations.migrate()
+    llm_provider.set_backend(llm_provider.OpenAIBackend(base_url=base_url, api_key="stub", model="stub"))
+    return llm_provider
+
+
+def burst(db_path, base_url, students, barrier=None):
+    llm_provider = setup(db_path, base_url)
+    start = threading.Barrier(students)
+
+    def student(_):
+        start.wait()
+        return llm_provider.complete(TIP, max_tokens=60)
+
+    if barrier is not None:
+        barrier.wait()
+    with ThreadPoolExecutor(max_workers=students) as pool:
+        replies = list(pool.map(student, range(students)))
+    return len(set(replies))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--students", type=int, default=200)
+    parser.add_argument("--procs", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=40)
+    parser.add_argument("--latency", type=float, default=0.3)
+    args = parser.parse_args()
+
+    from ai import llm_scheduler, stub_server
+    stats = {}
+    server, base_url = stub_server.start(latency=args.latency, stats=stats)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        stats.clear()
+        start = time.perf_counter()
+        distinct = burst(os.path.join(tmp, "burst.db"), base_url, args.students)
+        print(f"burst   {args.students} students  {(time.perf_counter() - start) * 1000:7.1f}ms  "
+              f"upstream={stats.get('requests', 0)}  distinct replies={distinct}  "
+              f"coalesced={llm_scheduler.stats()['coalesced']}")
+
+        stats.clear()
+        db_path = os.path.join(tmp, "procs.db")
+        setup(db_path, base_url)
+        context = multiprocessing.get_context("spawn")
+        barrier = context.Barrier(args.procs)
+        start = time.perf_counter()
+        processes = [context.Process(target=burst, args=(db_path, base_url, args.students // args.procs, barrier))
+                     for _ in range(args.procs)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        print(f"procs   {args.procs}x{args.students // args.procs} students  "
+              f"{(time.perf_counter() - start) * 1000:7.1f}ms  upstream={stats.get('requests', 0)}")
+
+        stats.clear()
+        llm_scheduler.GLOBAL_RPM, llm_scheduler.GLOBAL_BURST = 600, 5
+        llm_scheduler.USER_RPM, llm_scheduler.USER_BURST = 300, 5
+        llm_provider = setup(os.path.join(tmp, "limited.db"), base_url)
+        waits = {llm_scheduler.HIGH: [], llm_scheduler.LOW: []}
+
+        def call(i):
+            priority = llm_scheduler.HIGH if i % 2 else llm_scheduler.LOW
+            with llm_scheduler.user(f"student{i % 4}"):
+                started = time.perf_counter()
+                llm_provider.complete([{"role": "user", "content": f"Explain topic {i}"}], priority=priority)
+            waits[priority].append(time.perf_counter() - started)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.requests) as pool:
+            list(pool.map(call, range(args.requests)))
+        queue = llm_scheduler.stats()
+        print(f"limited {args.requests} calls at 10/s  {(time.perf_counter() - start) * 1000:7.1f}ms  "
+              f"upstream={stats.get('requests', 0)}  max depth={queue['max_depth']}  "
+              f"wait p50={queue['wait_p50_ms']:.0f}ms p95={queue['wait_p95_ms']:.0f}ms")
+        for priority, label in ((llm_scheduler.HIGH, "HIGH"), (llm_scheduler.LOW, "LOW")):
+            values = waits[priority]
+            print(f"        {label:4s} mean latency {sum(values) / len(values) * 1000:7.1f}ms")
+
+    server.shutdown()
+    server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+# Study-plan generation throughput, as in a nightly bulk regeneration.
+#
+#   python -m benchmarks.bench_plan_schedule --plans 10000
+#
+# Builds --plans random plans (language, start date, 1-12 weeks) and times
+# three ways of scheduling them: the old one-dict-per-plan Python loop, the
+# per-plan build_schedule, and the bulk build_schedules. With --write the bulk
+# rows are also inserted into plan_days of a temporary database in one
+# transaction, which is what a nightly job would do.
+import argparse
+import datetime
+import os
+import random
+import tempfile
+import time
+
+import pandas as pd
+
+from utils import db, planner_utils
+from utils.migrations import migrate
+
+LANGUAGES = ("Python", "Java", "C++", "JavaScript")
+
+
+def syllabus(language):
+    topics = [f"{language} topic {i}" for i in range(15)]
+    weights = [1.0 + (i % 3) for i in range(15)]
+    return topics, weights
+
+
+def legacy_schedule(topics, total_days):
+    # The loop create_study_schedule used to run: always from today, topics in
+    # order one per day, revision for the rest.
+    plan = {}
+    days = list(pd.date_range(datetime.date.today(), periods=total_days).date)
+    i = 0
+    for day in days:
+        if i < len(topics):
+            plan[str(day)] = topics[i]
+            i += 1 if len(topics) <= total_days else 0
+        else:
+            plan[str(day)] = "📝 Revision / Practice"
+    return plan
+
+
+def make_plans(n, rng):
+    today = datetime.date.today()
+    return pd.DataFrame({
+        "plan_id": range(1, n + 1),
+        "username": [f"user{i}" for i in range(n)],
+        "language": [rng.choice(LANGUAGES) for _ in range(n)],
+        "start_date": [str(today + datetime.timedelta(days=rng.randrange(60))) for _ in range(n)],
+        "total_days": [7 * rng.randint(1, 12) for _ in range(n)],
+    })
+
+
+def timed(label, n, func):
+    start = time.perf_counter()
+    days = func()
+    elapsed = time.perf_counter() - start
+    print(f"{label:9s} {elapsed * 1000:9.1f}ms  {n / elapsed:12,.0f} plans/s  {days / elapsed:14,.0f} days/s")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--plans", type=int, default=10_000)
+    parser.add_argument("--revision-every", type=int, default=4)
+    parser.add_argument("--rest-days", default="6", help="comma-separated weekday numbers, Monday = 0")
+    parser.add_argument("--write", action="store_true")
+    parser.add_argument("--seed", type=int, default=11)
+    args = parser.parse_args()
+    rest = tuple(int(d) for d in args.rest_days.split(",") if d)
+    plans = make_plans(args.plans, random.Random(args.seed))
+    rows = list(plans.itertuples(index=False))
+
+    timed("legacy", len(rows), lambda: sum(
+        len(legacy_schedule(syllabus(p.language)[0], p.total_days)) for p in rows))
+
+    def per_plan():
+        days = 0
+        for p in rows:
+            topics, weights = syllabus(p.language)
+            days += len(planner_utils.build_schedule(topics, p.start_date, p.total_days, weights,
+                                                     args.revision_every, rest))
+        return days
+
+    timed("per-plan", len(rows), per_plan)
+
+    result = {}
+
+    def bulk():
+        result["frame"] = planner_utils.build_schedules(plans, syllabus, args.revision_every, rest)
+        return len(result["frame"])
+
+    timed("bulk", len(rows), bulk)
+
+    if args.write:
+        with tempfile.TemporaryDirectory() as tmp:
+            db.DB_PATH = os.path.join(tmp, "plans.db")
+            migrate()
+            frame = result["frame"]
+
+            def write():
+                db.execute_many("INSERT INTO plan_days (username, plan_id, day, topic) VALUES (?, ?, ?, ?)",
+                                frame[["username", "plan_id", "day", "topic"]].to_numpy(dtype=object).tolist())
+                return len(frame)
+
+            timed("write", len(rows), write)
+            db.close_all()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+# Spaced-repetition simulation over a large deck.
+#
+#   python -m benchmarks.bench_spaced_repetition --cards 50000 --days 30
+#
+# Seeds one deck, then simulates a student doing --reviews-per-day reviews on
+# each simulated day with a seeded recall model. Reports how long picking the
+# next due card and recording a grade take; both should stay flat as the
+# deck grows because each is an index seek, not a scan.
+import argparse
+import math
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from utils import db, flashcard_store, spaced_repetition
+from utils.migrations import migrate
+
+
+def percentile(values, q):
+    return statistics.quantiles(values, n=100)[q - 1] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cards", type=int, default=50_000)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--reviews-per-day", type=int, default=300)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_PATH = os.path.join(tmp, "srs.db")
+        migrate()
+        deck_id = flashcard_store.create_deck("bench", "srs", [
+            {"question": f"Q{i}", "answer": f"A{i}"} for i in range(args.cards)
+        ])
+
+        pick_times, grade_times = [], []
+        now = time.time()
+        start = time.perf_counter()
+        for day in range(args.days):
+            for _ in range(args.reviews_per_day):
+                t0 = time.perf_counter()
+                card = spaced_repetition.next_due_card(deck_id, now)
+                t1 = time.perf_counter()
+                if card is None:
+                    break
+                # Seeded per-card difficulty: some cards are easier to recall than others.
+                recall = 1 - math.exp(-1.5 * (1 + card[0] % 5))
+                quality = rng.choice((4, 5)) if rng.random() < recall else 1
+                spaced_repetition.record_review(card[0], quality, now)
+                pick_times.append(t1 - t0)
+                grade_times.append(time.perf_counter() - t1)
+                now += 30
+            now += spaced_repetition.DAY
+        spaced_repetition.review_log.flush()
+        elapsed = time.perf_counter() - start
+
+        due, new = spaced_repetition.due_counts(deck_id, now)
+        logged = db.fetch_one("SELECT COUNT(*) FROM review_log")[0]
+        print(f"cards={args.cards:,} days={args.days} reviews={len(pick_times):,} ({len(pick_times) / elapsed:,.0f}/s)")
+        print(f"next card  p50={percentile(pick_times, 50):.3f}ms  p95={percentile(pick_times, 95):.3f}ms")
+        print(f"grade      p50={percentile(grade_times, 50):.3f}ms  p95={percentile(grade_times, 95):.3f}ms")
+        print(f"review_log rows={logged:,}  due now={due:,}  never studied={new:,}")
+        db.close_all()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+# Dashboard query latency as study_log grows.
+#
+#   python -m benchmarks.bench_study_log_growth --rows 10000 100000 1000000
+#
+# Seeds a deterministic study_log (fixed rows per user, so the answer size
+# stays constant). It times the original per-user dashboard queries on the
+# unindexed baseline schema, then migrates and times the current dashboard
+# reads (plan lookup, weekly counts, streak, year calendar). The migrated
+# latency should stay flat while the unindexed scan grows with the table.
+import argparse
+import datetime
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+
+from utils import db, plan_store, study_log
+from utils.migrations import MIGRATIONS, migrate
+
+LEGACY_QUERIES = (
+    "SELECT language, goal, start_date, end_date, plan_json FROM planner WHERE username = ?",
+    "SELECT study_date FROM study_log WHERE username = ?",
+    "SELECT study_date FROM study_log WHERE username = ?",
+)
+
+
+def legacy_render(path, username):
+    for sql in LEGACY_QUERIES:
+        db.fetch_all(sql, (username,), path=path)
+
+
+def current_render(path, username):
+    today = datetime.date.today()
+    plan_id = plan_store.get_plan(username)[0]
+    plan_store.progress(plan_id, today)
+    plan_store.get_days(plan_id, today, today + datetime.timedelta(days=6))
+    study_log.get_weekly_study_data(username, today)
+    study_log.get_streak(username, today)
+    study_log.get_daily_counts(username, today - datetime.timedelta(days=364), today)
+
+
+def seed(path, rows, rows_per_user, rng):
+    conn = sqlite3.connect(path)
+    for statement in MIGRATIONS[0][1]:
+        conn.execute(statement)
+    users = max(1, rows // rows_per_user)
+    today = datetime.date.today()
+    conn.executemany("INSERT INTO planner VALUES (?, ?, ?, ?, ?, ?, ?)",
+                     ((f"user{u}", "Python", "Bench", str(today), str(today), 28, "{}") for u in range(users)))
+    batch = []
+    for i in range(rows):
+        batch.append((f"user{rng.randrange(users)}", str(today - datetime.timedelta(days=rng.randrange(365)))))
+        if len(batch) == 50_000:
+            conn.executemany("INSERT INTO study_log VALUES (?, ?)", batch)
+            batch.clear()
+    conn.executemany("INSERT INTO study_log VALUES (?, ?)", batch)
+    conn.execute("PRAGMA user_version = 1")
+    conn.commit()
+    conn.close()
+    return users
+
+
+def time_queries(render, path, users, samples, rng):
+    timings = []
+    for _ in range(samples):
+        username = f"user{rng.randrange(users)}"
+        start = time.perf_counter()
+        render(path, username)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), statistics.quantiles(timings, n=20)[-1]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--rows-per-user", type=int, default=200)
+    parser.add_argument("--samples", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in args.rows:
+            rng = random.Random(args.seed)
+            path = os.path.join(tmp, f"growth_{rows}.db")
+            users = seed(path, rows, args.rows_per_user, rng)
+            before = time_queries(legacy_render, path, users, args.samples, rng)
+            db.DB_PATH = path
+            migrate(path)
+            after = time_queries(current_render, path, users, args.samples, rng)
+            print(f"rows={rows:>10,d}  unindexed p50={before[0]:8.3f}ms p95={before[1]:8.3f}ms"
+                  f"  migrated p50={after[0]:8.3f}ms p95={after[1]:8.3f}ms")
+            db.close_all()
+
+
+if __name__ == "__main__":
+    main()
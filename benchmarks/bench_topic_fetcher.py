@@ -0,0 +1,100 @@
+# Topic crawl against a local stand-in curriculum server.
+#
+#   python -m benchmarks.bench_topic_fetcher --pages 40 --latency 0.05
+#
+# Serves --pages generated curriculum pages from a threaded http.server on
+# localhost. Each response is delayed by --latency and carries an ETag and a
+# Last-Modified header. The crawl runs three times into temporary resource and
+# cache directories:
+#   cold  - empty cache, every page is a 200
+#   warm  - cached, every page should come back 304
+#   down  - server stopped, every page is served stale from disk
+# The server's counters show how many full bodies were actually sent.
+import argparse
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from utils import topic_fetcher
+
+LANGUAGES = ("Python", "Java", "C++", "JavaScript")
+MODIFIED = formatdate(time.time() - 86400, usegmt=True)
+
+
+def page(index):
+    sections = "".join(f"<h2>{index}.{i} Topic {index}-{i}</h2><p>{'text ' * 200}</p>" for i in range(8))
+    return f"<html><body><h1>Course page {index}</h1>{sections}</body></html>".encode()
+
+
+def make_handler(latency, counters):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(latency)
+            index = int(self.path.strip("/").split(".")[0] or 0)
+            body = page(index)
+            etag = '"' + hashlib.md5(body).hexdigest() + '"'
+            if self.headers.get("If-None-Match") == etag:
+                counters["304"] += 1
+                self.send_response(304)
+                self.end_headers()
+                return
+            counters["200"] += 1
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html")
+            self.send_header("ETag", etag)
+            self.send_header("Last-Modified", MODIFIED)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def run(label, sources, resource_dir, cache_dir, counters):
+    counters.update({"200": 0, "304": 0})
+    start = time.perf_counter()
+    summary = topic_fetcher.crawl(sources, resource_dir, cache_dir)
+    elapsed = time.perf_counter() - start
+    statuses = {}
+    for result in summary.values():
+        for status in result["pages"].values():
+            statuses[status] = statuses.get(status, 0) + 1
+    topics = sum(result["topics"] for result in summary.values())
+    print(f"{label:5s} {elapsed * 1000:8.1f}ms  server 200={counters['200']:3d} 304={counters['304']:3d}  "
+          f"{statuses}  topics={topics}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=40)
+    parser.add_argument("--latency", type=float, default=0.05)
+    args = parser.parse_args()
+
+    counters = {"200": 0, "304": 0}
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(args.latency, counters))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    sources = {language: [] for language in LANGUAGES}
+    for i in range(args.pages):
+        sources[LANGUAGES[i % len(LANGUAGES)]].append(f"{base}/{i}.html")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        resource_dir = os.path.join(tmp, "static_resources")
+        cache_dir = os.path.join(tmp, "http_cache")
+        run("cold", sources, resource_dir, cache_dir, counters)
+        run("warm", sources, resource_dir, cache_dir, counters)
+        server.shutdown()
+        server.server_close()
+        run("down", sources, resource_dir, cache_dir, counters)
+        print("resource files:", sorted(os.listdir(resource_dir)))
+
+
+if __name__ == "__main__":
+    main()
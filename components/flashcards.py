@@ -1,132 +1,238 @@
 import streamlit as st
-from ai.flashcard_gen import generate_flashcards
+from ai import job_queue
+from components.job_status import show_job
+from utils import file_parser, flashcard_import, flashcard_store, spaced_repetition
 import pandas as pd
 import io
+import math
+from datetime import datetime
+
+PAGE_SIZE_OPTIONS = [10, 25, 50]
+
+def get_user():
+    return st.session_state.get("username", "guest")
+
+def select_deck(deck_id):
+    # Session state only carries the deck id and cursors; cards stay in SQLite.
+    st.session_state.flashcard_deck_id = deck_id
+    st.session_state.flashcard_cursor = 0
+    st.session_state.flashcard_page = 0
+    st.session_state.show_answer = False
+
+def show_list_view(deck_id):
+    col_search, col_size = st.columns([3, 1])
+    with col_search:
+        query = st.text_input("🔍 Search flashcards", key="flashcard_search")
+    with col_size:
+        page_size = st.selectbox("Cards per page", PAGE_SIZE_OPTIONS, key="flashcard_page_size")
+
+    # A new search starts again from the first page.
+    if st.session_state.get("flashcard_last_search") != query:
+        st.session_state.flashcard_last_search = query
+        st.session_state.flashcard_cursor = 0
+        st.session_state.flashcard_page = 0
+
+    total = flashcard_store.count_cards(deck_id, query)
+    total_pages = max(1, math.ceil(total / page_size))
+    cursor = st.session_state.flashcard_cursor
+    page = min(st.session_state.flashcard_page, total_pages - 1)
+
+    col_prev, col_info, col_next = st.columns([1, 2, 1])
+    with col_prev:
+        go_prev = st.button("⬅️ Prev page", disabled=page == 0)
+    with col_next:
+        go_next = st.button("Next page ➡️", disabled=page >= total_pages - 1)
+
+    cards = flashcard_store.get_page(deck_id, cursor, page_size, query)
+    if go_next and cards:
+        cursor = cards[-1][0] + 1
+        page += 1
+        cards = flashcard_store.get_page(deck_id, cursor, page_size, query)
+    elif go_prev:
+        cards = flashcard_store.get_page(deck_id, cursor, page_size, query, backwards=True)
+        cursor = cards[0][0] if cards else 0
+        page = max(0, page - 1)
+    st.session_state.flashcard_cursor = cursor
+    st.session_state.flashcard_page = page
+
+    with col_info:
+        st.caption(f"Page {page + 1} of {total_pages} · {total} cards")
+
+    # Only the visible page gets widgets, so render cost is independent of deck size.
+    for offset, (card_id, question, answer) in enumerate(cards):
+        number = page * page_size + offset + 1
+        with st.expander(f"Flashcard {number}", expanded=False):
+            new_q = st.text_input("Question", value=question, key=f"question_{card_id}")
+            new_a = st.text_area("Answer", value=answer, height=100, key=f"answer_{card_id}")
+
+            col_edit, col_delete = st.columns([1, 1])
+            with col_edit:
+                if st.button("Save", key=f"save_{card_id}"):
+                    flashcard_store.update_card(card_id, new_q, new_a)
+                    st.success(f"Flashcard {number} updated.")
+            with col_delete:
+                if st.button("Delete", key=f"delete_{card_id}"):
+                    flashcard_store.delete_card(card_id)
+                    st.success(f"Flashcard {number} deleted.")
+                    st.rerun()
+
+def show_study_mode(deck_id):
+    # Cards come from the spaced-repetition schedule: due reviews first, then new cards.
+    due, new = spaced_repetition.due_counts(deck_id)
+    st.caption(f"{due} due for review · {new} new")
+
+    card = spaced_repetition.next_due_card(deck_id)
+    if card is None:
+        next_at = spaced_repetition.next_due_at(deck_id)
+        when = datetime.fromtimestamp(next_at).strftime("%Y-%m-%d %H:%M") if next_at else "later"
+        st.success(f"🎉 All caught up! Next review is due {when}.")
+        return
+
+    card_id, question, answer = card
+    st.markdown(f"**Q:** {question}")
+
+    if not st.session_state.show_answer:
+        if st.button("Show Answer"):
+            st.session_state.show_answer = True
+            st.rerun()
+    else:
+        st.info(f"**A:** {answer}")
+        st.markdown("How well did you remember it?")
+        for col, (label, quality) in zip(st.columns(len(spaced_repetition.GRADES)), spaced_repetition.GRADES.items()):
+            with col:
+                if st.button(label, key=f"grade_{label}"):
+                    spaced_repetition.record_review(card_id, quality)
+                    st.session_state.show_answer = False
+                    st.rerun()
 
 def show_flashcards():
     st.set_page_config(layout="wide")
     st.title("📇 AI Flashcard Generator")
     st.markdown("Convert your programming notes or definitions into interactive flashcards.")
 
+    username = get_user()
+
     col1, col2 = st.columns([2, 1])
     with col1:
         notes = st.text_area("Paste notes, concepts, or explanations below:", height=300, placeholder="e.g. Functions are reusable blocks of code...")
+        documents = st.file_uploader("...or upload notes, PDFs, Markdown, notebooks or source files",
+                                     type=file_parser.SUPPORTED_EXTENSIONS, accept_multiple_files=True)
 
     with col2:
         model_choice = st.selectbox("Summarization Model", ["OpenAI GPT-3.5", "HuggingFace T5-Small"])
 
-    # Session state initialization for flashcards, index, show_answer
-    if "flashcards_data" not in st.session_state:
-        st.session_state.flashcards_data = []
-    if "flashcard_index" not in st.session_state:
-        st.session_state.flashcard_index = 0
-    if "show_answer" not in st.session_state:
-        st.session_state.show_answer = False
+    # Session state initialization for the selected deck and show_answer
+    if "flashcard_deck_id" not in st.session_state:
+        decks = flashcard_store.list_decks(username)
+        select_deck(decks[0][0] if decks else None)
 
     if st.button("Generate Flashcards"):
-        if notes.strip():
-            with st.spinner("Generating flashcards..."):
-                flashcards = generate_flashcards(notes, model=model_choice)
-            if flashcards:
-                st.session_state.flashcards_data = flashcards
-                st.session_state.flashcard_index = 0
-                st.session_state.show_answer = False
-                st.success(f"Generated {len(flashcards)} flashcards!")
-            else:
-                st.error("No flashcards were generated. Please try a different input.")
+        if documents:
+            # Documents go to the worker as parse-cache hashes and are sent chunk by chunk.
+            try:
+                payload = {"model": model_choice, "files": file_parser.extract_all(documents)}
+                name = f"{documents[0].name} {datetime.now().strftime('%Y-%m-%d %H:%M')}"
+                st.session_state.flashcard_job = (job_queue.submit("flashcards", payload, username), name)
+            except ValueError as e:
+                st.error(str(e))
+        elif notes.strip():
+            payload = {"model": model_choice, "text": notes}
+            name = f"Generated {datetime.now().strftime('%Y-%m-%d %H:%M')}"
+            st.session_state.flashcard_job = (job_queue.submit("flashcards", payload, username), name)
         else:
             st.warning("Please provide some content to create flashcards.")
 
+    if "flashcard_notice" in st.session_state:
+        st.success(st.session_state.pop("flashcard_notice"))
+
+    if "flashcard_job" in st.session_state:
+        job_id, name = st.session_state.flashcard_job
+
+        def save_deck(flashcards):
+            # Runs once per job: a resubmission that reuses a finished job
+            # reopens the deck saved from it instead of writing a copy.
+            del st.session_state.flashcard_job
+            saved = st.session_state.setdefault("flashcard_saved_jobs", {})
+            if job_id in saved and saved[job_id] in {deck[0] for deck in flashcard_store.list_decks(username)}:
+                select_deck(saved[job_id])
+                st.session_state.flashcard_notice = "These notes were already turned into this deck."
+            else:
+                saved[job_id] = flashcard_store.create_deck(username, name, flashcards)
+                select_deck(saved[job_id])
+                st.session_state.flashcard_notice = f"Generated {len(flashcards)} flashcards!"
+            st.rerun()
+
+        def show_progress(progress):
+            st.progress(progress["chunks"] / progress["total"],
+                        text=f"{progress['cards']} cards from {progress['chunks']} of {progress['total']} chunks")
+
+        if show_job(job_id, save_deck, show_progress, label="Generating flashcards") is None:
+            del st.session_state.flashcard_job
+
     # Flashcard import
     st.divider()
     st.markdown("### 📥 Import Flashcards")
 
-    uploaded_file = st.file_uploader("Upload a CSV or TSV file", type=["csv", "txt", "tsv"])
+    uploaded_file = st.file_uploader("Upload a CSV, TSV or Anki (.apkg) file", type=flashcard_import.SUPPORTED_EXTENSIONS)
 
-    if uploaded_file:
-        try:
-            ext = uploaded_file.name.split('.')[-1]
-            if ext == "csv":
-                df = pd.read_csv(uploaded_file)
-            elif ext in ["tsv", "txt"]:
-                df = pd.read_csv(uploaded_file, sep="\t", header=None, names=["question", "answer"])
-            else:
-                st.warning("Unsupported file format.")
+    # The uploader keeps its file across reruns; import each upload only once.
+    upload_id = getattr(uploaded_file, "file_id", None) or getattr(uploaded_file, "name", None)
+    if uploaded_file and st.session_state.get("flashcard_import_id") != upload_id:
+        st.session_state.flashcard_import_id = upload_id
+        progress_bar = st.progress(0.0, text="Importing flashcards...")
 
-            if "question" in df.columns and "answer" in df.columns:
-                st.session_state.flashcards_data = df.to_dict(orient="records")
-                st.session_state.flashcard_index = 0
-                st.session_state.show_answer = False
-                st.success(f"Imported {len(st.session_state.flashcards_data)} flashcards successfully.")
-            else:
-                st.error("Invalid file structure. Please ensure it contains 'question' and 'answer' columns.")
+        def show_progress(rows, fraction):
+            progress_bar.progress(fraction, text=f"Imported {rows:,} flashcards...")
 
+        try:
+            deck_id, imported = flashcard_import.import_file(uploaded_file, uploaded_file.name, username, show_progress)
+            progress_bar.empty()
+            select_deck(deck_id)
+            st.success(f"Imported {imported} flashcards successfully.")
+        except ValueError as e:
+            progress_bar.empty()
+            st.error(str(e))
         except Exception as e:
+            progress_bar.empty()
             st.error(f"Error processing file: {e}")
 
+    decks = flashcard_store.list_decks(username)
+    if not decks:
+        return
+
+    st.divider()
+    deck_ids = [deck[0] for deck in decks]
+    labels = {deck_id: f"{name} ({count} cards)" for deck_id, name, count in decks}
+    current = st.session_state.flashcard_deck_id
+    chosen = st.selectbox("Deck", deck_ids, index=deck_ids.index(current) if current in deck_ids else 0,
+                          format_func=labels.get)
+    if chosen != current:
+        select_deck(chosen)
+    deck_id = chosen
+
     # Show flashcards if present
-    if st.session_state.flashcards_data:
-        st.divider()
+    total = flashcard_store.count_cards(deck_id)
+    if total:
         mode = st.radio("Review Mode", ["List View", "Study One-by-One"], horizontal=True)
 
         if mode == "List View":
-            for i, card in enumerate(st.session_state.flashcards_data):
-                with st.expander(f"Flashcard {i + 1}", expanded=False):
-                    q_key = f"question_{i}"
-                    a_key = f"answer_{i}"
-
-                    new_q = st.text_input("Question", value=card["question"], key=q_key)
-                    new_a = st.text_area("Answer", value=card["answer"], height=100, key=a_key)
-
-                    col_edit, col_delete = st.columns([1, 1])
-                    with col_edit:
-                        if st.button("Save", key=f"save_{i}"):
-                            st.session_state.flashcards_data[i] = {"question": new_q, "answer": new_a}
-                            st.success(f"Flashcard {i + 1} updated.")
-                    with col_delete:
-                        if st.button("Delete", key=f"delete_{i}"):
-                            del st.session_state.flashcards_data[i]
-                            st.success(f"Flashcard {i + 1} deleted.")
-                            st.experimental_rerun()
+            show_list_view(deck_id)
         else:
-            cards = st.session_state.flashcards_data
-            index = st.session_state.flashcard_index
-            total = len(cards)
-
-            st.subheader(f"Flashcard {index + 1} of {total}")
-            st.markdown(f"**Q:** {cards[index]['question']}")
-
-            if not st.session_state.show_answer:
-                if st.button("Show Answer"):
-                    st.session_state.show_answer = True
-            else:
-                st.info(f"**A:** {cards[index]['answer']}")
-
-            col1, col2, col3 = st.columns(3)
-            with col1:
-                if st.button("Previous") and index > 0:
-                    st.session_state.flashcard_index -= 1
-                    st.session_state.show_answer = False
-            with col2:
-                if st.button("Restart"):
-                    st.session_state.flashcard_index = 0
-                    st.session_state.show_answer = False
-            with col3:
-                if st.button("Next") and index < total - 1:
-                    st.session_state.flashcard_index += 1
-                    st.session_state.show_answer = False
+            show_study_mode(deck_id)
 
-    if st.session_state.flashcards_data:
+    if total:
         st.divider()
         st.markdown("### 📤 Export Flashcards")
 
-        # Convert flashcards to DataFrame
-        df = pd.DataFrame(st.session_state.flashcards_data)
+        # Exports stream the deck out of SQLite only when a download is clicked.
+        def export_csv():
+            return pd.DataFrame(flashcard_store.iter_cards(deck_id)).to_csv(index=False).encode('utf-8')
+
+        def export_tsv():
+            return pd.DataFrame(flashcard_store.iter_cards(deck_id)).to_csv(index=False, sep="\t", header=False).encode('utf-8')
 
         # CSV export
-        csv = df.to_csv(index=False).encode('utf-8')
-        st.download_button("📄 Download as CSV", csv, "flashcards.csv", "text/csv")
+        st.download_button("📄 Download as CSV", export_csv, "flashcards.csv", "text/csv")
 
         # Anki TSV export
-        tsv = df.to_csv(index=False, sep="\t", header=False).encode('utf-8')
-        st.download_button("🧠 Download for Anki", tsv, "anki_flashcards.txt", "text/tab-separated-values")
+        st.download_button("🧠 Download for Anki", export_tsv, "anki_flashcards.txt", "text/tab-separated-values")
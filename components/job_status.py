@@ -0,0 +1,44 @@
+import streamlit as st
+from ai import job_queue
+
+# Seconds between polls of a running job.
+POLL_SECONDS = 1.0
+
+
+def show_job(job_id, on_done, on_progress=None, label="Working…"):
+    # Renders a background job. While it is queued or running, only this
+    # fragment polls; the rest of the page stays interactive. on_done(result)
+    # renders a finished job, on_progress(progress) its partial output.
+    job = job_queue.get(job_id)
+    if job is None:
+        return None
+    active = job["status"] in job_queue.ACTIVE
+
+    @st.fragment(run_every=POLL_SECONDS if active else None)
+    def panel():
+        current = job_queue.get(job_id)
+        if current is None:
+            return
+        if current["status"] in job_queue.ACTIVE:
+            attempt = f" (attempt {current['attempts']} of {current['max_attempts']})" if current["attempts"] > 1 else ""
+            waiting = "Waiting for a worker" if current["status"] == "queued" else label
+            st.info(f"⏳ {waiting}{attempt}. You can keep using the app; this will be here when you come back.")
+            if current["error"]:
+                st.caption(f"Last attempt failed: {current['error']}")
+            if on_progress and current["progress"] is not None:
+                on_progress(current["progress"])
+            return
+        if active:
+            # Finished since the page was drawn: redraw the whole page once,
+            # without polling.
+            st.rerun()
+        if current["status"] == "done":
+            on_done(current["result"])
+        else:
+            st.error(f"⚠️ {current['error'] or 'The job failed.'}")
+            if st.button("Try again", key=f"job_retry_{job_id}"):
+                job_queue.retry(job_id)
+                st.rerun()
+
+    panel()
+    return job
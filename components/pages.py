@@ -0,0 +1,34 @@
+import importlib
+import os
+
+# Sidebar label -> (module, render function). Modules are imported the first
+# time their page is picked, so opening Login never loads plotly, the LLM client or
+# transformers. Python's module cache makes later visits free.
+PAGES = {
+    "Login": ("auth.login", "login_ui"),
+    "Dashboard": ("components.dashboard", "show_dashboard"),
+    "Planner": ("components.planner", "show_planner"),
+    "Notes Summarizer": ("components.summarizer", "show_summarizer"),
+    "Practice Questions": ("components.questions", "show_question_gen"),
+    "Flashcards": ("components.flashcards", "show_flashcards"),
+    "AI Tutor": ("components.tutor", "show_tutor"),
+    "Settings": ("components.settings", "show_settings"),
+    "Profiling": ("components.profiling", "show_profiling"),
+}
+
+# Pages listed in the sidebar only for usernames in CODEMATE_ADMINS.
+ADMIN_PAGES = {"Profiling"}
+ADMINS = {name.strip() for name in os.getenv("CODEMATE_ADMINS", "").split(",") if name.strip()}
+
+
+def is_admin(username):
+    return username in ADMINS
+
+
+def visible_pages(username):
+    return [name for name in PAGES if name not in ADMIN_PAGES or is_admin(username)]
+
+
+def load_page(name):
+    module_name, func_name = PAGES[name]
+    return getattr(importlib.import_module(module_name), func_name)
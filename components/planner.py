@@ -1,67 +1,20 @@
 import streamlit as st
 import pandas as pd
 import datetime
-import json
-import os
-import sqlite3
 from datetime import date
-
-DB_PATH = "data/user_data.db"
+from utils import plan_store, planner_utils, question_bank
+from utils.study_log import log_study_session
 
 def get_user():
     return st.session_state.get("username", "guest")
 
-def create_planner_table():
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS planner(
-            username TEXT,
-            language TEXT,
-            goal TEXT,
-            start_date TEXT,
-            end_date TEXT,
-            total_days INTEGER,
-            plan_json TEXT
-        )
-    ''')
-    conn.commit()
-    conn.close()
-
-def save_plan(username, language, goal, start_date, end_date, total_days, plan_dict):
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("DELETE FROM planner WHERE username = ?", (username,))
-    c.execute('INSERT INTO planner VALUES (?, ?, ?, ?, ?, ?, ?)',
-              (username, language, goal, start_date, end_date, total_days, json.dumps(plan_dict)))
-    conn.commit()
-    conn.close()
-
-def load_user_plan(username):
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("SELECT * FROM planner WHERE username = ?", (username,))
-    row = c.fetchone()
-    conn.close()
-    return row
-
-def log_study_session(username, study_date):
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS study_log (
-            username TEXT,
-            study_date TEXT
-        )
-    ''')
-    c.execute("INSERT INTO study_log (username, study_date) VALUES (?, ?)", (username, study_date))
-    conn.commit()
-    conn.close()
+def plan_label(plan):
+    plan_id, language, goal, start_date, end_date, total_days = plan
+    return f"{language} · {goal or 'No goal'} ({start_date} → {end_date})"
 
 def show_planner():
     st.title("📅 Personalized Study Planner")
 
-    create_planner_table()
     username = get_user()
 
     st.info("This planner helps break down your programming language goals into daily plans.")
@@ -71,63 +24,82 @@ def show_planner():
         goal = st.text_input("Your Learning Goal (e.g., Crack coding interviews, Learn OOPs, Build Projects)")
         start_date = st.date_input("Start Date", datetime.date.today())
         duration_weeks = st.slider("How many weeks do you want to study?", 1, 12, 4)
+        rest_days = st.multiselect("Rest days", planner_utils.WEEKDAYS, default=["Sunday"])
+        revision_every = st.slider("Revision day after every N study days (0 = none)", 0, 7, 4)
         submit = st.form_submit_button("Generate Study Plan")
 
     if submit:
         total_days = duration_weeks * 7
         end_date = start_date + datetime.timedelta(days=total_days)
-        topics = get_language_topics(language)
-        plan = create_study_schedule(topics, total_days)
-
-        save_plan(username, language, goal, str(start_date), str(end_date), total_days, plan)
-        st.success("Your study plan has been created!")
-
-    # Load and display user plan
-    user_plan = load_user_plan(username)
-    if user_plan:
-        st.subheader(f"📘 Study Plan for {user_plan[1]}")
-        st.markdown(f"**Goal:** {user_plan[2]}")
-        st.markdown(f"**Start Date:** {user_plan[3]}")
-        st.markdown(f"**End Date:** {user_plan[4]}")
-        st.markdown(f"**Total Days:** {user_plan[5]}")
-
-        plan_data = json.loads(user_plan[6])
-        today_str = str(date.today())
-        if today_str in plan_data:
-            log_study_session(username, today_str)
-            st.success("✅ Today's study session has been automatically logged.")
-        df = pd.DataFrame(list(plan_data.items()), columns=["Date", "Topic"])
-        st.dataframe(df, use_container_width=True)
+        topics, weights = get_language_topics(language)
+        rest_weekdays = planner_utils.weekday_numbers(rest_days)
+        if len(rest_weekdays) == 7:
+            st.error("Leave at least one day of the week for studying.")
+        else:
+            plan = planner_utils.build_schedule(topics, start_date, total_days, weights, revision_every, rest_weekdays)
+
+            # The new plan becomes the active one here and on the dashboard.
+            st.session_state["plan_id"] = plan_store.save_plan(
+                username, language, goal, start_date, end_date, total_days, plan, rest_weekdays, revision_every)
+            st.success("Your study plan has been created!")
+
+    plans = plan_store.list_plans(username)
+    if not plans:
+        return
+
+    # Several plans can run side by side; the selected one is shared with the dashboard.
+    plan_ids = [p[0] for p in plans]
+    current = st.session_state.get("plan_id")
+    index = plan_ids.index(current) if current in plan_ids else 0
+    if len(plans) > 1:
+        index = st.selectbox("Active plan", range(len(plans)), index=index,
+                             format_func=lambda i: plan_label(plans[i]))
+    plan_id, language, goal, start_date, end_date, total_days = plans[index]
+    st.session_state["plan_id"] = plan_id
+
+    st.subheader(f"📘 Study Plan for {language}")
+    st.markdown(f"**Goal:** {goal}")
+    st.markdown(f"**Start Date:** {start_date}")
+    st.markdown(f"**End Date:** {end_date}")
+    st.markdown(f"**Total Days:** {total_days}")
+
+    today = date.today()
+    today_entry = plan_store.get_day(plan_id, today)
+    if st.session_state.get("auto_log", True) and today_entry is not None:
+        log_study_session(username, str(today), source="planner")
+        st.success("✅ Today's study session has been automatically logged.")
+    # Opening the page is not studying: a day only counts as done when the student says so.
+    if today_entry is not None and today_entry[1] != "done":
+        if st.button(f"✔️ Mark today's topic done: {today_entry[0]}"):
+            log_study_session(username, str(today), source="planner")
+            plan_store.mark_day(plan_id, today)
+            st.rerun()
+    days = plan_store.get_days(plan_id)
+    missed = planner_utils.missed_days(days, today)
+    if missed:
+        st.warning(f"You missed {missed} planned day(s).")
+        if st.button("🔁 Reschedule missed topics"):
+            rest_weekdays, _ = plan_store.get_options(plan_id)
+            plan_store.replace_upcoming(plan_id, username, today, planner_utils.reschedule(days, today, rest_weekdays))
+            st.rerun()
+    df = pd.DataFrame(days, columns=["Date", "Topic", "Status"])
+    st.dataframe(df, use_container_width=True)
+
+    if st.button("🗑️ Delete this plan"):
+        plan_store.delete_plan(plan_id)
+        st.session_state.pop("plan_id", None)
+        st.rerun()
 
 def get_language_topics(language):
-    base_dir = "data/static_resources"
-    file_map = {
-        "Python": "py_questions.json",
-        "Java": "java_questions.json",
-        "C++": "cpp_questions.json",
-        "JavaScript": "js_questions.json"
-    }
-    file_path = os.path.join(base_dir, file_map[language])
-    if os.path.exists(file_path):
-        with open(file_path, "r") as f:
-            return json.load(f).get("topics", [])
+    # (topics, weights), parsed from the compiled question bank once per process.
+    topics, weights = question_bank.get_weighted_topics(language)
+    if topics:
+        return topics, weights
     else:
         # fallback list
-        return [
+        topics = [
             "Introduction", "Variables", "Data Types", "Operators", "Control Flow",
             "Functions", "Arrays/Lists", "Strings", "OOP Basics", "Advanced OOP",
             "File Handling", "Error Handling", "Recursion", "Libraries", "Project Work"
         ]
-
-def create_study_schedule(topics, total_days):
-    plan = {}
-    days = list(pd.date_range(datetime.date.today(), periods=total_days).date)
-    step = max(1, total_days // len(topics))
-    i = 0
-    for day in days:
-        if i < len(topics):
-            plan[str(day)] = topics[i]
-            i += 1 if len(topics) <= total_days else 0
-        else:
-            plan[str(day)] = "📝 Revision / Practice"
-    return plan
\ No newline at end of file
+        return topics, [1.0] * len(topics)
@@ -0,0 +1,61 @@
+import streamlit as st
+import pandas as pd
+from ai import job_queue, llm_scheduler, response_cache
+from components.pages import is_admin
+from utils import tracing
+
+def show_profiling():
+    st.title("⏱️ Profiling")
+
+    if not is_admin(st.session_state.get("username")):
+        st.error("This page is only available to administrators.")
+        return
+
+    st.subheader("LLM request queue")
+    queue = llm_scheduler.stats()
+    col1, col2, col3, col4, col5 = st.columns(5)
+    col1.metric("Queue depth", queue["depth"], help=f"Deepest so far: {queue['max_depth']}")
+    col2.metric("In flight (all processes)", queue["in_flight"])
+    col3.metric("Wait p50 / p95", f"{queue['wait_p50_ms']:.0f} / {queue['wait_p95_ms']:.0f} ms")
+    col4.metric("Coalesced", queue["coalesced"] + queue["shared"], help="Calls answered by an identical call in flight")
+    col5.metric("Throttled / timed out", f"{queue['throttled']} / {queue['timeouts']}")
+    st.caption(f"Background jobs waiting for a worker: {job_queue.queue_depth()}")
+
+    st.subheader("LLM response cache")
+    cache = response_cache.stats()
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Hit rate", f"{cache['hit_rate']:.0%}", help=f"{cache['hits']} hits, {cache['misses']} misses")
+    col2.metric("Writes", cache["writes"])
+    col3.metric("Evicted", cache["evictions"])
+    col4.metric("Bypassed", cache["bypassed"], help="Calls made with the cache turned off")
+    if not response_cache.ENABLED:
+        st.caption("The cache is off (CODEMATE_LLM_CACHE).")
+
+    st.subheader("Spans")
+    if not tracing.ENABLED:
+        st.info("Tracing is off. Start the app with CODEMATE_TRACING=1 to collect spans.")
+
+    rows = tracing.snapshot()
+    if not rows:
+        st.markdown("No spans recorded yet. Use the app for a bit and come back.")
+        return
+
+    df = pd.DataFrame(rows)
+    pages = ["All"] + sorted(df["page"].unique())
+    selected = st.selectbox("Page", pages)
+    if selected != "All":
+        df = df[df["page"] == selected]
+
+    st.dataframe(df.sort_values("total_ms", ascending=False).round(2), use_container_width=True, hide_index=True)
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        if st.button("💾 Export JSON"):
+            st.success(f"Wrote {tracing.export_json()}")
+    with col2:
+        if st.button("📈 Export Prometheus"):
+            st.success(f"Wrote {tracing.export_prometheus()}")
+    with col3:
+        if st.button("🧹 Reset"):
+            tracing.reset()
+            st.rerun()
@@ -1,7 +1,9 @@
 
 
 import streamlit as st
-from ai.question_gen import generate_questions
+from ai import job_queue, llm_scheduler
+from components.job_status import show_job
+from utils import question_bank
 
 def show_question_gen():
     st.set_page_config(layout="wide")
@@ -25,26 +27,56 @@ def show_question_gen():
             st.warning("Please enter a topic to generate questions.")
             return
 
-        with st.spinner("Generating questions..."):
-            questions = generate_questions(language, topic, difficulty, num_questions)
+        # Serve from the offline question bank first and only generate what it
+        # lacks, as a background job that outlives reruns and page switches.
+        try:
+            banked = question_bank.find_questions(language, topic, difficulty, num_questions)
+        except Exception:
+            banked = []
+        job_id = None
+        if len(banked) < num_questions:
+            payload = {"language": language, "topic": topic, "difficulty": difficulty,
+                       "count": num_questions - len(banked)}
+            job_id = job_queue.submit("questions", payload, st.session_state.get("username"),
+                                      priority=llm_scheduler.HIGH)
+        st.session_state.question_set = {"banked": banked, "job": job_id,
+                                         "title": f"{language} - {topic} [{difficulty}]"}
 
-        if not questions or "question" not in questions[0]:
+    if "question_set" not in st.session_state:
+        return
+    question_set = st.session_state.question_set
+    banked = question_set["banked"]
+
+    def show_questions(generated, done):
+        # Cards are rendered as each question arrives instead of after the whole set.
+        for idx, q in enumerate(banked + generated, 1):
+            show_card(idx, q)
+        count = len(banked) + len(generated)
+        if done and not count:
             st.error("⚠️ Failed to generate questions. Try again.")
-            return
+        elif done:
+            st.success(f"✅ Generated {count} questions for {question_set['title']}")
+
+    if question_set["job"] is None:
+        show_questions([], True)
+        return
+    job = show_job(question_set["job"], lambda questions: show_questions(questions, True),
+                   lambda progress: show_questions(progress["questions"], False), label="Generating questions")
+    if job is None:
+        del st.session_state.question_set
+
+
+def show_card(idx, q):
+    card_color = {
+        "MCQ": "#FFF4E5",
+        "Short Answer": "#E5F4FF",
+        "Coding": "#E8FFE5",
+        "Error": "#FFE5E5"
+    }.get(q.get("type", "Short Answer"), "#F9F9F9")
 
-        st.success(f"✅ Generated {len(questions)} questions for {language} - {topic} [{difficulty}]")
-
-        for idx, q in enumerate(questions, 1):
-            card_color = {
-                "MCQ": "#FFF4E5",
-                "Short Answer": "#E5F4FF",
-                "Coding": "#E8FFE5",
-                "Error": "#FFE5E5"
-            }.get(q.get("type", "Short Answer"), "#F9F9F9")
-
-            with st.container():
-                st.markdown(f"""
-                <div style="background-color:{card_color}; padding:15px; border-radius:8px; margin-bottom:10px;">
-                    <strong>Q{idx} [{q.get("type")}]:</strong><br>{q.get("question")}
-                </div>
-                """, unsafe_allow_html=True)
\ No newline at end of file
+    with st.container():
+        st.markdown(f"""
+        <div style="background-color:{card_color}; padding:15px; border-radius:8px; margin-bottom:10px;">
+            <strong>Q{idx} [{q.get("type")}]:</strong><br>{q.get("question")}
+        </div>
+        """, unsafe_allow_html=True)
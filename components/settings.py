@@ -18,6 +18,7 @@ def show_settings():
             streak_toggle = st.toggle("🔥 Productivity Streaks & Badges", value=st.session_state.get("show_streak", True))
             heatmap_toggle = st.toggle("📆 Calendar Heatmap", value=st.session_state.get("show_heatmap", True))
             auto_log_toggle = st.toggle("📝 Auto Log Session in Planner", value=st.session_state.get("auto_log", True))
+            timings_toggle = st.toggle("⏱️ Show Dashboard Section Timings", value=st.session_state.get("show_timings", False))
 
         submitted = st.form_submit_button("Save Settings")
 
@@ -28,5 +29,6 @@ def show_settings():
         st.session_state["show_streak"] = streak_toggle
         st.session_state["show_heatmap"] = heatmap_toggle
         st.session_state["auto_log"] = auto_log_toggle
+        st.session_state["show_timings"] = timings_toggle
 
         st.success("✅ Settings updated successfully!")
\ No newline at end of file
@@ -1,7 +1,11 @@
-
-
+import itertools
 import streamlit as st
-from ai.summarizer import summarize_text
+from ai import job_queue, llm_scheduler
+from components.job_status import show_job
+from utils import file_parser
+
+# Sections of the uploaded files shown in the preview box.
+PREVIEW_SECTIONS = 3
 
 def show_summarizer():
     st.title("📝 Notes Summarizer")
@@ -10,21 +14,65 @@ def show_summarizer():
     mode = st.radio("Choose Input Method", ["Paste Text", "Upload File"])
 
     user_input = ""
+    uploaded_files = []
     if mode == "Paste Text":
         user_input = st.text_area("Enter your notes here:", height=300)
     else:
-        uploaded_file = st.file_uploader("Upload a .txt file", type=["txt"])
-        if uploaded_file is not None:
-            user_input = uploaded_file.read().decode("utf-8")
-            st.text_area("File Content", user_input, height=300)
+        uploaded_files = st.file_uploader("Upload notes, PDFs, Markdown, notebooks or source files",
+                                          type=file_parser.SUPPORTED_EXTENSIONS, accept_multiple_files=True)
+        if uploaded_files:
+            try:
+                upload = extract_uploads(uploaded_files)
+            except ValueError as e:
+                st.error(str(e))
+                return
+            user_input = upload["preview"]
+            st.text_area("File Content (preview)", user_input, height=300)
 
     model_choice = st.selectbox("Select Summarization Model", ["OpenAI GPT-3.5", "HuggingFace T5-Small"])
 
     if st.button("Summarize"):
         if user_input.strip():
-            with st.spinner("Generating summary..."):
-                summary = summarize_text(user_input, model=model_choice)
-            st.subheader("🔍 Summary:")
-            st.success(summary)
+            # Runs as a background job; uploads go by their parse-cache hashes,
+            # which the worker reads back section by section.
+            payload = {"model": model_choice}
+            if uploaded_files:
+                payload["files"] = upload["keyed"]
+            else:
+                payload["text"] = user_input
+            st.session_state.summary_job = job_queue.submit("summarize", payload, st.session_state.get("username"),
+                                                            priority=llm_scheduler.LOW)
         else:
-            st.warning("Please provide some input to summarize.")
\ No newline at end of file
+            st.warning("Please provide some input to summarize.")
+
+    if "summary_job" in st.session_state:
+        show_job(st.session_state.summary_job, show_summary, show_partials, label="Generating summary")
+
+
+def extract_uploads(uploaded_files):
+    # Parses a set of uploads once: reruns reuse their parse-cache hashes and
+    # preview from session state, re-extracting only if the set changed or
+    # the cache evicted one of them.
+    ids = [upload.file_id for upload in uploaded_files]
+    cached = st.session_state.get("summarizer_upload")
+    if cached is None or cached["ids"] != ids or not all(file_parser.is_cached(key) for _, key in cached["keyed"]):
+        with st.spinner("Extracting text..."):
+            keyed = file_parser.extract_all(uploaded_files)
+            sections = list(itertools.islice(file_parser.iter_cached_files(keyed), PREVIEW_SECTIONS))
+        cached = st.session_state.summarizer_upload = {
+            "ids": ids,
+            "keyed": keyed,
+            "preview": "\n\n".join(f"{title}\n{text}" for title, text in sections),
+        }
+    return cached
+
+
+def show_partials(progress):
+    with st.expander(f"Partial summaries ({len(progress['partials'])} sections so far)", expanded=False):
+        for index, summary in enumerate(progress["partials"], 1):
+            st.markdown(f"**Section {index}:** {summary}")
+
+
+def show_summary(summary):
+    st.subheader("🔍 Summary:")
+    st.success(summary)
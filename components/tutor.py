@@ -0,0 +1,61 @@
+import streamlit as st
+from ai import llm_chat
+
+def get_user():
+    return st.session_state.get("username", "guest")
+
+def select_conversation(username):
+    # None is a new chat; it is only stored once its first message is sent.
+    conversations = llm_chat.list_conversations(username)
+    ids = [conversation_id for conversation_id, _ in conversations]
+    titles = dict(conversations)
+
+    col1, col2 = st.columns([4, 1])
+    with col2:
+        if st.button("➕ New chat"):
+            st.session_state.tutor_conversation_id = None
+    current = st.session_state.get("tutor_conversation_id", ids[0] if ids else None)
+    options = [None] + ids
+    with col1:
+        chosen = st.selectbox("Conversation", options, index=options.index(current) if current in options else 0,
+                              format_func=lambda conversation_id: titles.get(conversation_id, "New chat"))
+    st.session_state.tutor_conversation_id = chosen
+    return chosen
+
+def show_tutor():
+    st.title("🧑‍🏫 AI Tutor")
+    st.markdown("Ask programming questions and get step-by-step explanations.")
+
+    username = get_user()
+    conversation_id = select_conversation(username)
+
+    for role, content, ttft_ms in llm_chat.get_messages(conversation_id) if conversation_id else []:
+        with st.chat_message(role):
+            st.markdown(content)
+            if ttft_ms is not None:
+                st.caption(f"First token after {ttft_ms:.0f} ms")
+
+    prompt = st.chat_input("Ask the tutor...")
+    if prompt:
+        if conversation_id is None:
+            conversation_id = st.session_state.tutor_conversation_id = llm_chat.create_conversation(username)
+        with st.chat_message("user"):
+            st.markdown(prompt)
+        with st.chat_message("assistant"):
+            # Tokens render as they arrive instead of after the whole reply.
+            metrics = {}
+            st.write_stream(llm_chat.stream_reply(conversation_id, prompt, metrics))
+            if "ttft_ms" in metrics:
+                st.caption(f"First token after {metrics['ttft_ms']:.0f} ms · "
+                           f"{metrics['total_ms'] / 1000:.1f} s total · {metrics['prompt_tokens']} prompt tokens")
+
+    stats = llm_chat.latency_stats(username)
+    if stats:
+        with st.expander("⏱️ Tutor response times", expanded=False):
+            st.markdown(f"Time to first token over your last {stats['replies']} replies: "
+                        f"p50 **{stats['p50_ms']:.0f} ms**, p95 **{stats['p95_ms']:.0f} ms**")
+
+    if conversation_id and st.button("🗑️ Delete this conversation"):
+        llm_chat.delete_conversation(conversation_id)
+        st.session_state.pop("tutor_conversation_id", None)
+        st.rerun()
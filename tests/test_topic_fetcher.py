@@ -0,0 +1,126 @@
+import hashlib
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from utils import topic_fetcher
+
+PAGES = {
+    "/python.html": "<html><body><h1>Tutorial</h1><h2>1. Loops</h2><p>x</p><h2>2. Classes</h2>"
+                    "<h3>2.1 Inheritance</h3></body></html>",
+}
+
+
+class Handler(BaseHTTPRequestHandler):
+    counters = None
+
+    def do_GET(self):
+        body = PAGES.get(self.path)
+        if body is None:
+            self.send_response(404)
+            self.end_headers()
+            return
+        body = body.encode()
+        etag = '"' + hashlib.md5(body).hexdigest() + '"'
+        if self.headers.get("If-None-Match") == etag:
+            self.counters["304"] += 1
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.counters["200"] += 1
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    counters = {"200": 0, "304": 0}
+    handler = type("CountingHandler", (Handler,), {"counters": counters})
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    httpd.base_url = f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.counters = counters
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_fetch_then_not_modified_then_stale(server, tmp_path):
+    url = server.base_url + "/python.html"
+    session = topic_fetcher.make_session()
+    body, status = topic_fetcher.fetch(session, url, str(tmp_path))
+    assert status == "fetched"
+    assert body == PAGES["/python.html"].encode()
+
+    body, status = topic_fetcher.fetch(session, url, str(tmp_path))
+    assert status == "not-modified"
+    assert body == PAGES["/python.html"].encode()
+    assert server.counters == {"200": 1, "304": 1}
+
+    server.shutdown()
+    server.server_close()
+    body, status = topic_fetcher.fetch(topic_fetcher.make_session(), url, str(tmp_path))
+    assert status == "stale"
+    assert body == PAGES["/python.html"].encode()
+
+
+def test_fetch_without_cache_raises_when_server_is_down(server, tmp_path):
+    url = server.base_url + "/python.html"
+    server.shutdown()
+    server.server_close()
+    with pytest.raises(topic_fetcher.requests.RequestException):
+        topic_fetcher.fetch(topic_fetcher.make_session(), url, str(tmp_path))
+
+
+def test_cache_write_is_atomic(server, tmp_path, monkeypatch):
+    url = server.base_url + "/python.html"
+    topic_fetcher.fetch(topic_fetcher.make_session(), url, str(tmp_path))
+    meta_path, body_path = topic_fetcher._cache_paths(url, str(tmp_path))
+    before = {path: open(path, "rb").read() for path in (meta_path, body_path)}
+    assert not [name for name in os.listdir(tmp_path) if name.startswith(".tmp-")]
+
+    def fail(src, dst):
+        raise OSError("disk full")
+
+    # A write that fails before the rename leaves the old entry intact and
+    # no temp file behind.
+    monkeypatch.setattr(topic_fetcher.os, "replace", fail)
+    with pytest.raises(OSError):
+        topic_fetcher._write_atomic(body_path, b"partial")
+    assert {path: open(path, "rb").read() for path in (meta_path, body_path)} == before
+    assert not [name for name in os.listdir(tmp_path) if name.startswith(".tmp-")]
+
+
+def test_crawl_merges_topics_and_keeps_questions(server, tmp_path):
+    resource_dir = tmp_path / "static_resources"
+    resource_dir.mkdir()
+    questions = [{"topic": "Loops", "question": "What does break do?", "difficulty": "Easy"}]
+    path = resource_dir / "py_questions.json"
+    path.write_text(json.dumps({"topics": [{"topic": "Loops", "weight": 2}, "Functions"], "questions": questions}))
+
+    summary = topic_fetcher.crawl({"Python": [server.base_url + "/python.html"]}, str(resource_dir),
+                                  str(tmp_path / "cache"), parse_workers=1)
+
+    assert summary["Python"]["written"] is True
+    data = json.loads(path.read_text())
+    assert data["topics"] == [{"topic": "Loops", "weight": 2}, "Functions", "Classes", "Inheritance"]
+    assert data["questions"] == questions
+
+    # A second crawl finds nothing new and leaves the file alone.
+    mtime = os.path.getmtime(path)
+    summary = topic_fetcher.crawl({"Python": [server.base_url + "/python.html"]}, str(resource_dir),
+                                  str(tmp_path / "cache"), parse_workers=1)
+    assert summary["Python"]["pages"] == {server.base_url + "/python.html": "not-modified"}
+    assert summary["Python"]["written"] is False
+    assert os.path.getmtime(path) == mtime
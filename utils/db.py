@@ -0,0 +1,228 @@
+import atexit
+import logging
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from utils import tracing
+
+DB_PATH = os.getenv("CODEMATE_DB_PATH", "data/user_data.db")
+POOL_SIZE = int(os.getenv("CODEMATE_DB_POOL_SIZE", "8"))
+
+log = logging.getLogger(__name__)
+
+# Applied to every pooled connection. WAL lets readers run alongside a writer,
+# busy_timeout makes writers wait instead of failing with "database is locked".
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-16000",
+    "PRAGMA foreign_keys=ON",
+)
+
+# Size of sqlite3's per-connection prepared statement cache.
+STATEMENT_CACHE_SIZE = 256
+
+
+class ConnectionPool:
+    def __init__(self, path, size=POOL_SIZE):
+        self.path = path
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(
+            self.path,
+            timeout=5,
+            check_same_thread=False,
+            cached_statements=STATEMENT_CACHE_SIZE,
+            isolation_level=None,
+        )
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                try:
+                    return self._connect()
+                except Exception:
+                    self._created -= 1
+                    raise
+        return self._idle.get()
+
+    def release(self, conn):
+        if conn.in_transaction:
+            conn.rollback()
+        self._idle.put(conn)
+
+    def close(self):
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._created -= 1
+
+
+_pools = {}
+_pools_pid = os.getpid()
+_pools_lock = threading.Lock()
+
+
+def get_pool(path=None):
+    global _pools, _pools_pid
+    path = path or DB_PATH
+    with _pools_lock:
+        # Connections must never cross a fork, so each process builds its own pools.
+        if _pools_pid != os.getpid():
+            _pools = {}
+            _pools_pid = os.getpid()
+        pool = _pools.get(path)
+        if pool is None:
+            pool = _pools[path] = ConnectionPool(path)
+        return pool
+
+
+def close_all():
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
+
+
+@contextmanager
+def connection(path=None):
+    pool = get_pool(path)
+    conn = pool.acquire()
+    try:
+        yield conn
+    finally:
+        pool.release(conn)
+
+
+@contextmanager
+def transaction(path=None):
+    # BEGIN IMMEDIATE takes the write lock up front so two writers queue on
+    # busy_timeout instead of deadlocking when a read lock is upgraded.
+    with connection(path) as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.rollback()
+            raise
+        else:
+            conn.commit()
+
+
+def fetch_one(sql, params=(), path=None):
+    with tracing.span("db.fetch_one"), connection(path) as conn:
+        return conn.execute(sql, params).fetchone()
+
+
+def fetch_all(sql, params=(), path=None):
+    with tracing.span("db.fetch_all"), connection(path) as conn:
+        return conn.execute(sql, params).fetchall()
+
+
+def execute(sql, params=(), path=None):
+    with tracing.span("db.execute"), transaction(path) as conn:
+        return conn.execute(sql, params).rowcount
+
+
+def execute_many(sql, rows, path=None):
+    with tracing.span("db.execute_many"), transaction(path) as conn:
+        return conn.executemany(sql, rows).rowcount
+
+
+class WriteBuffer:
+    # Collects rows for one INSERT statement and writes them with a single
+    # executemany, once max_rows are queued or max_delay seconds have passed.
+    # With unique=True a row already waiting in the buffer is not queued again.
+    # on_flush(rows) is called after rows have been written successfully.
+    def __init__(self, sql, max_rows=100, max_delay=2.0, path=None, unique=False, on_flush=None):
+        self.sql = sql
+        self.max_rows = max_rows
+        self.max_delay = max_delay
+        self.path = path
+        self.unique = unique
+        self.on_flush = on_flush
+        self._rows = []
+        self._queued = set()
+        self._lock = threading.Lock()
+        self._timer = None
+        atexit.register(self._flush_quietly)
+
+    def _schedule(self):
+        # Called with self._lock held.
+        if self._timer is None:
+            self._timer = threading.Timer(self.max_delay, self._flush_quietly)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def add(self, row):
+        with self._lock:
+            if self.unique:
+                if row in self._queued:
+                    return
+                self._queued.add(row)
+            self._rows.append(row)
+            full = len(self._rows) >= self.max_rows
+            if not full:
+                self._schedule()
+        if full:
+            self.flush()
+
+    def flush(self):
+        # A failed write puts its rows back in front of anything queued since,
+        # and a timer retries them; the error is still raised to the caller.
+        with self._lock:
+            rows, self._rows = self._rows, []
+            self._queued.clear()
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        if not rows:
+            return 0
+        try:
+            execute_many(self.sql, rows, path=self.path)
+        except Exception:
+            with self._lock:
+                if self.unique:
+                    self._rows = rows + [row for row in self._rows if row not in set(rows)]
+                    self._queued = set(self._rows)
+                else:
+                    self._rows = rows + self._rows
+                self._schedule()
+            raise
+        if self.on_flush is not None:
+            self.on_flush(rows)
+        return len(rows)
+
+    def _flush_quietly(self):
+        # Timer and exit flushes have no caller to report to.
+        try:
+            self.flush()
+        except Exception:
+            log.exception("Buffered write failed; %d row(s) kept for the next flush", self.pending())
+
+    def pending(self):
+        with self._lock:
+            return len(self._rows)
@@ -0,0 +1,364 @@
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import re
+import shutil
+import tempfile
+import time
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor
+from utils import db
+
+TEXT_EXTENSIONS = ["txt"]
+MARKDOWN_EXTENSIONS = ["md", "markdown"]
+NOTEBOOK_EXTENSIONS = ["ipynb"]
+PDF_EXTENSIONS = ["pdf"]
+CODE_EXTENSIONS = ["py", "js", "ts", "java", "c", "h", "cpp", "hpp", "cc", "cs", "go", "rs", "rb", "php", "kt", "swift", "sql"]
+SUPPORTED_EXTENSIONS = TEXT_EXTENSIONS + MARKDOWN_EXTENSIONS + NOTEBOOK_EXTENSIONS + PDF_EXTENSIONS + CODE_EXTENSIONS
+
+# Upper bound on one section, so memory stays flat however large the file is.
+SECTION_CHARS = 4000
+HASH_BLOCK = 1024 * 1024
+# Sections written to the cache per transaction while a file streams through.
+CACHE_BATCH = 64
+MAX_CACHED_FILES = int(os.getenv("CODEMATE_PARSE_CACHE_FILES", "200"))
+# A hit records its time for eviction only when the last one is older than this.
+TOUCH_SECONDS = 60
+# A file being parsed renews its claim with every batch; one silent for this
+# long (its process died) may be parsed again by someone else.
+CLAIM_SECONDS = 300
+# Uploads smaller than this in total are parsed in-process; spawning workers costs more.
+PARALLEL_MIN_BYTES = 2 * 1024 * 1024
+PARSE_WORKERS = min(4, os.cpu_count() or 1)
+# Bumped when extraction output changes, so older cache entries stop matching.
+PARSER_VERSION = 1
+
+_BLANK_RUN = re.compile(r"\n{3,}")
+_HEADING = re.compile(r"^(#{1,6})\s+(.*)")
+_CODE_BLOCK_START = re.compile(
+    r"^(?:async\s+def|def|class|function|export|public|private|protected|static|fn|func|struct|impl|interface|"
+    r"template|namespace|module)\b"
+)
+
+
+def extension(filename):
+    return os.path.splitext(filename or "")[1].lower().lstrip(".")
+
+
+def normalize(text):
+    text = unicodedata.normalize("NFKC", text).replace("\r\n", "\n").replace("\r", "\n")
+    text = "\n".join(line.rstrip() for line in text.split("\n"))
+    return _BLANK_RUN.sub("\n\n", text).strip()
+
+
+def _split(title, text):
+    # Oversized sections are cut on line boundaries into SECTION_CHARS pieces.
+    text = normalize(text)
+    if not text:
+        return
+    if len(text) <= SECTION_CHARS:
+        yield title, text
+        return
+    part, size, index = [], 0, 1
+    for line in text.split("\n"):
+        while len(line) > SECTION_CHARS:
+            if part:
+                yield f"{title} ({index})", "\n".join(part)
+                part, size, index = [], 0, index + 1
+            yield f"{title} ({index})", line[:SECTION_CHARS]
+            line, index = line[SECTION_CHARS:], index + 1
+        if size + len(line) > SECTION_CHARS and part:
+            yield f"{title} ({index})", "\n".join(part)
+            part, size, index = [], 0, index + 1
+        part.append(line)
+        size += len(line) + 1
+    if part:
+        yield f"{title} ({index})", "\n".join(part)
+
+
+def _lines(fileobj):
+    # Decodes a binary upload lazily; the wrapper is detached so the upload stays usable.
+    wrapper = io.TextIOWrapper(fileobj, encoding="utf-8", errors="ignore", newline="")
+    try:
+        yield from wrapper
+    finally:
+        try:
+            wrapper.detach()
+        except ValueError:
+            # The upload was already closed, e.g. a generator dropped late.
+            pass
+
+
+def _iter_text(fileobj, filename):
+    # Runs of up to SECTION_CHARS, cut at a paragraph break once half full.
+    part, size, index = [], 0, 1
+    for line in _lines(fileobj):
+        if part and (size + len(line) > SECTION_CHARS or (size >= SECTION_CHARS // 2 and not line.strip())):
+            yield from _split(f"{filename} ({index})", "".join(part))
+            part, size, index = [], 0, index + 1
+        part.append(line)
+        size += len(line)
+    if part:
+        yield from _split(f"{filename} ({index})" if index > 1 else filename, "".join(part))
+
+
+def _iter_markdown(fileobj, filename):
+    # One section per heading; headings inside code fences are not headings.
+    title, part, fenced = filename, [], False
+    for line in _lines(fileobj):
+        if line.lstrip().startswith(("```", "~~~")):
+            fenced = not fenced
+        match = None if fenced else _HEADING.match(line)
+        if match:
+            yield from _split(title, "".join(part))
+            title, part = match.group(2).strip() or filename, []
+        part.append(line)
+        if sum(len(p) for p in part) > 4 * SECTION_CHARS:
+            yield from _split(title, "".join(part))
+            part = []
+    yield from _split(title, "".join(part))
+
+
+def _iter_code(fileobj, filename):
+    # A new section at each top-level definition, so a function stays whole
+    # when it fits in SECTION_CHARS.
+    ext = extension(filename)
+    title, part, size, line_no = f"{filename}: line 1", [], 0, 0
+    for line in _lines(fileobj):
+        line_no += 1
+        if _CODE_BLOCK_START.match(line) and size >= SECTION_CHARS // 4:
+            yield from _split(title, f"```{ext}\n{''.join(part)}\n```")
+            title, part, size = f"{filename}: line {line_no}", [], 0
+        part.append(line)
+        size += len(line)
+        if size >= SECTION_CHARS:
+            yield from _split(title, f"```{ext}\n{''.join(part)}\n```")
+            title, part, size = f"{filename}: line {line_no + 1}", [], 0
+    if part:
+        yield from _split(title, f"```{ext}\n{''.join(part)}\n```")
+
+
+def _iter_notebook(fileobj, filename):
+    # nbformat is plain JSON with no streaming form, so the cell list is loaded
+    # once; outputs are dropped and sections are emitted cell by cell.
+    wrapper = io.TextIOWrapper(fileobj, encoding="utf-8", errors="ignore")
+    try:
+        notebook = json.load(wrapper)
+    except ValueError:
+        raise ValueError(f"{filename} is not a valid Jupyter notebook.")
+    finally:
+        wrapper.detach()
+    language = notebook.get("metadata", {}).get("language_info", {}).get("name", "")
+    title, part = filename, []
+    for cell in notebook.get("cells", []):
+        source = cell.get("source", "")
+        source = "".join(source) if isinstance(source, list) else str(source)
+        if cell.get("cell_type") == "markdown":
+            match = _HEADING.match(source.lstrip())
+            if match:
+                yield from _split(title, "\n\n".join(part))
+                title, part = match.group(2).strip() or filename, []
+            part.append(source)
+        elif cell.get("cell_type") == "code" and source.strip():
+            part.append(f"```{language}\n{source}\n```")
+        if sum(len(p) for p in part) > 4 * SECTION_CHARS:
+            yield from _split(title, "\n\n".join(part))
+            part = []
+    yield from _split(title, "\n\n".join(part))
+
+
+def _iter_pdf(fileobj, filename):
+    # pypdf reads pages on demand, one section per page.
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        raise ValueError("PDF support needs the pypdf package (pip install pypdf).")
+    reader = PdfReader(fileobj)
+    for number, page in enumerate(reader.pages, start=1):
+        yield from _split(f"{filename}: page {number}", page.extract_text() or "")
+
+
+def _parser_for(filename):
+    ext = extension(filename)
+    if ext in MARKDOWN_EXTENSIONS:
+        return _iter_markdown
+    if ext in NOTEBOOK_EXTENSIONS:
+        return _iter_notebook
+    if ext in PDF_EXTENSIONS:
+        return _iter_pdf
+    if ext in CODE_EXTENSIONS:
+        return _iter_code
+    if ext in TEXT_EXTENSIONS:
+        return _iter_text
+    raise ValueError(f"Unsupported file type: .{ext or '?'}")
+
+
+def file_hash(fileobj):
+    digest = hashlib.sha256(f"v{PARSER_VERSION}:".encode())
+    fileobj.seek(0)
+    for block in iter(lambda: fileobj.read(HASH_BLOCK), b""):
+        digest.update(block)
+    fileobj.seek(0)
+    return digest.hexdigest()
+
+
+def is_cached(key, path=None):
+    row = db.fetch_one("SELECT complete FROM parsed_files WHERE file_hash = ?", (key,), path=path)
+    return bool(row and row[0])
+
+
+def iter_cached(key, path=None):
+    # Keyset pages over the cached sections, so a large document never sits in memory.
+    row = db.fetch_one("SELECT accessed_at FROM parsed_files WHERE file_hash = ?", (key,), path=path)
+    now = time.time()
+    if row and row[0] < now - TOUCH_SECONDS:
+        db.execute("UPDATE parsed_files SET accessed_at = ? WHERE file_hash = ?", (now, key), path=path)
+    position = -1
+    while True:
+        rows = db.fetch_all(
+            "SELECT position, title, text FROM parsed_sections WHERE file_hash = ? AND position > ? "
+            "ORDER BY position LIMIT ?",
+            (key, position, CACHE_BATCH), path=path,
+        )
+        for position, title, text in rows:
+            yield title, text
+        if len(rows) < CACHE_BATCH:
+            return
+
+
+def _claim(key, filename, path=None):
+    # True if this caller should write the file's sections: nobody else is
+    # parsing the same bytes and no complete copy exists.
+    now = time.time()
+    with db.transaction(path) as conn:
+        row = conn.execute("SELECT complete, accessed_at FROM parsed_files WHERE file_hash = ?", (key,)).fetchone()
+        if row and (row[0] or row[1] > now - CLAIM_SECONDS):
+            return False
+        conn.execute("INSERT OR REPLACE INTO parsed_files (file_hash, filename, sections, complete, accessed_at) "
+                     "VALUES (?, ?, 0, 0, ?)", (key, filename, now))
+        conn.execute("DELETE FROM parsed_sections WHERE file_hash = ?", (key,))
+    return True
+
+
+def _write_sections(conn, key, batch):
+    # The same bytes always give the same sections, so a slow writer whose
+    # claim was taken over cannot clash with the new one.
+    conn.executemany("INSERT OR IGNORE INTO parsed_sections VALUES (?, ?, ?, ?)", batch)
+    conn.execute("UPDATE parsed_files SET accessed_at = ? WHERE file_hash = ? AND complete = 0", (time.time(), key))
+
+
+def _write(key, sections, path=None):
+    # Streams sections into the cache in batches, so memory stays flat. Only a
+    # fully parsed file is marked complete; a failed one is removed.
+    batch, count = [], 0
+    try:
+        for title, text in sections:
+            batch.append((key, count, title, text))
+            count += 1
+            if len(batch) >= CACHE_BATCH:
+                with db.transaction(path) as conn:
+                    _write_sections(conn, key, batch)
+                batch = []
+    except BaseException:
+        with db.transaction(path) as conn:
+            conn.execute("DELETE FROM parsed_sections WHERE file_hash = ? AND NOT EXISTS "
+                         "(SELECT 1 FROM parsed_files WHERE file_hash = ? AND complete = 1)", (key, key))
+            conn.execute("DELETE FROM parsed_files WHERE file_hash = ? AND complete = 0", (key,))
+        raise
+    with db.transaction(path) as conn:
+        _write_sections(conn, key, batch)
+        conn.execute("UPDATE parsed_files SET sections = ?, complete = 1 WHERE file_hash = ?", (count, key))
+    evict(path=path)
+
+
+def evict(max_files=MAX_CACHED_FILES, path=None):
+    with db.transaction(path) as conn:
+        stale = conn.execute(
+            "SELECT file_hash FROM parsed_files ORDER BY accessed_at DESC LIMIT -1 OFFSET ?", (max_files,)
+        ).fetchall()
+        for (key,) in stale:
+            conn.execute("DELETE FROM parsed_sections WHERE file_hash = ?", (key,))
+            conn.execute("DELETE FROM parsed_files WHERE file_hash = ?", (key,))
+    return len(stale)
+
+
+def _fill(fileobj, filename, key, path=None):
+    # Puts the file in the cache, or waits while another caller does.
+    while not is_cached(key, path):
+        if _claim(key, filename, path):
+            fileobj.seek(0)
+            _write(key, _parser_for(filename)(fileobj, filename), path)
+        else:
+            time.sleep(0.1)
+
+
+def _extract_to_cache(file_path, filename, key, db_path):
+    # Runs in a worker process: parse a spooled upload straight into the cache.
+    with open(file_path, "rb") as f:
+        _fill(f, filename, key, db_path)
+    return key
+
+
+def _size(fileobj):
+    fileobj.seek(0, os.SEEK_END)
+    size = fileobj.tell()
+    fileobj.seek(0)
+    return size
+
+
+def extract_all(uploads, workers=PARSE_WORKERS):
+    # Makes sure every upload is in the cache and returns [(filename, hash)] in
+    # upload order; read the sections back with iter_cached. Large batches of
+    # uncached files are parsed in parallel on a process pool.
+    keyed, missing = [], []
+    for upload in uploads:
+        _parser_for(upload.name)
+        key = file_hash(upload)
+        keyed.append((upload.name, key))
+        if not is_cached(key) and key not in {k for _, k, _ in missing}:
+            missing.append((upload, key, _size(upload)))
+
+    if len(missing) > 1 and workers > 1 and sum(size for _, _, size in missing) >= PARALLEL_MIN_BYTES:
+        spool = tempfile.mkdtemp(prefix="codemate-parse-")
+        try:
+            jobs = []
+            for index, (upload, key, _) in enumerate(missing):
+                file_path = os.path.join(spool, str(index))
+                with open(file_path, "wb") as f:
+                    shutil.copyfileobj(upload, f, HASH_BLOCK)
+                upload.seek(0)
+                jobs.append((file_path, upload.name, key, db.DB_PATH))
+            # spawn, not fork: the Streamlit server is multi-threaded.
+            context = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=min(workers, len(jobs)), mp_context=context) as pool:
+                for future in [pool.submit(_extract_to_cache, *job) for job in jobs]:
+                    future.result()
+        finally:
+            shutil.rmtree(spool, ignore_errors=True)
+    else:
+        for upload, key, _ in missing:
+            _fill(upload, upload.name, key)
+            upload.seek(0)
+    return keyed
+
+
+def iter_cached_files(keyed):
+    # Sections of extract_all's [(filename, hash)] in order, titled with their
+    # file when there are several. Works from any process sharing the cache.
+    for filename, key in keyed:
+        if not is_cached(key):
+            raise ValueError(f"{filename} is no longer in the parse cache; upload it again.")
+        for title, text in iter_cached(key):
+            yield (title if len(keyed) == 1 or title.startswith(filename) else f"{filename} · {title}"), text
+
+
+def iter_lines(sections):
+    # Adapts sections to the line-oriented summarizer input.
+    for title, text in sections:
+        yield title + "\n"
+        yield "\n"
+        for line in text.split("\n"):
+            yield line + "\n"
+        yield "\n"
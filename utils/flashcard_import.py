@@ -0,0 +1,126 @@
+import os
+import re
+import shutil
+import sqlite3
+import tempfile
+import zipfile
+import pandas as pd
+from utils import flashcard_store
+
+CHUNK_ROWS = 5000
+SUPPORTED_EXTENSIONS = ["csv", "tsv", "txt", "apkg"]
+
+_TAGS = re.compile(r"<[^>]+>")
+
+
+def _clean_chunk(df):
+    # Per-chunk validation: both columns present, blank rows dropped.
+    if "question" not in df.columns or "answer" not in df.columns:
+        raise ValueError("Invalid file structure. Please ensure it contains 'question' and 'answer' columns.")
+    df = df[["question", "answer"]].dropna()
+    df = df.astype(str)
+    df = df[(df["question"].str.strip() != "") & (df["answer"].str.strip() != "")]
+    return list(df.itertuples(index=False, name=None))
+
+
+def _has_header(fileobj, sep):
+    position = fileobj.tell()
+    first = fileobj.readline()
+    fileobj.seek(position)
+    if isinstance(first, bytes):
+        first = first.decode("utf-8", errors="ignore")
+    fields = [field.strip().strip('"').lower() for field in first.split(sep)]
+    return "question" in fields and "answer" in fields
+
+
+def iter_delimited(fileobj, sep, chunk_rows=CHUNK_ROWS):
+    if sep == "," or _has_header(fileobj, sep):
+        reader = pd.read_csv(fileobj, sep=sep, chunksize=chunk_rows, dtype=str)
+    else:
+        reader = pd.read_csv(fileobj, sep=sep, header=None, names=["question", "answer"],
+                             usecols=[0, 1], chunksize=chunk_rows, dtype=str)
+    for df in reader:
+        rows = _clean_chunk(df)
+        if rows:
+            yield rows
+
+
+def iter_apkg(fileobj, chunk_rows=CHUNK_ROWS):
+    # An .apkg is a zip holding an SQLite collection; notes keep their fields
+    # separated by \x1f, front first. Copied to disk in blocks, never read whole.
+    # Current Anki exports keep the real collection zstd-compressed in
+    # collection.anki21b, next to a collection.anki2 stub holding one
+    # "please update" note, so the newest format present wins.
+    with zipfile.ZipFile(fileobj) as archive:
+        names = set(archive.namelist())
+        member = next((n for n in ("collection.anki21b", "collection.anki21", "collection.anki2") if n in names), None)
+        if member is None:
+            raise ValueError("Unsupported Anki package (no collection.anki2 found).")
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "collection.db")
+            with archive.open(member) as src, open(path, "wb") as dst:
+                if member == "collection.anki21b":
+                    try:
+                        import zstandard
+                    except ImportError:
+                        raise ValueError("This Anki package uses the newer compressed format, which needs the "
+                                         "zstandard package (pip install zstandard). Alternatively, export it "
+                                         "again with \"Support older Anki versions\" turned on.")
+                    zstandard.ZstdDecompressor().copy_stream(src, dst)
+                else:
+                    shutil.copyfileobj(src, dst, 1024 * 1024)
+            conn = sqlite3.connect(path)
+            try:
+                cursor = conn.execute("SELECT flds FROM notes ORDER BY id")
+                while True:
+                    batch = cursor.fetchmany(chunk_rows)
+                    if not batch:
+                        break
+                    rows = []
+                    for (fields,) in batch:
+                        parts = fields.split("\x1f")
+                        if len(parts) >= 2:
+                            question, answer = _TAGS.sub("", parts[0]).strip(), _TAGS.sub("", parts[1]).strip()
+                            if question and answer:
+                                rows.append((question, answer))
+                    if rows:
+                        yield rows
+            finally:
+                conn.close()
+
+
+def iter_rows(fileobj, filename, chunk_rows=CHUNK_ROWS):
+    ext = filename.rsplit(".", 1)[-1].lower()
+    if ext == "csv":
+        return iter_delimited(fileobj, ",", chunk_rows)
+    if ext in ("tsv", "txt"):
+        return iter_delimited(fileobj, "\t", chunk_rows)
+    if ext == "apkg":
+        return iter_apkg(fileobj, chunk_rows)
+    raise ValueError("Unsupported file format.")
+
+
+def import_file(fileobj, filename, username, progress=None, chunk_rows=CHUNK_ROWS):
+    # Returns (deck_id, rows imported). progress(rows, fraction) is called per chunk.
+    try:
+        fileobj.seek(0, os.SEEK_END)
+        size = fileobj.tell()
+        fileobj.seek(0)
+    except (AttributeError, OSError):
+        size = 0
+
+    def report(rows):
+        if progress:
+            try:
+                fraction = min(1.0, fileobj.tell() / size) if size else 0.0
+            except (AttributeError, OSError, ValueError):
+                fraction = 0.0
+            progress(rows, fraction)
+
+    deck_id = flashcard_store.create_deck(username, filename)
+    try:
+        total = flashcard_store.bulk_add_cards(deck_id, iter_rows(fileobj, filename, chunk_rows), report)
+    except Exception:
+        flashcard_store.delete_deck(deck_id)
+        raise
+    return deck_id, total
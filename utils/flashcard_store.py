@@ -0,0 +1,111 @@
+from datetime import datetime
+from utils import db
+
+CARD_COLUMNS = "card_id, question, answer"
+
+
+def create_deck(username, name, cards=()):
+    with db.transaction() as conn:
+        deck_id = conn.execute(
+            "INSERT INTO flashcard_decks (username, name, created_at) VALUES (?, ?, ?)",
+            (username, name, datetime.now().strftime("%Y-%m-%d %H:%M:%S")),
+        ).lastrowid
+    if cards:
+        add_cards(deck_id, cards)
+    return deck_id
+
+
+def add_cards(deck_id, cards):
+    rows = [(deck_id, str(card["question"]), str(card["answer"])) for card in cards]
+    with db.transaction() as conn:
+        conn.executemany("INSERT INTO flashcards (deck_id, question, answer) VALUES (?, ?, ?)", rows)
+        conn.execute("UPDATE flashcard_decks SET card_count = card_count + ? WHERE deck_id = ?", (len(rows), deck_id))
+    return len(rows)
+
+
+def bulk_add_cards(deck_id, chunks, progress=None):
+    # chunks yields lists of (question, answer) tuples. Each chunk is parsed
+    # before the write lock is taken and written in its own short transaction,
+    # so a large import never holds the lock while pandas works; on failure
+    # the caller deletes the deck.
+    total = 0
+    for chunk in chunks:
+        with db.transaction() as conn:
+            conn.executemany("INSERT INTO flashcards (deck_id, question, answer) VALUES (?, ?, ?)",
+                             [(deck_id, question, answer) for question, answer in chunk])
+            conn.execute("UPDATE flashcard_decks SET card_count = card_count + ? WHERE deck_id = ?",
+                         (len(chunk), deck_id))
+        total += len(chunk)
+        if progress:
+            progress(total)
+    return total
+
+
+def list_decks(username):
+    return db.fetch_all(
+        "SELECT deck_id, name, card_count FROM flashcard_decks WHERE username = ? ORDER BY deck_id DESC",
+        (username,),
+    )
+
+
+def delete_deck(deck_id):
+    with db.transaction() as conn:
+        conn.execute("DELETE FROM flashcards WHERE deck_id = ?", (deck_id,))
+        conn.execute("DELETE FROM flashcard_decks WHERE deck_id = ?", (deck_id,))
+
+
+def _search_clause(query):
+    query = query.strip()
+    if not query:
+        return "", ()
+    pattern = f"%{query}%"
+    return " AND (question LIKE ? OR answer LIKE ?)", (pattern, pattern)
+
+
+def count_cards(deck_id, query=""):
+    if not query.strip():
+        row = db.fetch_one("SELECT card_count FROM flashcard_decks WHERE deck_id = ?", (deck_id,))
+        return row[0] if row else 0
+    clause, params = _search_clause(query)
+    return db.fetch_one(f"SELECT COUNT(*) FROM flashcards WHERE deck_id = ?{clause}", (deck_id, *params))[0]
+
+
+def get_page(deck_id, cursor=0, limit=10, query="", backwards=False):
+    # Keyset pagination: cursor is a card_id, so a page costs the same at any depth.
+    clause, params = _search_clause(query)
+    if backwards:
+        rows = db.fetch_all(
+            f"SELECT {CARD_COLUMNS} FROM flashcards WHERE deck_id = ? AND card_id < ?{clause} "
+            "ORDER BY card_id DESC LIMIT ?",
+            (deck_id, cursor, *params, limit),
+        )
+        return rows[::-1]
+    return db.fetch_all(
+        f"SELECT {CARD_COLUMNS} FROM flashcards WHERE deck_id = ? AND card_id >= ?{clause} "
+        "ORDER BY card_id LIMIT ?",
+        (deck_id, cursor, *params, limit),
+    )
+
+
+def update_card(card_id, question, answer):
+    db.execute("UPDATE flashcards SET question = ?, answer = ? WHERE card_id = ?", (question, answer, card_id))
+
+
+def delete_card(card_id):
+    with db.transaction() as conn:
+        row = conn.execute("SELECT deck_id FROM flashcards WHERE card_id = ?", (card_id,)).fetchone()
+        if row is None:
+            return
+        conn.execute("DELETE FROM flashcards WHERE card_id = ?", (card_id,))
+        conn.execute("UPDATE flashcard_decks SET card_count = card_count - 1 WHERE deck_id = ?", (row[0],))
+
+
+def iter_cards(deck_id, batch_size=1000):
+    cursor = 0
+    while True:
+        rows = get_page(deck_id, cursor, batch_size)
+        if not rows:
+            return
+        for _, question, answer in rows:
+            yield {"question": question, "answer": answer}
+        cursor = rows[-1][0] + 1
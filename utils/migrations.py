@@ -0,0 +1,367 @@
+import threading
+from utils import db
+
+# Ordered schema versions. Each entry is applied once, inside a single
+# transaction, and recorded in PRAGMA user_version. Append new versions;
+# never edit one that has shipped.
+MIGRATIONS = [
+    (1, [
+        '''
+        CREATE TABLE IF NOT EXISTS users(
+            username TEXT PRIMARY KEY,
+            password TEXT,
+            created_at TEXT
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS planner(
+            username TEXT,
+            language TEXT,
+            goal TEXT,
+            start_date TEXT,
+            end_date TEXT,
+            total_days INTEGER,
+            plan_json TEXT
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS study_log (
+            username TEXT,
+            study_date TEXT
+        )
+        ''',
+    ]),
+    (2, [
+        # One plan per user: keep the most recently written row for each username.
+        '''
+        CREATE TABLE planner_new(
+            username TEXT PRIMARY KEY,
+            language TEXT,
+            goal TEXT,
+            start_date TEXT,
+            end_date TEXT,
+            total_days INTEGER,
+            plan_json TEXT
+        )
+        ''',
+        '''
+        INSERT OR REPLACE INTO planner_new
+        SELECT username, language, goal, start_date, end_date, total_days, plan_json
+        FROM planner WHERE username IS NOT NULL ORDER BY rowid
+        ''',
+        "DROP TABLE planner",
+        "ALTER TABLE planner_new RENAME TO planner",
+        # Covers the dashboard's "study_date WHERE username = ?" lookups and date ranges.
+        "CREATE INDEX IF NOT EXISTS idx_study_log_user_date ON study_log(username, study_date)",
+    ]),
+    (3, [
+        # Daily tips shared across restarts and worker processes. username is ''
+        # for the shared tip; a NULL tip marks a fetch claimed by some process.
+        '''
+        CREATE TABLE IF NOT EXISTS tip_cache(
+            tip_date TEXT NOT NULL,
+            username TEXT NOT NULL DEFAULT '',
+            tip TEXT,
+            claimed_at REAL NOT NULL,
+            PRIMARY KEY (tip_date, username)
+        )
+        ''',
+    ]),
+    (4, [
+        # Content-addressed LLM responses shared by every AI module.
+        '''
+        CREATE TABLE IF NOT EXISTS llm_cache(
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            created_at REAL NOT NULL,
+            accessed_at REAL NOT NULL
+        )
+        ''',
+        "CREATE INDEX IF NOT EXISTS idx_llm_cache_accessed ON llm_cache(accessed_at)",
+    ]),
+    (5, [
+        '''
+        CREATE TABLE IF NOT EXISTS flashcard_decks(
+            deck_id INTEGER PRIMARY KEY,
+            username TEXT NOT NULL,
+            name TEXT NOT NULL,
+            card_count INTEGER NOT NULL DEFAULT 0,
+            created_at TEXT NOT NULL
+        )
+        ''',
+        "CREATE INDEX IF NOT EXISTS idx_flashcard_decks_user ON flashcard_decks(username, deck_id)",
+        # card_id is the rowid, so (deck_id, card_id) pages come straight off the index.
+        '''
+        CREATE TABLE IF NOT EXISTS flashcards(
+            card_id INTEGER PRIMARY KEY,
+            deck_id INTEGER NOT NULL REFERENCES flashcard_decks(deck_id) ON DELETE CASCADE,
+            question TEXT NOT NULL,
+            answer TEXT NOT NULL,
+            due_at REAL,
+            interval_days REAL NOT NULL DEFAULT 0,
+            ease REAL NOT NULL DEFAULT 2.5,
+            reps INTEGER NOT NULL DEFAULT 0,
+            lapses INTEGER NOT NULL DEFAULT 0,
+            last_reviewed REAL
+        )
+        ''',
+        "CREATE INDEX IF NOT EXISTS idx_flashcards_deck ON flashcards(deck_id, card_id)",
+    ]),
+    (6, [
+        # Spaced repetition: the next due card is one seek on (deck_id, due_at).
+        # New cards have a NULL due_at, which sorts first in the index.
+        "CREATE INDEX IF NOT EXISTS idx_flashcards_due ON flashcards(deck_id, due_at)",
+        '''
+        CREATE TABLE IF NOT EXISTS review_log(
+            card_id INTEGER NOT NULL,
+            deck_id INTEGER NOT NULL,
+            grade INTEGER NOT NULL,
+            reviewed_at REAL NOT NULL,
+            interval_days REAL NOT NULL,
+            ease REAL NOT NULL
+        )
+        ''',
+        "CREATE INDEX IF NOT EXISTS idx_review_log_card ON review_log(card_id, reviewed_at)",
+    ]),
+    (7, [
+        # Per-day session counts kept in step with study_log, so dashboard
+        # charts read one row per day shown instead of every session ever logged.
+        '''
+        CREATE TABLE IF NOT EXISTS study_daily(
+            username TEXT NOT NULL,
+            study_date TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (username, study_date)
+        ) WITHOUT ROWID
+        ''',
+        '''
+        INSERT OR REPLACE INTO study_daily (username, study_date, count)
+        SELECT username, study_date, COUNT(*) FROM study_log
+        WHERE username IS NOT NULL AND study_date IS NOT NULL
+        GROUP BY username, study_date
+        ''',
+    ]),
+    (8, [
+        # Bumped on every logged session; cached dashboard sections key on it.
+        '''
+        CREATE TABLE IF NOT EXISTS user_activity(
+            username TEXT PRIMARY KEY,
+            version INTEGER NOT NULL
+        )
+        ''',
+    ]),
+    (9, [
+        # At most one row per user, day and source, so UI reruns and repeated
+        # clicks cannot inflate the log. Existing rows collapse to one per day.
+        '''
+        CREATE TABLE study_log_new(
+            username TEXT NOT NULL,
+            study_date TEXT NOT NULL,
+            source TEXT NOT NULL DEFAULT 'manual',
+            PRIMARY KEY (username, study_date, source)
+        ) WITHOUT ROWID
+        ''',
+        '''
+        INSERT OR IGNORE INTO study_log_new (username, study_date, source)
+        SELECT username, study_date, 'legacy' FROM study_log
+        WHERE username IS NOT NULL AND study_date IS NOT NULL
+        ''',
+        "DROP TABLE study_log",
+        "ALTER TABLE study_log_new RENAME TO study_log",
+        "DELETE FROM study_daily",
+        '''
+        INSERT INTO study_daily (username, study_date, count)
+        SELECT username, study_date, COUNT(*) FROM study_log GROUP BY username, study_date
+        ''',
+        "UPDATE user_activity SET version = version + 1",
+        # The rollup and activity version only move when a new row lands;
+        # an ignored duplicate fires no trigger.
+        '''
+        CREATE TRIGGER IF NOT EXISTS study_log_rollup AFTER INSERT ON study_log
+        BEGIN
+            INSERT INTO study_daily (username, study_date, count) VALUES (NEW.username, NEW.study_date, 1)
+            ON CONFLICT(username, study_date) DO UPDATE SET count = count + 1;
+            INSERT INTO user_activity (username, version) VALUES (NEW.username, 1)
+            ON CONFLICT(username) DO UPDATE SET version = version + 1;
+        END
+        ''',
+    ]),
+    (10, [
+        # Plans get their own id so a user can keep several, and the schedule
+        # moves out of the plan_json blob into one indexed row per day.
+        '''
+        CREATE TABLE planner_new(
+            plan_id INTEGER PRIMARY KEY,
+            username TEXT NOT NULL,
+            language TEXT,
+            goal TEXT,
+            start_date TEXT,
+            end_date TEXT,
+            total_days INTEGER,
+            created_at TEXT
+        )
+        ''',
+        '''
+        INSERT INTO planner_new (username, language, goal, start_date, end_date, total_days, created_at)
+        SELECT username, language, goal, start_date, end_date, total_days, start_date
+        FROM planner WHERE username IS NOT NULL ORDER BY rowid
+        ''',
+        '''
+        CREATE TABLE plan_days(
+            username TEXT NOT NULL,
+            plan_id INTEGER NOT NULL,
+            day TEXT NOT NULL,
+            topic TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            PRIMARY KEY (plan_id, day)
+        ) WITHOUT ROWID
+        ''',
+        '''
+        INSERT OR IGNORE INTO plan_days (username, plan_id, day, topic)
+        SELECT n.username, n.plan_id, j.key, j.value
+        FROM planner AS o
+        JOIN planner_new AS n ON n.username = o.username
+        JOIN json_each(o.plan_json) AS j
+        WHERE json_valid(o.plan_json)
+        ''',
+        "DROP TABLE planner",
+        "ALTER TABLE planner_new RENAME TO planner",
+        "CREATE INDEX IF NOT EXISTS idx_planner_user ON planner(username, plan_id)",
+        # "Today's topic across all my plans" style lookups.
+        "CREATE INDEX IF NOT EXISTS idx_plan_days_user_day ON plan_days(username, day)",
+    ]),
+    (11, [
+        # Scheduling options, kept so missed days can be rescheduled the same way.
+        # rest_days holds comma-separated weekday numbers, Monday = 0.
+        "ALTER TABLE planner ADD COLUMN rest_days TEXT NOT NULL DEFAULT ''",
+        "ALTER TABLE planner ADD COLUMN revision_every INTEGER NOT NULL DEFAULT 0",
+    ]),
+    (12, [
+        # Extracted document sections keyed by file hash. A file is only served
+        # from here once parsed_files marks it complete.
+        '''
+        CREATE TABLE IF NOT EXISTS parsed_files(
+            file_hash TEXT PRIMARY KEY,
+            filename TEXT,
+            sections INTEGER NOT NULL DEFAULT 0,
+            complete INTEGER NOT NULL DEFAULT 0,
+            accessed_at REAL NOT NULL
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS parsed_sections(
+            file_hash TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            title TEXT NOT NULL,
+            text TEXT NOT NULL,
+            PRIMARY KEY (file_hash, position)
+        ) WITHOUT ROWID
+        ''',
+        "CREATE INDEX IF NOT EXISTS idx_parsed_files_accessed ON parsed_files(accessed_at)",
+    ]),
+    (13, [
+        # Tutor chat history. summary covers every message up to summary_upto;
+        # later messages are sent verbatim.
+        '''
+        CREATE TABLE IF NOT EXISTS chat_conversations(
+            conversation_id INTEGER PRIMARY KEY,
+            username TEXT NOT NULL,
+            title TEXT NOT NULL,
+            created_at TEXT NOT NULL,
+            summary TEXT NOT NULL DEFAULT '',
+            summary_upto INTEGER NOT NULL DEFAULT 0
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS chat_messages(
+            message_id INTEGER PRIMARY KEY,
+            conversation_id INTEGER NOT NULL,
+            role TEXT NOT NULL,
+            content TEXT NOT NULL,
+            tokens INTEGER NOT NULL,
+            created_at REAL NOT NULL,
+            ttft_ms REAL,
+            total_ms REAL
+        )
+        ''',
+        "CREATE INDEX IF NOT EXISTS idx_chat_conversations_user ON chat_conversations(username, conversation_id)",
+        "CREATE INDEX IF NOT EXISTS idx_chat_messages_conversation ON chat_messages(conversation_id, message_id)",
+    ]),
+    (14, [
+        # LLM scheduler state shared by every process. A call is running while
+        # finished_at is NULL; owner is the pid holding it.
+        '''
+        CREATE TABLE IF NOT EXISTS llm_inflight(
+            key TEXT PRIMARY KEY,
+            owner INTEGER NOT NULL,
+            lease_until REAL NOT NULL,
+            result TEXT,
+            finished_at REAL
+        ) WITHOUT ROWID
+        ''',
+        "CREATE INDEX IF NOT EXISTS idx_llm_inflight_finished ON llm_inflight(finished_at)",
+        # Token buckets: tokens as of updated_at, refilled lazily on read.
+        '''
+        CREATE TABLE IF NOT EXISTS llm_buckets(
+            name TEXT PRIMARY KEY,
+            tokens REAL NOT NULL,
+            updated_at REAL NOT NULL
+        ) WITHOUT ROWID
+        ''',
+    ]),
+    (15, [
+        # Background generation jobs. One row per (kind, input_hash), so
+        # identical submissions share a job; payload, progress and result are JSON.
+        '''
+        CREATE TABLE IF NOT EXISTS jobs(
+            job_id INTEGER PRIMARY KEY,
+            kind TEXT NOT NULL,
+            input_hash TEXT NOT NULL,
+            username TEXT,
+            payload TEXT NOT NULL,
+            status TEXT NOT NULL,
+            priority INTEGER NOT NULL,
+            attempts INTEGER NOT NULL,
+            max_attempts INTEGER NOT NULL,
+            run_after REAL NOT NULL,
+            owner INTEGER,
+            worker TEXT,
+            lease_until REAL,
+            progress TEXT,
+            result TEXT,
+            error TEXT,
+            created_at REAL NOT NULL,
+            started_at REAL,
+            finished_at REAL
+        )
+        ''',
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_jobs_input ON jobs(kind, input_hash)",
+        "CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, priority, job_id)",
+    ]),
+]
+
+_applied = set()
+_lock = threading.Lock()
+
+
+def schema_version(path=None):
+    return db.fetch_one("PRAGMA user_version", path=path)[0]
+
+
+def migrate(path=None):
+    path = path or db.DB_PATH
+    if path in _applied:
+        return
+    with _lock:
+        if path in _applied:
+            return
+        for version, statements in MIGRATIONS:
+            with db.transaction(path) as conn:
+                # Re-read under the write lock so concurrent processes apply each version once.
+                if conn.execute("PRAGMA user_version").fetchone()[0] >= version:
+                    continue
+                for statement in statements:
+                    conn.execute(statement)
+                conn.execute(f"PRAGMA user_version = {version}")
+        _applied.add(path)
@@ -0,0 +1,109 @@
+from datetime import datetime
+from utils import db
+
+PLAN_COLUMNS = "plan_id, language, goal, start_date, end_date, total_days"
+
+
+def save_plan(username, language, goal, start_date, end_date, total_days, schedule,
+              rest_weekdays=(), revision_every=0):
+    # schedule maps ISO dates to topics. Each save creates a new plan; older
+    # plans stay until they are deleted.
+    with db.transaction() as conn:
+        plan_id = conn.execute(
+            "INSERT INTO planner (username, language, goal, start_date, end_date, total_days, created_at, "
+            "rest_days, revision_every) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (username, language, goal, str(start_date), str(end_date), total_days,
+             datetime.now().strftime("%Y-%m-%d %H:%M:%S"), ",".join(map(str, rest_weekdays)), revision_every),
+        ).lastrowid
+        conn.executemany(
+            "INSERT INTO plan_days (username, plan_id, day, topic) VALUES (?, ?, ?, ?)",
+            [(username, plan_id, str(day), topic) for day, topic in schedule.items()],
+        )
+    return plan_id
+
+
+def list_plans(username):
+    return db.fetch_all(f"SELECT {PLAN_COLUMNS} FROM planner WHERE username = ? ORDER BY plan_id DESC", (username,))
+
+
+def get_plan(username, plan_id=None):
+    # The requested plan if it belongs to the user, otherwise their newest one.
+    if plan_id is not None:
+        row = db.fetch_one(f"SELECT {PLAN_COLUMNS} FROM planner WHERE plan_id = ? AND username = ?",
+                           (plan_id, username))
+        if row:
+            return row
+    return db.fetch_one(f"SELECT {PLAN_COLUMNS} FROM planner WHERE username = ? ORDER BY plan_id DESC LIMIT 1",
+                        (username,))
+
+
+def get_options(plan_id):
+    # (rest weekdays, revision_every) the plan was generated with.
+    row = db.fetch_one("SELECT rest_days, revision_every FROM planner WHERE plan_id = ?", (plan_id,))
+    if not row:
+        return (), 0
+    return tuple(int(day) for day in row[0].split(",") if day), row[1]
+
+
+def delete_plan(plan_id):
+    with db.transaction() as conn:
+        conn.execute("DELETE FROM plan_days WHERE plan_id = ?", (plan_id,))
+        conn.execute("DELETE FROM planner WHERE plan_id = ?", (plan_id,))
+
+
+def get_days(plan_id, start=None, end=None):
+    # (day, topic, status) rows in date order, optionally limited to start..end inclusive.
+    sql = "SELECT day, topic, status FROM plan_days WHERE plan_id = ?"
+    params = [plan_id]
+    if start is not None:
+        sql += " AND day >= ?"
+        params.append(str(start))
+    if end is not None:
+        sql += " AND day <= ?"
+        params.append(str(end))
+    return db.fetch_all(sql + " ORDER BY day", params)
+
+
+def get_day(plan_id, day):
+    # (topic, status), or None when the plan has nothing scheduled that day.
+    return db.fetch_one("SELECT topic, status FROM plan_days WHERE plan_id = ? AND day = ?", (plan_id, str(day)))
+
+
+def progress(plan_id, today):
+    # (total days, completed days). A day counts as completed once it is
+    # marked done or has passed, unless it was rescheduled as missed.
+    total, completed = db.fetch_one(
+        "SELECT COUNT(*), COALESCE(SUM(status = 'done' OR (day < ? AND status != 'missed')), 0) "
+        "FROM plan_days WHERE plan_id = ?",
+        (str(today), plan_id),
+    )
+    return total, completed
+
+
+def mark_day(plan_id, day, status="done"):
+    return db.execute("UPDATE plan_days SET status = ? WHERE plan_id = ? AND day = ?", (status, plan_id, str(day)))
+
+
+def replace_upcoming(plan_id, username, today, schedule):
+    # Used by rescheduling: pending days before today become 'missed', every
+    # unfinished day from today on is replaced by schedule, and the plan's end
+    # date follows the new last day.
+    today = str(today)
+    with db.transaction() as conn:
+        conn.execute("UPDATE plan_days SET status = 'missed' WHERE plan_id = ? AND day < ? AND status = 'pending'",
+                     (plan_id, today))
+        conn.execute("DELETE FROM plan_days WHERE plan_id = ? AND day >= ? AND status != 'done'", (plan_id, today))
+        conn.executemany(
+            "INSERT OR REPLACE INTO plan_days (username, plan_id, day, topic) VALUES (?, ?, ?, ?)",
+            [(username, plan_id, day, topic) for day, topic in schedule.items()],
+        )
+        conn.execute(
+            "UPDATE planner SET end_date = (SELECT date(MAX(day), '+1 day') FROM plan_days WHERE plan_id = ?) "
+            "WHERE plan_id = ?",
+            (plan_id, plan_id),
+        )
+        conn.execute(
+            "UPDATE planner SET total_days = CAST(julianday(end_date) - julianday(start_date) AS INTEGER) "
+            "WHERE plan_id = ?",
+            (plan_id,),
+        )
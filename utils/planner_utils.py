@@ -0,0 +1,147 @@
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+
+REVISION_TOPIC = "📝 Revision / Practice"
+REVISION_PREFIX = "📝 Revision: "
+
+WEEKDAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+
+def _weekmask(rest_weekdays):
+    # numpy business-day mask: "1" for study days, Monday first.
+    mask = "".join("0" if day in rest_weekdays else "1" for day in range(7))
+    if "1" not in mask:
+        raise ValueError("At least one weekday must be a study day")
+    return mask
+
+
+def _allocate(weights, slots):
+    # Largest-remainder split of slots in proportion to weights. Every topic
+    # gets at least one day when there is room; otherwise the first topics win.
+    weights = np.asarray(weights, dtype=float)
+    if slots < len(weights):
+        counts = np.zeros(len(weights), dtype=int)
+        counts[:slots] = 1
+        return counts
+    spare = slots - len(weights)
+    share = weights / weights.sum() * spare
+    counts = np.floor(share).astype(int)
+    leftover = spare - counts.sum()
+    if leftover:
+        counts[np.argsort(counts - share, kind="stable")[:leftover]] += 1
+    return counts + 1
+
+
+@lru_cache(maxsize=1024)
+def _slot_labels(topics, weights, slots, revision_every):
+    # Labels for consecutive study days. After every revision_every topic
+    # slots comes one that revises the topic studied just before it (0 = no
+    # revision days); the rest cover topics in order.
+    positions = np.arange(slots)
+    if revision_every > 0:
+        is_revision = positions % (revision_every + 1) == revision_every
+    else:
+        is_revision = np.zeros(slots, dtype=bool)
+    topic_slots = int((~is_revision).sum())
+
+    topic_index = np.full(slots, -1)
+    topic_index[~is_revision] = np.repeat(np.arange(len(topics)), _allocate(weights, topic_slots))
+    # Revision slots inherit the nearest preceding topic.
+    covered = np.maximum.accumulate(topic_index)
+
+    names = np.array(topics, dtype=object)
+    labels = np.where(covered >= 0, names[np.maximum(covered, 0)], REVISION_TOPIC).astype(object)
+    revised = is_revision & (covered >= 0)
+    labels[revised] = REVISION_PREFIX + names[covered[revised]]
+    return tuple(labels)
+
+
+def _study_days(start_dates, total_days, weekmask):
+    # Study dates in [start, start + total_days) for each start, as a 2-D array.
+    starts = np.asarray(start_dates, dtype="datetime64[D]")
+    ends = starts + np.timedelta64(total_days, "D")
+    counts = np.busday_count(starts, ends, weekmask=weekmask)
+    # Plans in one call share total_days and the start weekday, so counts agree.
+    slots = int(counts[0]) if len(counts) else 0
+    offsets = np.arange(slots)
+    return np.busday_offset(starts[:, None], offsets[None, :], roll="forward", weekmask=weekmask), slots
+
+
+def build_schedule(topics, start_date, total_days, weights=None, revision_every=0, rest_weekdays=()):
+    # {ISO date: topic} for a plan starting on start_date. Rest days are left out.
+    if not topics:
+        return {}
+    weights = tuple(weights) if weights is not None else (1.0,) * len(topics)
+    weekmask = _weekmask(rest_weekdays)
+    dates, slots = _study_days([start_date], total_days, weekmask)
+    labels = _slot_labels(tuple(topics), weights, slots, revision_every)
+    return dict(zip(np.datetime_as_string(dates[0]).tolist(), labels))
+
+
+def build_schedules(plans, topics_for, revision_every=0, rest_weekdays=()):
+    # Bulk form for nightly regeneration. plans is a DataFrame with plan_id,
+    # username, language, start_date and total_days; topics_for(language)
+    # returns (topics, weights). Returns one row per scheduled day, ready for
+    # plan_days. Plans sharing a language, length and start weekday reuse the
+    # same labels, and their dates are computed in one broadcast.
+    weekmask = _weekmask(rest_weekdays)
+    starts = pd.to_datetime(plans["start_date"]).to_numpy().astype("datetime64[D]")
+    # 1970-01-01 was a Thursday.
+    weekdays = (starts.astype(np.int64) + 3) % 7
+    keyed = pd.DataFrame({"language": plans["language"].to_numpy(), "total_days": plans["total_days"].to_numpy(),
+                          "weekday": weekdays})
+    plan_ids = plans["plan_id"].to_numpy()
+    usernames = plans["username"].to_numpy(dtype=object)
+
+    parts = {"username": [], "plan_id": [], "day": [], "topic": []}
+    for (language, total_days, _), index in keyed.groupby(["language", "total_days", "weekday"], sort=False).indices.items():
+        topics, weights = topics_for(language)
+        if not topics:
+            continue
+        dates, slots = _study_days(starts[index], int(total_days), weekmask)
+        if not slots:
+            continue
+        labels = np.array(_slot_labels(tuple(topics), tuple(weights), slots, revision_every), dtype=object)
+        parts["username"].append(np.repeat(usernames[index], slots))
+        parts["plan_id"].append(np.repeat(plan_ids[index], slots))
+        parts["day"].append(dates.ravel())
+        parts["topic"].append(np.tile(labels, len(index)))
+    if not parts["day"]:
+        return pd.DataFrame(columns=list(parts))
+
+    columns = {name: np.concatenate(arrays) for name, arrays in parts.items()}
+    # Only a few hundred distinct dates: format each once.
+    unique_days, inverse = np.unique(columns["day"], return_inverse=True)
+    columns["day"] = np.datetime_as_string(unique_days).astype(object)[inverse]
+    return pd.DataFrame(columns)
+
+
+def reschedule(days, today, rest_weekdays=()):
+    # days are (day, topic, status) rows of a plan. Topics left pending before
+    # today are moved back into the queue ahead of the remaining ones, and the
+    # queue is laid out again over study days from today. Past revision slots
+    # that were missed are dropped. Returns {ISO date: topic} for today onward.
+    today = str(today)
+    missed = [topic for day, topic, status in days
+              if day < today and status == "pending" and not topic.startswith(REVISION_PREFIX) and topic != REVISION_TOPIC]
+    upcoming = [topic for day, topic, status in days if day >= today and status != "done"]
+    queue = missed + upcoming
+    if not queue:
+        return {}
+    start = np.datetime64(today, "D")
+    # A day already studied keeps its entry; the new layout starts after it.
+    if any(day == today and status == "done" for day, topic, status in days):
+        start += np.timedelta64(1, "D")
+    dates = np.busday_offset(start, np.arange(len(queue)), roll="forward", weekmask=_weekmask(rest_weekdays))
+    return dict(zip(np.datetime_as_string(dates).tolist(), queue))
+
+
+def missed_days(days, today):
+    today = str(today)
+    return sum(1 for day, topic, status in days if day < today and status == "pending")
+
+
+def weekday_numbers(names):
+    return tuple(WEEKDAYS.index(name) for name in names)
+
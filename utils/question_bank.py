@@ -0,0 +1,168 @@
+import glob
+import json
+import os
+import re
+import sys
+import threading
+import time
+from utils import db
+
+RESOURCE_DIR = "data/static_resources"
+BANK_PATH = os.getenv("CODEMATE_QUESTION_BANK", "data/question_bank.db")
+
+LANGUAGE_FILES = {
+    "Python": "py_questions.json",
+    "Java": "java_questions.json",
+    "C++": "cpp_questions.json",
+    "JavaScript": "js_questions.json",
+}
+
+# Bumped when SCHEMA changes so existing bank files are rebuilt.
+BANK_FORMAT = 2
+
+SCHEMA = (
+    "DROP TABLE IF EXISTS topics",
+    "DROP TABLE IF EXISTS questions",
+    "DROP TABLE IF EXISTS sources",
+    "CREATE TABLE topics(language TEXT NOT NULL, position INTEGER NOT NULL, topic TEXT NOT NULL, "
+    "weight REAL NOT NULL DEFAULT 1, PRIMARY KEY (language, position))",
+    # topic and question are full-text indexed; the rest are stored filters.
+    "CREATE VIRTUAL TABLE questions USING fts5("
+    "topic, question, language UNINDEXED, difficulty UNINDEXED, type UNINDEXED)",
+    "CREATE TABLE sources(file TEXT PRIMARY KEY, mtime REAL NOT NULL)",
+)
+
+# Seconds between checks of the resource files for edits, e.g. by the topic
+# fetcher, so a running app picks them up without a restart.
+CHECK_SECONDS = 5
+
+_topics_cache = {}
+_build_lock = threading.Lock()
+_checked_at = None
+_sources_seen = None
+
+
+def _read_resource(path):
+    # Resource files may be empty or hand-edited; a bad file contributes nothing.
+    try:
+        with open(path, "r") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def _weight(value):
+    try:
+        weight = float(value)
+    except (TypeError, ValueError):
+        return 1.0
+    return weight if weight > 0 else 1.0
+
+
+def _source_mtimes(resource_dir):
+    return {os.path.basename(p): os.path.getmtime(p)
+            for p in sorted(glob.glob(os.path.join(resource_dir, "*_questions.json")))}
+
+
+def build(resource_dir=RESOURCE_DIR, bank_path=BANK_PATH):
+    language_for = {name: language for language, name in LANGUAGE_FILES.items()}
+    sources = _source_mtimes(resource_dir)
+    topics, questions = [], []
+    for name in sources:
+        language = language_for.get(name)
+        if language is None:
+            continue
+        data = _read_resource(os.path.join(resource_dir, name))
+        for position, topic in enumerate(data.get("topics", [])):
+            # Topics are plain names or {"topic": name, "weight": relative study time}.
+            if isinstance(topic, dict):
+                topics.append((language, position, str(topic.get("topic", "")), _weight(topic.get("weight"))))
+            else:
+                topics.append((language, position, str(topic), 1.0))
+        for q in data.get("questions", []):
+            if isinstance(q, dict) and q.get("question"):
+                questions.append((q.get("topic", ""), q["question"], language,
+                                  q.get("difficulty", "Medium"), q.get("type", "Short Answer")))
+
+    with db.transaction(bank_path) as conn:
+        for statement in SCHEMA:
+            conn.execute(statement)
+        conn.executemany("INSERT INTO topics VALUES (?, ?, ?, ?)", topics)
+        conn.executemany("INSERT INTO questions (topic, question, language, difficulty, type) "
+                         "VALUES (?, ?, ?, ?, ?)", questions)
+        conn.executemany("INSERT INTO sources VALUES (?, ?)", sources.items())
+        conn.execute(f"PRAGMA user_version = {BANK_FORMAT}")
+    _topics_cache.clear()
+    return len(topics), len(questions)
+
+
+def _is_stale(resource_dir, bank_path):
+    if not os.path.exists(bank_path):
+        return True
+    try:
+        if db.fetch_one("PRAGMA user_version", path=bank_path)[0] != BANK_FORMAT:
+            return True
+        built = dict(db.fetch_all("SELECT file, mtime FROM sources", path=bank_path))
+    except Exception:
+        return True
+    return built != _source_mtimes(resource_dir)
+
+
+def ensure_built(resource_dir=RESOURCE_DIR, bank_path=BANK_PATH):
+    # Re-checks the resource files at most every CHECK_SECONDS. When they
+    # changed, the bank is rebuilt if it is stale (another process may already
+    # have done it) and the cached topics are dropped.
+    global _checked_at, _sources_seen
+    if _checked_at is not None and time.monotonic() - _checked_at < CHECK_SECONDS:
+        return
+    with _build_lock:
+        if _checked_at is not None and time.monotonic() - _checked_at < CHECK_SECONDS:
+            return
+        sources = _source_mtimes(resource_dir)
+        if sources != _sources_seen:
+            if _is_stale(resource_dir, bank_path):
+                build(resource_dir, bank_path)
+            _topics_cache.clear()
+            _sources_seen = sources
+        _checked_at = time.monotonic()
+
+
+def get_weighted_topics(language):
+    # ([topic, ...], [weight, ...]) in syllabus order.
+    ensure_built()
+    if language not in _topics_cache:
+        rows = db.fetch_all("SELECT topic, weight FROM topics WHERE language = ? ORDER BY position",
+                            (language,), path=BANK_PATH)
+        _topics_cache[language] = ([row[0] for row in rows], [row[1] for row in rows])
+    topics, weights = _topics_cache[language]
+    return list(topics), list(weights)
+
+
+def get_topics(language):
+    return get_weighted_topics(language)[0]
+
+
+def _match_query(topic):
+    terms = re.findall(r"\w+", topic.lower())
+    return " ".join(f'"{term}"' for term in terms)
+
+
+def find_questions(language, topic, difficulty, limit):
+    query = _match_query(topic)
+    if not query:
+        return []
+    ensure_built()
+    rows = db.fetch_all(
+        "SELECT type, question FROM questions "
+        "WHERE questions MATCH ? AND language = ? AND difficulty = ? ORDER BY rank LIMIT ?",
+        (f"topic : ({query})", language, difficulty, limit),
+        path=BANK_PATH,
+    )
+    return [{"type": qtype, "question": question} for qtype, question in rows]
+
+
+if __name__ == "__main__":
+    resource_dir = sys.argv[1] if len(sys.argv) > 1 else RESOURCE_DIR
+    n_topics, n_questions = build(resource_dir)
+    print(f"Built {BANK_PATH}: {n_topics} topics, {n_questions} questions")
@@ -0,0 +1,82 @@
+import time
+from utils import db
+
+# Button label -> SM-2 quality (0-5). Anything below 3 is a lapse.
+GRADES = {"Again": 1, "Hard": 3, "Good": 4, "Easy": 5}
+
+MIN_EASE = 1.3
+DAY = 86400
+# A lapsed card comes back within the same session.
+RELEARN_SECONDS = 600
+
+CARD_COLUMNS = "card_id, question, answer"
+
+# Review history is append-only and never read on the hot path, so it is
+# written in batches rather than once per button press.
+review_log = db.WriteBuffer(
+    "INSERT INTO review_log (card_id, deck_id, grade, reviewed_at, interval_days, ease) VALUES (?, ?, ?, ?, ?, ?)",
+    max_rows=50,
+    max_delay=5.0,
+)
+
+
+def schedule(interval_days, ease, reps, lapses, quality, now):
+    # Classic SM-2. Returns (interval_days, ease, reps, lapses, due_at).
+    if quality < 3:
+        return 0.0, max(MIN_EASE, ease - 0.2), 0, lapses + 1, now + RELEARN_SECONDS
+    if reps == 0:
+        interval_days = 1.0
+    elif reps == 1:
+        interval_days = 6.0
+    else:
+        interval_days = round(interval_days * ease, 2)
+    ease = max(MIN_EASE, ease + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
+    return interval_days, ease, reps + 1, lapses, now + interval_days * DAY
+
+
+def next_due_card(deck_id, now=None):
+    # Both lookups are single index seeks on (deck_id, due_at): overdue reviews
+    # first, earliest due first, then cards that have never been studied.
+    now = time.time() if now is None else now
+    row = db.fetch_one(
+        f"SELECT {CARD_COLUMNS} FROM flashcards WHERE deck_id = ? AND due_at <= ? ORDER BY due_at LIMIT 1",
+        (deck_id, now),
+    )
+    if row is None:
+        row = db.fetch_one(
+            f"SELECT {CARD_COLUMNS} FROM flashcards WHERE deck_id = ? AND due_at IS NULL LIMIT 1",
+            (deck_id,),
+        )
+    return row
+
+
+def next_due_at(deck_id):
+    row = db.fetch_one("SELECT MIN(due_at) FROM flashcards WHERE deck_id = ? AND due_at IS NOT NULL", (deck_id,))
+    return row[0] if row else None
+
+
+def due_counts(deck_id, now=None):
+    # (due reviews, new cards)
+    now = time.time() if now is None else now
+    due = db.fetch_one("SELECT COUNT(*) FROM flashcards WHERE deck_id = ? AND due_at <= ?", (deck_id, now))[0]
+    new = db.fetch_one("SELECT COUNT(*) FROM flashcards WHERE deck_id = ? AND due_at IS NULL", (deck_id,))[0]
+    return due, new
+
+
+def record_review(card_id, quality, now=None):
+    now = time.time() if now is None else now
+    with db.transaction() as conn:
+        row = conn.execute(
+            "SELECT deck_id, interval_days, ease, reps, lapses FROM flashcards WHERE card_id = ?", (card_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        deck_id, interval_days, ease, reps, lapses = row
+        interval_days, ease, reps, lapses, due_at = schedule(interval_days, ease, reps, lapses, quality, now)
+        conn.execute(
+            "UPDATE flashcards SET interval_days = ?, ease = ?, reps = ?, lapses = ?, due_at = ?, last_reviewed = ? "
+            "WHERE card_id = ?",
+            (interval_days, ease, reps, lapses, due_at, now, card_id),
+        )
+    review_log.add((card_id, deck_id, quality, now, interval_days, ease))
+    return due_at
@@ -0,0 +1,91 @@
+import datetime
+import threading
+from collections import OrderedDict
+from utils import db
+
+
+# Keys this process has written, so reruns skip the buffer entirely. Only
+# flushed keys are remembered, and the oldest are forgotten first; a
+# forgotten key costs one more no-op insert, never a duplicate row.
+_logged = OrderedDict()
+_logged_lock = threading.Lock()
+MAX_REMEMBERED = 10_000
+
+
+def _remember(rows):
+    with _logged_lock:
+        for key in rows:
+            _logged[key] = None
+            _logged.move_to_end(key)
+        while len(_logged) > MAX_REMEMBERED:
+            _logged.popitem(last=False)
+
+
+# Sessions are keyed by (username, study_date, source). Events from every
+# session in this process are coalesced here and written in one transaction;
+# the study_log trigger keeps study_daily and user_activity in step.
+# ON CONFLICT DO NOTHING is what keeps the log free of duplicates.
+_buffer = db.WriteBuffer(
+    "INSERT INTO study_log (username, study_date, source) VALUES (?, ?, ?) "
+    "ON CONFLICT(username, study_date, source) DO NOTHING",
+    unique=True,
+    on_flush=_remember,
+)
+
+
+def log_study_session(username, study_date, source="manual", flush=False):
+    key = (username, str(study_date), source)
+    with _logged_lock:
+        seen = key in _logged
+    if not seen:
+        _buffer.add(key)
+    if flush:
+        # Callers that read the log right away (e.g. the dashboard button) need it on disk.
+        flush_study_log()
+
+
+def flush_study_log():
+    return _buffer.flush()
+
+
+def get_activity_version(username):
+    # Changes whenever a session is logged; use it to invalidate cached views.
+    row = db.fetch_one("SELECT version FROM user_activity WHERE username = ?", (username,))
+    return row[0] if row else 0
+
+
+def get_daily_counts(username, start, end):
+    # {date: count} for start..end inclusive; days without sessions are absent.
+    rows = db.fetch_all(
+        "SELECT study_date, count FROM study_daily WHERE username = ? AND study_date BETWEEN ? AND ?",
+        (username, start.isoformat(), end.isoformat()),
+    )
+    return {datetime.date.fromisoformat(d): count for d, count in rows}
+
+
+def get_weekly_study_data(username, today=None):
+    today = today or datetime.date.today()
+    counts = get_daily_counts(username, today - datetime.timedelta(days=6), today)
+    days = [today - datetime.timedelta(days=i) for i in range(6, -1, -1)]
+    return [(d.strftime("%A"), counts.get(d, 0)) for d in days]
+
+
+def get_streak(username, today=None, max_days=365):
+    # Consecutive study days ending today (or yesterday, if today is not logged yet).
+    today = today or datetime.date.today()
+    rows = db.fetch_all(
+        "SELECT study_date FROM study_daily WHERE username = ? AND study_date BETWEEN ? AND ? "
+        "ORDER BY study_date DESC",
+        (username, (today - datetime.timedelta(days=max_days)).isoformat(), today.isoformat()),
+    )
+    expected = today
+    streak = 0
+    for (date_str,) in rows:
+        day = datetime.date.fromisoformat(date_str)
+        if streak == 0 and day == today - datetime.timedelta(days=1):
+            expected = day
+        if day != expected:
+            break
+        streak += 1
+        expected = day - datetime.timedelta(days=1)
+    return streak
@@ -0,0 +1,237 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from bs4 import BeautifulSoup
+from utils.question_bank import LANGUAGE_FILES, RESOURCE_DIR
+
+# Curriculum pages crawled for each language. Override with a JSON file of the
+# same shape via CODEMATE_TOPIC_SOURCES.
+SOURCES = {
+    "Python": ["https://docs.python.org/3/tutorial/index.html"],
+    "Java": ["https://docs.oracle.com/javase/tutorial/java/TOC.html"],
+    "C++": ["https://en.cppreference.com/w/cpp/language"],
+    "JavaScript": ["https://developer.mozilla.org/en-US/docs/Web/JavaScript/Guide"],
+}
+
+CACHE_DIR = os.getenv("CODEMATE_HTTP_CACHE", "data/http_cache")
+USER_AGENT = "CodeMate-topic-fetcher/1.0"
+TIMEOUT = (5, 20)
+FETCH_WORKERS = 8
+PARSE_WORKERS = os.cpu_count() or 2
+MAX_TOPICS = 40
+
+
+def load_sources(path=None):
+    path = path or os.getenv("CODEMATE_TOPIC_SOURCES")
+    if not path:
+        return SOURCES
+    with open(path) as f:
+        return json.load(f)
+
+
+def make_session(pool_size=FETCH_WORKERS):
+    # One pooled session per crawl: connections to the same host are reused
+    # and transient failures are retried with backoff. An unreachable host is
+    # tried only twice, then the crawl falls back to the disk cache.
+    session = requests.Session()
+    retry = Retry(total=3, connect=1, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504),
+                  allowed_methods=("GET", "HEAD"))
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers["User-Agent"] = USER_AGENT
+    return session
+
+
+def _cache_paths(url, cache_dir):
+    key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+    return os.path.join(cache_dir, key + ".json"), os.path.join(cache_dir, key + ".body")
+
+
+def _read_cache(url, cache_dir):
+    meta_path, body_path = _cache_paths(url, cache_dir)
+    try:
+        with open(meta_path) as f:
+            meta = json.load(f)
+        with open(body_path, "rb") as f:
+            return meta, f.read()
+    except (OSError, ValueError):
+        return None, None
+
+
+def _write_atomic(path, data):
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        # The old file stays as it was; no half-written temp file is left.
+        os.unlink(tmp)
+        raise
+
+
+def _write_cache(url, cache_dir, response):
+    meta_path, body_path = _cache_paths(url, cache_dir)
+    meta = {
+        "url": url,
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified"),
+        "fetched_at": time.time(),
+    }
+    # Body first, so the metadata never points at a missing or partial body.
+    _write_atomic(body_path, response.content)
+    _write_atomic(meta_path, json.dumps(meta).encode("utf-8"))
+
+
+def fetch(session, url, cache_dir=CACHE_DIR):
+    # Returns (body bytes, status) where status is "fetched", "not-modified" or
+    # "stale" (network failed, cached copy served). Raises if neither exists.
+    meta, cached = _read_cache(url, cache_dir)
+    headers = {}
+    if meta:
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+    try:
+        response = session.get(url, headers=headers, timeout=TIMEOUT)
+        if response.status_code == 304 and cached is not None:
+            return cached, "not-modified"
+        response.raise_for_status()
+    except requests.RequestException:
+        if cached is not None:
+            return cached, "stale"
+        raise
+    _write_cache(url, cache_dir, response)
+    return response.content, "fetched"
+
+
+def _clean(text):
+    text = re.sub(r"\s+", " ", text).strip()
+    # Drop section numbers ("4.2.") and the pilcrows docs generators append.
+    text = re.sub(r"^[\d.]+\s*", "", text).strip(" ¶#")
+    return text
+
+
+def parse_topics(html):
+    # Headings are the curriculum's sections; a table of contents, when there
+    # is one, is the better source because it keeps the author's order.
+    soup = BeautifulSoup(html, "html.parser")
+    for tag in soup(["script", "style", "nav", "footer"]):
+        tag.decompose()
+    toc = soup.select(".toctree-wrapper li > a, .toc li > a, #toc li > a")
+    candidates = toc or soup.find_all(["h2", "h3"])
+    topics = []
+    seen = set()
+    for node in candidates:
+        text = _clean(node.get_text(" "))
+        if not 2 <= len(text) <= 60 or text.lower() in seen:
+            continue
+        seen.add(text.lower())
+        topics.append(text)
+    return topics[:MAX_TOPICS]
+
+
+def _merge(topic_lists):
+    merged = []
+    seen = set()
+    for topics in topic_lists:
+        for topic in topics:
+            if topic.lower() not in seen:
+                seen.add(topic.lower())
+                merged.append(topic)
+    return merged[:MAX_TOPICS]
+
+
+def _topic_name(entry):
+    # Topics are plain names or {"topic": name, "weight": relative study time}.
+    return str(entry.get("topic", "")) if isinstance(entry, dict) else str(entry)
+
+
+def write_topics(language, topics, resource_dir=RESOURCE_DIR):
+    # Merges crawled names into the "topics" key: existing entries keep their
+    # place and weight, new names are appended. Questions and other keys are kept.
+    path = os.path.join(resource_dir, LANGUAGE_FILES[language])
+    try:
+        with open(path) as f:
+            data = json.load(f)
+        if not isinstance(data, dict):
+            data = {}
+    except (OSError, ValueError):
+        data = {}
+    existing = data.get("topics")
+    existing = existing if isinstance(existing, list) else []
+    seen = {_topic_name(entry).lower() for entry in existing}
+    added = [topic for topic in topics if topic.lower() not in seen]
+    if not added and "topics" in data:
+        return path, False
+    data["topics"] = existing + added
+    _write_atomic(path, json.dumps(data, indent=2, ensure_ascii=False).encode("utf-8"))
+    return path, True
+
+
+def crawl(sources=None, resource_dir=RESOURCE_DIR, cache_dir=CACHE_DIR, session=None,
+          fetch_workers=FETCH_WORKERS, parse_workers=PARSE_WORKERS):
+    # Fetches every page on a thread pool, parses them on a process pool and
+    # writes each language's topics into its resource file. Returns a summary
+    # per language. Meant for the CLI or a scheduled job, never a page render.
+    sources = sources or load_sources()
+    session = session or make_session(fetch_workers)
+    pages = [(language, url) for language, urls in sources.items() if language in LANGUAGE_FILES for url in urls]
+
+    def get(page):
+        try:
+            return fetch(session, page[1], cache_dir)
+        except requests.RequestException as e:
+            return None, f"error: {e.__class__.__name__}"
+
+    with ThreadPoolExecutor(max_workers=fetch_workers) as pool:
+        fetched = list(pool.map(get, pages))
+
+    bodies = [body for body, _ in fetched if body is not None]
+    if parse_workers > 1 and len(bodies) > 1:
+        with ProcessPoolExecutor(max_workers=min(parse_workers, len(bodies))) as pool:
+            parsed = iter(list(pool.map(parse_topics, bodies)))
+    else:
+        parsed = iter([parse_topics(body) for body in bodies])
+
+    per_language = {}
+    summary = {}
+    for (language, url), (body, status) in zip(pages, fetched):
+        topics = next(parsed) if body is not None else []
+        per_language.setdefault(language, []).append(topics)
+        summary.setdefault(language, {"pages": {}, "topics": 0, "written": False})["pages"][url] = status
+
+    for language, topic_lists in per_language.items():
+        topics = _merge(topic_lists)
+        summary[language]["topics"] = len(topics)
+        # A crawl that found nothing leaves the existing list alone.
+        if topics:
+            _, summary[language]["written"] = write_topics(language, topics, resource_dir)
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Refresh curriculum topics in data/static_resources.")
+    parser.add_argument("--sources", help="JSON file mapping language to a list of URLs")
+    parser.add_argument("--language", action="append", help="only crawl this language (repeatable)")
+    parser.add_argument("--resource-dir", default=RESOURCE_DIR)
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    args = parser.parse_args()
+    sources = load_sources(args.sources)
+    if args.language:
+        sources = {language: urls for language, urls in sources.items() if language in args.language}
+    for language, result in crawl(sources, args.resource_dir, args.cache_dir).items():
+        statuses = ", ".join(f"{status}" for status in result["pages"].values())
+        print(f"{language}: {result['topics']} topics ({statuses}){' written' if result['written'] else ''}")
@@ -0,0 +1,165 @@
+import atexit
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Off by default. When disabled span() hands back a shared no-op context
+# manager, so instrumented code pays one function call and nothing else.
+ENABLED = os.getenv("CODEMATE_TRACING", "").lower() in ("1", "on", "true")
+
+# Latest samples kept per (page, operation) for percentile estimates.
+RESERVOIR_SIZE = 1000
+
+EXPORT_DIR = os.getenv("CODEMATE_TRACE_DIR", "data/traces")
+
+_current_page = contextvars.ContextVar("codemate_page", default="-")
+
+
+class _Stats:
+    __slots__ = ("count", "total", "max", "samples")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.samples = deque(maxlen=RESERVOIR_SIZE)
+
+
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+class _NoopSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+def record(operation, seconds, page=None):
+    if not ENABLED:
+        return
+    key = (page or _current_page.get(), operation)
+    with _stats_lock:
+        stats = _stats.get(key)
+        if stats is None:
+            stats = _stats[key] = _Stats()
+        stats.count += 1
+        stats.total += seconds
+        stats.max = max(stats.max, seconds)
+        stats.samples.append(seconds)
+
+
+@contextmanager
+def _timed(operation):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(operation, time.perf_counter() - start)
+
+
+def span(operation):
+    if not ENABLED:
+        return _NOOP
+    return _timed(operation)
+
+
+def traced(operation):
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return func(*args, **kwargs)
+            with _timed(operation):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def page(name):
+    # Attributes every span opened on this thread to the page being rendered.
+    token = _current_page.set(name)
+    try:
+        with span("page.render"):
+            yield
+    finally:
+        _current_page.reset(token)
+
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def snapshot():
+    with _stats_lock:
+        items = [(key, stats.count, stats.total, stats.max, sorted(stats.samples)) for key, stats in _stats.items()]
+    rows = []
+    for (page_name, operation), count, total, maximum, samples in sorted(items):
+        rows.append({
+            "page": page_name,
+            "operation": operation,
+            "count": count,
+            "total_ms": total * 1000,
+            "p50_ms": _percentile(samples, 0.50) * 1000,
+            "p95_ms": _percentile(samples, 0.95) * 1000,
+            "max_ms": maximum * 1000,
+        })
+    return rows
+
+
+def reset():
+    with _stats_lock:
+        _stats.clear()
+
+
+def export_json(path=None):
+    path = path or os.path.join(EXPORT_DIR, "metrics.json")
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as f:
+        json.dump({"generated_at": time.time(), "spans": snapshot()}, f, indent=2)
+    return path
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"')
+
+
+def export_prometheus(path=None):
+    path = path or os.path.join(EXPORT_DIR, "metrics.prom")
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    lines = [
+        "# HELP codemate_span_seconds Latency of traced operations.",
+        "# TYPE codemate_span_seconds summary",
+    ]
+    for row in snapshot():
+        labels = f'page="{_label(row["page"])}",operation="{_label(row["operation"])}"'
+        lines.append(f'codemate_span_seconds{{{labels},quantile="0.5"}} {row["p50_ms"] / 1000:.6f}')
+        lines.append(f'codemate_span_seconds{{{labels},quantile="0.95"}} {row["p95_ms"] / 1000:.6f}')
+        lines.append(f'codemate_span_seconds_sum{{{labels}}} {row["total_ms"] / 1000:.6f}')
+        lines.append(f'codemate_span_seconds_count{{{labels}}} {row["count"]}')
+    with open(path, "w") as f:
+        f.write("\n".join(lines) + "\n")
+    return path
+
+
+def _export_at_exit():
+    if ENABLED and _stats:
+        export_json()
+        export_prometheus()
+
+
+atexit.register(_export_at_exit)